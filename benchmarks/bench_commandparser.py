@@ -0,0 +1,96 @@
+"""Benchmark parsing LaTeX commands with
+`lsstprojectmeta.tex.commandparser.LatexCommand`.
+
+Times parsing every ``\\citep``-style command in each document of the
+``tests/data`` corpus, and in a synthetic document with thousands of
+``\\citep`` commands.
+
+Run from the repository root::
+
+    python benchmarks/bench_commandparser.py
+"""
+
+import argparse
+import glob
+import os
+import time
+
+from lsstprojectmeta.tex.commandparser import LatexCommand, LatexCommandIndex
+
+# Command syntaxes to parse from each document
+COMMANDS = [
+    LatexCommand('title',
+                 {'name': 'short_title', 'required': False, 'bracket': '['},
+                 {'name': 'long_title', 'required': True, 'bracket': '{'}),
+    LatexCommand('author', {'name': 'authors', 'bracket': '{'}),
+    LatexCommand('citep',
+                 {'name': 'prefix', 'required': False, 'bracket': '['},
+                 {'name': 'citekey', 'required': True, 'bracket': '{'}),
+    LatexCommand('citet', {'name': 'citekey', 'bracket': '{'}),
+    LatexCommand('ref', {'name': 'label', 'bracket': '{'}),
+    LatexCommand('section', {'name': 'title', 'bracket': '{'}),
+]
+
+
+def make_synthetic_source(n_citations):
+    """Make a LaTeX source with ``n_citations`` ``\\citep`` commands near its
+    start, followed by a long body.
+    """
+    citations = ''.join(
+        r'Result~\citep[p.~{0:d}]{{Key{0:d}}}. '.format(i)
+        for i in range(n_citations))
+    body = 'Body text with {braces} and [brackets].\n' * n_citations * 10
+    return citations + '\n' + body
+
+
+def load_corpus(data_dir):
+    sources = {}
+    for path in sorted(glob.glob(os.path.join(data_dir, '**', '*.tex'),
+                                 recursive=True)):
+        with open(path, encoding='utf-8', errors='replace') as f:
+            sources[os.path.relpath(path, data_dir)] = f.read()
+    return sources
+
+
+def time_parse(source, repeat, use_index=False):
+    """Time parsing all `COMMANDS` from the source, returning the minimum
+    time in milliseconds and the number of parsed commands.
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        parse_source = LatexCommandIndex(source) if use_index else source
+        count = 0
+        for command in COMMANDS:
+            count += sum(1 for _ in command.parse(parse_source))
+        times.append((time.perf_counter() - start) * 1000.)
+    return min(times), count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='Number of times each source is parsed.')
+    parser.add_argument('--citations', type=int, default=5000,
+                        help='Number of citations in the synthetic source.')
+    parser.add_argument('--data-dir', default=os.path.join('tests', 'data'),
+                        help='Directory of LaTeX documents.')
+    args = parser.parse_args()
+
+    sources = load_corpus(args.data_dir)
+    sources['synthetic ({0:d} citations)'.format(args.citations)] = \
+        make_synthetic_source(args.citations)
+
+    total = 0.
+    for name, source in sources.items():
+        elapsed, count = time_parse(source, args.repeat)
+        indexed_elapsed, _ = time_parse(source, args.repeat, use_index=True)
+        total += elapsed
+        print('{0:>60}: {1:9.2f} ms, {2:9.2f} ms with index '
+              '({3:d} commands, {4:d} chars)'.format(
+                  name, elapsed, indexed_elapsed, count, len(source)))
+    print('{0:>60}: {1:9.2f} ms'.format('total', total))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""Benchmark the per-call latency of deparagraphed pandoc conversions.
+
+Compares running ``lsstprojectmeta-deparagraph`` as a pandoc filter (a new
+Python interpreter for each conversion) with applying the deparagraph
+transformation in-process to pandoc's JSON AST, as
+`lsstprojectmeta.pandoc.convert.convert_text` does.
+
+Run from the repository root::
+
+    python benchmarks/bench_deparagraph.py
+"""
+
+import argparse
+import statistics
+import time
+
+import pypandoc
+
+from lsstprojectmeta.pandoc.convert import convert_text
+
+SAMPLES = [
+    'Data Management Science Pipelines Design',
+    r"``Complex'' title \textit{like} $1+2$",
+    r'\v{Z}.~Ivezi\'c',
+]
+
+
+def run_filter(sample, to_fmt):
+    return pypandoc.convert_text(
+        sample, to_fmt, format='latex',
+        extra_args=['--filter=lsstprojectmeta-deparagraph', '--wrap=none',
+                    '--smart'])
+
+
+def run_in_process(sample, to_fmt):
+    return convert_text(sample, 'latex', to_fmt, deparagraph=True)
+
+
+def time_calls(func, to_fmt, repeat):
+    """Time ``repeat`` conversions of each sample, returning the per-call
+    latencies in milliseconds.
+    """
+    latencies = []
+    for _ in range(repeat):
+        for sample in SAMPLES:
+            start = time.perf_counter()
+            func(sample, to_fmt)
+            latencies.append((time.perf_counter() - start) * 1000.)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=10,
+                        help='Number of times each sample is converted.')
+    parser.add_argument('--format', default='html5',
+                        help='Output format.')
+    args = parser.parse_args()
+
+    # Check that both paths produce the same output, and warm up pandoc.
+    for sample in SAMPLES:
+        assert run_filter(sample, args.format) == \
+            run_in_process(sample, args.format)
+
+    for label, func in (('pandoc filter', run_filter),
+                        ('in-process', run_in_process)):
+        latencies = time_calls(func, args.format, args.repeat)
+        print('{0:>14}: median {1:7.1f} ms, min {2:7.1f} ms per call '
+              '({3:d} calls)'.format(label, statistics.median(latencies),
+                                     min(latencies), len(latencies)))
+
+
+if __name__ == '__main__':
+    main()
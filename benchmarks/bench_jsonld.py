@@ -0,0 +1,171 @@
+"""Benchmark decoding and encoding JSON-LD with `lsstprojectmeta.jsonld`.
+
+Times decoding a large, realistic Lander-style ``metadata.jsonld`` document:
+an ``articleBody`` made from the LaTeX sources in ``tests/data``, many author
+objects, and many citation objects. Decoding with every string checked as a
+datetime and with ``date_keys=JSONLD_DATE_KEYS`` is compared with the
+original decoder, which called ``datetime.strptime`` on every string.
+
+Then times encoding the decoded document with ``encode_jsonld`` and with the
+streaming ``write_jsonld``, and measures the peak memory that each allocates
+(with `tracemalloc`) beyond the document itself.
+
+Run from the repository root::
+
+    python benchmarks/bench_jsonld.py
+"""
+
+import argparse
+import datetime
+import glob
+import json
+import os
+import time
+import tracemalloc
+
+from lsstprojectmeta.jsonld import (
+    encode_jsonld, decode_jsonld, JSONLD_DATE_KEYS, write_jsonld)
+
+
+def _strptime_object_pairs(pairs):
+    """The original object hook, which tries ``datetime.strptime`` on every
+    string value.
+    """
+    doc = {}
+    for key, value in pairs:
+        if isinstance(value, str):
+            try:
+                value = datetime.datetime.strptime(value, '%Y-%m-%dT%H:%M:%SZ')
+                if value.tzinfo is None:
+                    value = value.replace(tzinfo=datetime.timezone.utc)
+                value = value.astimezone(datetime.timezone.utc)
+            except ValueError:
+                pass
+        doc[key] = value
+    return doc
+
+
+def decode_jsonld_strptime(jsonld_text):
+    decoder = json.JSONDecoder(object_pairs_hook=_strptime_object_pairs)
+    return decoder.decode(jsonld_text)
+
+
+def make_document(data_dir, n_authors, n_citations):
+    """Make a large JSON-LD document, encoded as a string."""
+    body = []
+    for path in sorted(glob.glob(os.path.join(data_dir, '**', '*.tex'),
+                                 recursive=True)):
+        with open(path, encoding='utf-8', errors='replace') as f:
+            body.append(f.read())
+    date = datetime.datetime(2018, 1, 1, tzinfo=datetime.timezone.utc)
+    jsonld = {
+        '@context': [
+            'https://raw.githubusercontent.com/codemeta/codemeta/2.0-rc/'
+            'codemeta.jsonld',
+            'http://schema.org'],
+        '@type': ['Report', 'SoftwareSourceCode'],
+        '@id': 'https://ldm-151.lsst.io',
+        'reportNumber': 'LDM-151',
+        'name': 'Data Management Science Pipelines Design',
+        'description': 'A long abstract. ' * 50,
+        'dateModified': date,
+        'author': [{'@type': 'Person',
+                    'name': 'Author Number {0:d}'.format(i),
+                    'email': 'author{0:d}@lsst.org'.format(i),
+                    'affiliation': {'@type': 'Organization',
+                                    'name': 'LSST Project Office'}}
+                   for i in range(n_authors)],
+        'citation': [{'@type': 'CreativeWork',
+                      'name': 'Cited work {0:d}'.format(i),
+                      'identifier': 'LDM-{0:d}'.format(i),
+                      'url': 'https://ldm-{0:d}.lsst.io'.format(i),
+                      'datePublished': date}
+                     for i in range(n_citations)],
+        'articleBody': '\n'.join(body),
+        'fileFormat': 'text/plain',
+    }
+    return encode_jsonld(jsonld)
+
+
+def time_decode(decode, text, repeat):
+    """Time decoding the text, returning the minimum time in
+    milliseconds and the decoded document.
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        doc = decode(text)
+        times.append((time.perf_counter() - start) * 1000.)
+    return min(times), doc
+
+
+class NullWriter(object):
+    """Text stream that discards what's written to it."""
+
+    def write(self, text):
+        return len(text)
+
+
+def time_encode(encode, doc, repeat):
+    """Time encoding the document, returning the minimum time in
+    milliseconds and the peak memory allocated, in megabytes.
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        encode(doc)
+        times.append((time.perf_counter() - start) * 1000.)
+    tracemalloc.start()
+    encode(doc)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return min(times), peak / 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='Number of times the document is decoded.')
+    parser.add_argument('--authors', type=int, default=500,
+                        help='Number of author objects.')
+    parser.add_argument('--citations', type=int, default=2000,
+                        help='Number of citation objects.')
+    parser.add_argument('--data-dir', default=os.path.join('tests', 'data'),
+                        help='Directory of LaTeX documents.')
+    args = parser.parse_args()
+
+    text = make_document(args.data_dir, args.authors, args.citations)
+    print('Document: {0:d} chars, {1:d} authors, {2:d} citations'.format(
+        len(text), args.authors, args.citations))
+
+    decoders = [
+        ('strptime (original)', decode_jsonld_strptime),
+        ('decode_jsonld', decode_jsonld),
+        ('decode_jsonld(date_keys=JSONLD_DATE_KEYS)',
+         lambda text: decode_jsonld(text, date_keys=JSONLD_DATE_KEYS)),
+        ('json.loads (no datetimes)', json.loads),
+    ]
+    baseline = expected = None
+    for name, decode in decoders:
+        elapsed, doc = time_decode(decode, text, args.repeat)
+        if baseline is None:
+            baseline, expected = elapsed, doc
+        elif decode is decode_jsonld:
+            assert doc == expected
+        print('{0:>45}: {1:9.2f} ms ({2:5.1f}x)'.format(
+            name, elapsed, baseline / elapsed))
+
+    print('Encoding (articleBody: {0:.1f} MB)'.format(
+        len(expected['articleBody']) / 1e6))
+    encoders = [
+        ('encode_jsonld', lambda doc: NullWriter().write(encode_jsonld(doc))),
+        ('write_jsonld', lambda doc: write_jsonld(doc, NullWriter())),
+    ]
+    for name, encode in encoders:
+        elapsed, peak = time_encode(encode, expected, args.repeat)
+        print('{0:>45}: {1:9.2f} ms, {2:6.2f} MB peak'.format(
+            name, elapsed, peak))
+
+
+if __name__ == '__main__':
+    main()
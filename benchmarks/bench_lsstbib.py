@@ -0,0 +1,120 @@
+"""Benchmark looking up cited entries in lsst-texmf-sized BibTeX content.
+
+Makes BibTeX content that resembles the lsst-texmf bibliographies (DocuShare
+handles, ADS entries with many authors, ``@string`` macros), then compares
+parsing all of it with pybtex, as `lsstprojectmeta.tex.lsstbib` originally
+did, with indexing it with `lsstprojectmeta.tex.bibindex.index_bibtex` and
+parsing only the cited entries with a
+`~lsstprojectmeta.tex.bibindex.LazyBibliographyData`. The peak memory that
+each allocates is measured with `tracemalloc`.
+
+Run from the repository root::
+
+    python benchmarks/bench_lsstbib.py
+"""
+
+import argparse
+import random
+import time
+import tracemalloc
+
+import pybtex.database
+
+from lsstprojectmeta.tex.bibindex import index_bibtex, LazyBibliographyData
+from lsstprojectmeta.tex.lsstbib import (
+    get_url_from_entry, get_authoryear_from_entry)
+
+
+def make_bibtex(n_entries):
+    """Make BibTeX content with ``n_entries`` entries, and get their cite
+    keys.
+    """
+    parts = ['@string{spie = "Society of Photo-Optical Instrumentation '
+             'Engineers (SPIE) Conference Series"}\n\n']
+    keys = []
+    for i in range(n_entries):
+        if i % 2:
+            key = 'LDM-{0:d}'.format(i)
+            parts.append(
+                '@DocuShare{{{key},\n'
+                '   author = {{Mario Juri{{\\\'c}} and others}},\n'
+                '    title = "{{Data Management Document {i:d}}}",\n'
+                '     year = 2017,\n'
+                '    month = may,\n'
+                '   handle = {{{key}}},\n'
+                '     note = {{LSST Data Management Technical Note}},\n'
+                '      url = {{https://ls.st/{key}}}\n'
+                '}}\n\n'.format(key=key, i=i))
+        else:
+            key = '{0:d}SPIE.{1:05d}..225C'.format(2000 + i % 18, i)
+            authors = ' and '.join(
+                '{{Author{0:d}}}, A.~B.'.format(j) for j in range(8))
+            parts.append(
+                '@INPROCEEDINGS{{{key},\n'
+                '   author = {{{authors}}},\n'
+                '    title = "{{The LSST data management system ({i:d})}}",\n'
+                'booktitle = spie # " 9913",\n'
+                '     year = 2016,\n'
+                '    pages = {{99130U}},\n'
+                '      doi = {{10.1117/12.2231335}},\n'
+                '   adsurl = {{http://adsabs.harvard.edu/abs/{key}}},\n'
+                '  adsnote = {{Provided by the SAO/NASA Astrophysics Data '
+                'System}}\n'
+                '}}\n\n'.format(key=key, authors=authors, i=i))
+        keys.append(key)
+    return ''.join(parts), keys
+
+
+def cite(bib, keys):
+    """Get the fields that citation linking uses for each cite key."""
+    for key in keys:
+        entry = bib.entries[key]
+        get_url_from_entry(entry)
+        get_authoryear_from_entry(entry)
+
+
+def measure(func):
+    """Run a function, returning its time in milliseconds and the peak
+    memory it allocates, in megabytes.
+    """
+    start = time.perf_counter()
+    func()
+    elapsed = (time.perf_counter() - start) * 1000.
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--entries', type=int, default=20000,
+                        help='Number of BibTeX entries.')
+    parser.add_argument('--citations', type=int, default=50,
+                        help='Number of cited entries.')
+    args = parser.parse_args()
+
+    bibtex, keys = make_bibtex(args.entries)
+    cited_keys = random.Random(0).sample(keys, args.citations)
+    print('BibTeX: {0:.1f} MB, {1:d} entries, {2:d} citations'.format(
+        len(bibtex) / 1e6, args.entries, args.citations))
+
+    index = index_bibtex(bibtex)
+    steps = [
+        ('pybtex parse_string + cite',
+         lambda: cite(pybtex.database.parse_string(bibtex, 'bibtex'),
+                      cited_keys)),
+        ('index_bibtex', lambda: index_bibtex(bibtex)),
+        ('LazyBibliographyData (indexed) + cite',
+         lambda: cite(LazyBibliographyData([bibtex], indices=[index]),
+                      cited_keys)),
+    ]
+    for name, func in steps:
+        elapsed, peak = measure(func)
+        print('{0:>40}: {1:9.1f} ms, {2:7.2f} MB peak'.format(
+            name, elapsed, peak))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,15 +1,38 @@
 import logging
 
-from pkg_resources import get_distribution, DistributionNotFound
-
 __all__ = ('__version__',)
 
 
-try:
-    __version__ = get_distribution('lsst-projectmeta-kit').version
-except DistributionNotFound:
-    # Package is not installed
-    __version__ = 'unknown'
+def _get_version():
+    """Get the version of lsst-projectmeta-kit, or ``'unknown'`` if it's not
+    installed.
+    """
+    try:
+        # Written by setuptools_scm when the package is built
+        from ._version import version
+        return version
+    except ImportError:
+        pass
+
+    try:
+        from importlib.metadata import version, PackageNotFoundError
+    except ImportError:
+        # Python < 3.8. pkg_resources is slow to import, so it's only a
+        # fallback.
+        from pkg_resources import get_distribution
+        from pkg_resources import DistributionNotFound as PackageNotFoundError
+
+        def version(name):
+            return get_distribution(name).version
+
+    try:
+        return version('lsst-projectmeta-kit')
+    except PackageNotFoundError:
+        # Package is not installed
+        return 'unknown'
+
+
+__version__ = _get_version()
 
 # Allow users to attach their own handlers
 logging.getLogger(__name__).addHandler(logging.NullHandler())
@@ -2,19 +2,38 @@
 """
 import argparse
 import asyncio
+import functools
+import gzip
+import io
 import logging
 import pprint
+import sys
 
 import aiohttp
-from motor.motor_asyncio import AsyncIOMotorClient
 
+from ..github.graphql import GitHubClient, GitHubRepoBatcher
+from ..httpcache import HttpCache, CachingSession
+from ..ingeststate import IngestState, get_ltd_doc_fingerprint
+from ..jsonld import write_jsonld
+from ..mongo import MongoBulkWriter, upsert_jsonld
 from ..ltd import get_ltd_product_urls, get_ltd_product
+from ..scheduler import HostLimits, HostLimitedSession, BoundedScheduler
 from ..lsstdocument.handles import DOCUMENT_HANDLE_PATTERN
 from ..lsstdocument.lander import process_lander_page, NotLanderPageError
 from ..lsstdocument.sphinxtechnotes import (process_sphinx_technote,
                                             NotSphinxTechnoteError)
 
 
+DEFAULT_HOST_LIMITS = {
+    'keeper.lsst.codes': 8,
+    'raw.githubusercontent.com': 8,
+    'api.github.com': 2,
+}
+"""Default limits on concurrent requests to each upstream host during a
+bulk ingest.
+"""
+
+
 def main():
     """Command line entrypoint to reduce technote metadata.
     """
@@ -45,8 +64,93 @@ def main():
         '--mongodb-collection',
         default='resources',
         help='Name of the MongoDB collection for projectmeta resources')
+    parser.add_argument(
+        '--mongodb-batch-size',
+        type=int,
+        default=100,
+        help='Maximum number of records upserted into MongoDB in a single '
+             'bulk write during a bulk ingest.')
+    parser.add_argument(
+        '--mongodb-flush-interval',
+        type=float,
+        default=5.,
+        help='Maximum time, in seconds, that a record waits to be upserted '
+             'into MongoDB during a bulk ingest.')
+    parser.add_argument(
+        '--output',
+        metavar='PATH',
+        help='Path of a newline-delimited JSON (NDJSON) file that JSON-LD '
+             'records are written to as they are produced. Use "-" for '
+             'stdout. Paths ending in .gz are gzip-compressed.')
+    parser.add_argument(
+        '--output-gzip',
+        action='store_true',
+        default=None,
+        help='Gzip-compress the --output, regardless of its extension.')
+    parser.add_argument(
+        '--http-cache',
+        help='Path of an HTTP cache database file. If provided, LTD, GitHub '
+             'and document metadata downloads are cached and revalidated '
+             'with conditional requests, so unchanged resources aren\'t '
+             'downloaded again.')
+    parser.add_argument(
+        '--incremental',
+        action='store_true',
+        help='Skip documents whose sources are unchanged since their last '
+             'successful ingest into MongoDB during a bulk ingest. The '
+             'fingerprints of the sources are kept in the --state-file.')
+    parser.add_argument(
+        '--state-file',
+        default='lsstprojectmeta-ingest-state.json',
+        help='Path of the incremental ingest state file.')
+    parser.add_argument(
+        '--concurrency',
+        type=int,
+        default=16,
+        help='Maximum number of LTD products processed at once during a '
+             'bulk ingest.')
+    parser.add_argument(
+        '--host-limit',
+        dest='host_limits',
+        action='append',
+        default=[],
+        metavar='HOST=N',
+        help='Maximum number of concurrent requests to a host during a bulk '
+             'ingest. Can be given multiple times. Defaults: {0}.'.format(
+                 ', '.join('{0}={1:d}'.format(*item)
+                           for item in sorted(DEFAULT_HOST_LIMITS.items()))))
+    parser.add_argument(
+        '--default-host-limit',
+        type=int,
+        default=8,
+        help='Maximum number of concurrent requests to any other host.')
+    parser.add_argument(
+        '--graphql-batch-size',
+        type=int,
+        default=20,
+        help='Maximum number of GitHub repositories looked up in a single '
+             'GraphQL query during a bulk ingest.')
+    parser.add_argument(
+        '--progress-interval',
+        type=float,
+        default=10.,
+        help='Seconds between progress reports during a bulk ingest.')
     args = parser.parse_args()
 
+    try:
+        host_limits = HostLimits.from_strings(
+            ['{0}={1:d}'.format(*item)
+             for item in DEFAULT_HOST_LIMITS.items()] + args.host_limits,
+            default=args.default_host_limit)
+    except ValueError as err:
+        parser.error(str(err))
+    if args.concurrency < 1:
+        parser.error('--concurrency must be at least 1')
+    if args.graphql_batch_size < 1:
+        parser.error('--graphql-batch-size must be at least 1')
+    if args.mongodb_batch_size < 1:
+        parser.error('--mongodb-batch-size must be at least 1')
+
     # Configure the root logger
     stream_handler = logging.StreamHandler()
     stream_formatter = logging.Formatter(
@@ -60,47 +164,205 @@ def main():
     app_logger.setLevel(logging.DEBUG)
 
     if args.mongodb_uri is not None:
+        # motor (and pymongo) are slow to import, and aren't needed to write
+        # JSON-LD records to --output
+        from motor.motor_asyncio import AsyncIOMotorClient
+
         mongo_client = AsyncIOMotorClient(args.mongodb_uri, ssl=True)
         collection = mongo_client[args.mongodb_db][args.mongodb_collection]
     else:
         collection = None
 
-    loop = asyncio.get_event_loop()
+    if args.http_cache is not None:
+        http_cache = HttpCache(args.http_cache)
+    else:
+        http_cache = None
 
-    if args.ltd_product_url is not None:
-        # Run single technote
-        loop.run_until_complete(run_single_ltd_doc(args.ltd_product_url,
-                                                   args.github_token,
-                                                   collection))
+    if args.incremental:
+        ingest_state = IngestState(args.state_file)
     else:
-        # Run bulk technote processing
-        loop.run_until_complete(run_bulk_etl(args.github_token,
-                                             collection))
+        ingest_state = None
+
+    if args.output is not None:
+        sink = NdjsonSink(args.output, compress=args.output_gzip)
+    else:
+        sink = None
+
+    loop = asyncio.get_event_loop()
+
+    try:
+        if args.ltd_product_url is not None:
+            # Run single technote
+            loop.run_until_complete(run_single_ltd_doc(args.ltd_product_url,
+                                                       args.github_token,
+                                                       collection,
+                                                       http_cache=http_cache,
+                                                       sink=sink))
+        else:
+            # Run bulk technote processing
+            loop.run_until_complete(run_bulk_etl(
+                args.github_token, collection,
+                concurrency=args.concurrency,
+                host_limits=host_limits,
+                graphql_batch_size=args.graphql_batch_size,
+                progress_interval=args.progress_interval,
+                http_cache=http_cache,
+                ingest_state=ingest_state,
+                mongodb_batch_size=args.mongodb_batch_size,
+                mongodb_flush_interval=args.mongodb_flush_interval,
+                sink=sink))
+    finally:
+        if sink is not None:
+            sink.close()
+            app_logger.info('Wrote %d records to %s', sink.count,
+                            args.output)
+
+    if http_cache is not None:
+        app_logger.info('HTTP cache usage: %r', http_cache.stats)
+
+
+class NdjsonSink(object):
+    """Sink that writes JSON-LD records to a newline-delimited JSON
+    (NDJSON) stream, one record per line.
+
+    Records are encoded with `lsstprojectmeta.jsonld.write_jsonld` and
+    written as soon as they're passed to `write`, so records appear in the
+    order that they're produced and the sink doesn't hold on to them. Large
+    records are written in chunks, rather than encoded in memory first.
+
+    Parameters
+    ----------
+    path : `str`
+        Path of the output file, or ``'-'`` for stdout.
+    compress : `bool`, optional
+        Whether to gzip-compress the output. By default, the output is
+        compressed if ``path`` ends in ``.gz``.
+    """
+
+    def __init__(self, path, compress=None):
+        super().__init__()
+        if compress is None:
+            compress = path.endswith('.gz')
+        self.path = path
+        self.compress = compress
+        self._stdout = path == '-'
+
+        if self._stdout and compress:
+            self._stream = io.TextIOWrapper(
+                gzip.GzipFile(fileobj=sys.stdout.buffer, mode='wb'),
+                encoding='utf-8')
+        elif self._stdout:
+            self._stream = sys.stdout
+        elif compress:
+            self._stream = gzip.open(path, 'wt', encoding='utf-8')
+        else:
+            self._stream = open(path, 'w', encoding='utf-8')
+
+        self.count = 0
+        """Number of records written (`int`)."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def write(self, jsonld):
+        """Write a JSON-LD record.
+
+        Parameters
+        ----------
+        jsonld : `dict`
+            The JSON-LD document that represents the document resource.
+        """
+        # JSON strings can't contain raw newlines, so each record is a
+        # single line.
+        write_jsonld(jsonld, self._stream, separators=(',', ':'))
+        self._stream.write('\n')
+        self.count += 1
+
+    def close(self):
+        """Flush the stream, and close it unless it's stdout."""
+        if self._stream is None:
+            return
+        if self._stream is sys.stdout:
+            self._stream.flush()
+        elif self._stdout:
+            # Close the gzip stream, which writes its trailer, without
+            # closing stdout itself.
+            self._stream.flush()
+            self._stream.detach().close()
+            sys.stdout.buffer.flush()
+        else:
+            self._stream.close()
+        self._stream = None
 
 
 async def run_single_ltd_doc(ltd_product_url, github_api_token,
-                             mongo_collection):
+                             mongo_collection, http_cache=None, sink=None):
     async with aiohttp.ClientSession() as session:
+        if http_cache is not None:
+            session = CachingSession(session, http_cache)
         jsonld = await process_ltd_doc(session, github_api_token,
                                        ltd_product_url,
                                        mongo_collection=mongo_collection)
-    pp = pprint.PrettyPrinter(indent=2)
-    pp.pprint(jsonld)
+    if sink is not None:
+        if jsonld is not None:
+            sink.write(jsonld)
+    else:
+        pp = pprint.PrettyPrinter(indent=2)
+        pp.pprint(jsonld)
 
 
-async def run_bulk_etl(github_api_token, mongo_collection):
-    async with aiohttp.ClientSession() as session:
+async def run_bulk_etl(github_api_token, mongo_collection, concurrency=16,
+                       host_limits=None, graphql_batch_size=20,
+                       progress_interval=10., http_cache=None,
+                       ingest_state=None, mongodb_batch_size=100,
+                       mongodb_flush_interval=5., sink=None):
+    if host_limits is None:
+        host_limits = HostLimits(limits=DEFAULT_HOST_LIMITS)
+    if mongo_collection is not None:
+        # Upsert records in batches, rather than one at a time.
+        mongo_writer = MongoBulkWriter(mongo_collection,
+                                       batch_size=mongodb_batch_size,
+                                       flush_interval=mongodb_flush_interval)
+        await mongo_writer.start()
+    else:
+        mongo_writer = None
+    async with aiohttp.ClientSession() as client_session:
+        session = HostLimitedSession(client_session, host_limits)
+        if http_cache is not None:
+            session = CachingSession(session, http_cache)
         product_urls = await get_ltd_product_urls(session)
-        await process_ltd_doc_products(session, product_urls,
-                                       github_api_token,
-                                       mongo_collection=mongo_collection)
+        try:
+            await process_ltd_doc_products(
+                session, product_urls, github_api_token,
+                mongo_collection=mongo_writer,
+                concurrency=concurrency,
+                graphql_batch_size=graphql_batch_size,
+                progress_interval=progress_interval,
+                ingest_state=ingest_state,
+                sink=sink)
+        finally:
+            # Write the buffered records, and keep the records of the
+            # products that were ingested, even if the run is interrupted.
+            if mongo_writer is not None:
+                await mongo_writer.close()
+            if ingest_state is not None:
+                ingest_state.save()
 
 
 async def process_ltd_doc_products(session, product_urls, github_api_token,
-                                   mongo_collection=None):
+                                   mongo_collection=None, concurrency=16,
+                                   graphql_batch_size=20,
+                                   progress_interval=10., ingest_state=None,
+                                   sink=None):
     """Run a pipeline to process extract, transform, and load metadata for
     multiple LSST the Docs-hosted projects
 
+    At most ``concurrency`` products are processed at once, and progress is
+    logged as products finish.
+
     Parameters
     ----------
     session : `aiohttp.ClientSession`
@@ -113,18 +375,66 @@ async def process_ltd_doc_products(session, product_urls, github_api_token,
         guide`_.
     mongo_collection : `motor.motor_asyncio.AsyncIOMotorCollection`, optional
         MongoDB collection. This should be the common MongoDB collection for
-        LSST projectmeta JSON-LD records.
+        LSST projectmeta JSON-LD records. A
+        `lsstprojectmeta.mongo.MongoBulkWriter` for the collection can be
+        used instead.
+    concurrency : `int`, optional
+        Maximum number of products processed at once. To also limit the
+        concurrent requests to each host, pass a
+        `lsstprojectmeta.scheduler.HostLimitedSession` as the ``session``.
+    graphql_batch_size : `int`, optional
+        Maximum number of GitHub repositories looked up in a single GraphQL
+        query.
+    progress_interval : `float`, optional
+        Minimum time, in seconds, between progress reports.
+    ingest_state : `lsstprojectmeta.ingeststate.IngestState`, optional
+        If provided, products that are unchanged since their last successful
+        ingest are skipped, and the fingerprints of ingested products are
+        recorded (see `process_ltd_doc`).
+    sink : `NdjsonSink`, optional
+        If provided, each JSON-LD record is passed to the sink's ``write``
+        method as soon as it's produced, rather than returned.
+
+    Returns
+    -------
+    results : `list`
+        JSON-LD-formatted dictionary for each product, in the order of
+        ``product_urls``. The result is `None` for products that couldn't
+        be processed or were skipped, and for every product if a ``sink``
+        is provided (so records aren't kept in memory).
     """
-    tasks = [asyncio.ensure_future(
-             process_ltd_doc(session, github_api_token,
-                             product_url,
-                             mongo_collection=mongo_collection))
-             for product_url in product_urls]
-    await asyncio.gather(*tasks)
+    logger = logging.getLogger(__name__)
+
+    # One client for all GitHub queries, so that they share the rate limit
+    # budget.
+    github_client = GitHubClient(session, github_api_token)
+    github_batcher = GitHubRepoBatcher(github_client,
+                                       batch_size=graphql_batch_size)
+
+    async def process(product_url):
+        jsonld = await process_ltd_doc(session, github_api_token,
+                                       product_url,
+                                       mongo_collection=mongo_collection,
+                                       github_batcher=github_batcher,
+                                       ingest_state=ingest_state)
+        if sink is None:
+            return jsonld
+        if jsonld is not None:
+            sink.write(jsonld)
+
+    scheduler = BoundedScheduler(concurrency=concurrency,
+                                 progress_interval=progress_interval)
+    results = await scheduler.map(process, product_urls)
+    logger.info('GitHub API usage: %r', github_client.metrics)
+    if ingest_state is not None:
+        logger.info('Skipped %d unchanged products, recorded %d ingested '
+                    'products', ingest_state.skipped, ingest_state.recorded)
+    return results
 
 
 async def process_ltd_doc(session, github_api_token, ltd_product_url,
-                          mongo_collection=None):
+                          mongo_collection=None, github_batcher=None,
+                          ingest_state=None):
     """Ingest any kind of LSST document hosted on LSST the Docs from its
     source.
 
@@ -141,12 +451,22 @@ async def process_ltd_doc(session, github_api_token, ltd_product_url,
     mongo_collection : `motor.motor_asyncio.AsyncIOMotorCollection`, optional
         MongoDB collection. This should be the common MongoDB collection for
         LSST projectmeta JSON-LD records. If provided, ths JSON-LD is upserted
-        into the MongoDB collection.
+        into the MongoDB collection. A
+        `lsstprojectmeta.mongo.MongoBulkWriter` for the collection can be
+        used instead.
+    github_batcher : `GitHubRepoBatcher`, optional
+        If provided, GitHub repositories are looked up through this
+        `lsstprojectmeta.github.graphql.GitHubRepoBatcher`.
+    ingest_state : `lsstprojectmeta.ingeststate.IngestState`, optional
+        If provided, the document is skipped if its fingerprint is unchanged
+        since its last successful ingest. After the document is successfully
+        ingested into the MongoDB collection, its fingerprint is recorded.
 
     Returns
     -------
     metadata : `dict`
-        JSON-LD-formatted dictionary.
+        JSON-LD-formatted dictionary, or `None` if the document couldn't be
+        processed or was skipped.
 
     .. `GitHub personal access token guide`: https://ls.st/41d
     """
@@ -161,13 +481,68 @@ async def process_ltd_doc(session, github_api_token, ltd_product_url,
         logger.debug('%s is not a document repo', product_name)
         return
 
+    fingerprint = None
+    if ingest_state is not None:
+        # Fingerprint the sources before processing them, so that changes
+        # made during processing aren't missed by the next ingest.
+        try:
+            fingerprint = await get_ltd_doc_fingerprint(
+                session, github_api_token, ltd_product_data)
+        except Exception:
+            logger.warning('Could not fingerprint %s; processing it in full',
+                           product_name, exc_info=True)
+        else:
+            if ingest_state.is_unchanged(product_name, fingerprint):
+                logger.info('Skipping %s, which is unchanged since its last '
+                            'ingest', product_name)
+                return
+
+    jsonld = await _process_ltd_doc_formats(session, github_api_token,
+                                            ltd_product_data,
+                                            github_batcher=github_batcher)
+
+    if jsonld is not None and mongo_collection is not None:
+        if fingerprint is not None:
+            # Record the fingerprint once the JSON-LD is in MongoDB, which
+            # may be after a MongoBulkWriter's batch is written.
+            on_written = functools.partial(ingest_state.record,
+                                           product_name, fingerprint)
+        else:
+            on_written = None
+        try:
+            await upsert_jsonld(mongo_collection, jsonld,
+                                on_written=on_written)
+        except Exception:
+            logger.exception('Unexpected error trying to upsert %s into '
+                             'MongoDB', product_name)
+            return
+
+    return jsonld
+
+
+async def _process_ltd_doc_formats(session, github_api_token,
+                                   ltd_product_data, github_batcher=None):
+    """Extract and transform metadata for an LSST document hosted on LSST
+    the Docs, trying each document format in turn.
+
+    See `process_ltd_doc` for parameters.
+
+    Returns
+    -------
+    metadata : `dict`
+        JSON-LD-formatted dictionary, or `None` if the document couldn't be
+        processed.
+    """
+    logger = logging.getLogger(__name__)
+    product_name = ltd_product_data['slug']
+
     # Figure out the format of the document by probing for metadata files.
     # reStructuredText-based Sphinx documents have metadata.yaml file.
     try:
         return await process_sphinx_technote(session,
                                              github_api_token,
                                              ltd_product_data,
-                                             mongo_collection=mongo_collection)
+                                             github_batcher=github_batcher)
     except NotSphinxTechnoteError:
         # Catch error so we can try the next format
         logger.debug('%s is not a Sphinx-based technote.', product_name)
@@ -181,8 +556,7 @@ async def process_ltd_doc(session, github_api_token, ltd_product_url,
     try:
         return await process_lander_page(session,
                                          github_api_token,
-                                         ltd_product_data,
-                                         mongo_collection=mongo_collection)
+                                         ltd_product_data)
     except NotLanderPageError:
         # Catch error so we can try the next format
         logger.debug('%s is not a Lander page with a metadata.jsonld file.',
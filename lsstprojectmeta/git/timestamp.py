@@ -2,13 +2,67 @@
 """
 
 __all__ = ('read_git_commit_timestamp', 'read_git_commit_timestamp_for_file',
-           'get_content_commit_date')
+           'read_git_commit_timestamps_for_files', 'get_content_commit_date',
+           'GitTimestampCache', 'get_git_timestamp_cache',
+           'set_git_timestamp_cache')
 
-import itertools
+import codecs
+import collections
 import logging
 import os
+import sqlite3
+import threading
 
-import git
+# GitPython is imported by the functions that use it, because it's slow to
+# import.
+
+
+# The index used by read_git_commit_timestamp_for_file,
+# read_git_commit_timestamps_for_files, and get_content_commit_date. See
+# set_git_timestamp_cache.
+_GIT_TIMESTAMP_CACHE = None
+
+# Date of a commit. timestamp is seconds since the epoch, and tz_offset is
+# the committer's timezone offset in seconds west of UTC (like
+# git.Commit.committer_tz_offset).
+_CommitDate = collections.namedtuple('_CommitDate',
+                                     ['hexsha', 'timestamp', 'tz_offset'])
+
+
+def get_git_timestamp_cache():
+    """Get the commit timestamp index used by
+    `read_git_commit_timestamp_for_file`,
+    `read_git_commit_timestamps_for_files`, and `get_content_commit_date`.
+
+    Returns
+    -------
+    cache : `GitTimestampCache`
+        The active index, or `None` if the index is disabled (the default).
+    """
+    return _GIT_TIMESTAMP_CACHE
+
+
+def set_git_timestamp_cache(cache):
+    """Set the commit timestamp index used by
+    `read_git_commit_timestamp_for_file`,
+    `read_git_commit_timestamps_for_files`, and `get_content_commit_date`.
+
+    Parameters
+    ----------
+    cache : `GitTimestampCache` or `str`
+        A `GitTimestampCache` instance, or the path of an index database file.
+        `None` disables the index.
+
+    Returns
+    -------
+    cache : `GitTimestampCache`
+        The active index, or `None` if the index is disabled.
+    """
+    global _GIT_TIMESTAMP_CACHE
+    if isinstance(cache, str):
+        cache = GitTimestampCache(cache)
+    _GIT_TIMESTAMP_CACHE = cache
+    return cache
 
 
 def read_git_commit_timestamp(repo_path=None, repo=None):
@@ -26,8 +80,7 @@ def read_git_commit_timestamp(repo_path=None, repo=None):
         The datetime of the head commit.
     """
     if repo is None:
-        repo = git.repo.base.Repo(path=repo_path,
-                                  search_parent_directories=True)
+        repo = _open_repo(repo_path)
     head_commit = repo.head.commit
     return head_commit.committed_datetime
 
@@ -55,12 +108,25 @@ def read_git_commit_timestamp_for_file(filepath, repo_path=None, repo=None):
     ------
     IOError
         Raised if the ``filepath`` does not exist in the Git repository.
+
+    Notes
+    -----
+    If a `GitTimestampCache` is enabled with `set_git_timestamp_cache`, the
+    timestamp is read from that index.
     """
     logger = logging.getLogger(__name__)
 
     if repo is None:
-        repo = git.repo.base.Repo(path=repo_path,
-                                  search_parent_directories=True)
+        repo = _open_repo(repo_path)
+
+    if get_git_timestamp_cache() is not None:
+        timestamps = read_git_commit_timestamps_for_files([filepath],
+                                                          repo=repo)
+        try:
+            return timestamps[filepath]
+        except KeyError:
+            raise IOError('File {} not found'.format(filepath))
+
     repo_path = repo.working_tree_dir
 
     head_commit = repo.head.commit
@@ -85,6 +151,72 @@ def read_git_commit_timestamp_for_file(filepath, repo_path=None, repo=None):
     raise IOError('File {} not found'.format(filepath))
 
 
+def read_git_commit_timestamps_for_files(filepaths, repo_path=None,
+                                         repo=None):
+    """Obtain the timestamps for the most recent commits to several files in
+    a Git repository, from a single walk of the repository's history.
+
+    Parameters
+    ----------
+    filepaths : sequence of `str`
+        Absolute or repository-relative paths of files.
+    repo_path : `str`, optional
+        Path to the Git repository. Leave as `None` to use the current working
+        directory or if a ``repo`` argument is provided.
+    repo : `git.Repo`, optional
+        A `git.Repo` instance.
+
+    Returns
+    -------
+    commit_timestamps : `dict`
+        Keys are the items of ``filepaths`` and values are the
+        `datetime.datetime` of the most recent commit to each file. Files that
+        aren't found in the Git history are omitted.
+
+    Notes
+    -----
+    For each file, the timestamp is the same as that from
+    `read_git_commit_timestamp_for_file`, but the history is only walked
+    once, and only until a commit is found for every file. A merge commit
+    counts as a commit to a file if the file differs from all of the merge's
+    parents.
+
+    If a `GitTimestampCache` is enabled with `set_git_timestamp_cache`, the
+    timestamps are read from that index.
+    """
+    from git.objects.util import from_timestamp
+
+    logger = logging.getLogger(__name__)
+
+    if repo is None:
+        repo = _open_repo(repo_path)
+    repo_path = repo.working_tree_dir
+
+    # Map repo-relative paths, as git prints them, to the original filepaths
+    repo_filepaths = collections.defaultdict(list)
+    for filepath in filepaths:
+        rel_filepath = os.path.relpath(os.path.abspath(filepath),
+                                       start=repo_path)
+        repo_filepaths[rel_filepath.replace(os.sep, '/')].append(filepath)
+    logger.debug('Finding commits for %d paths in Git repo at %r',
+                 len(repo_filepaths), repo_path)
+
+    cache = get_git_timestamp_cache()
+    if cache is not None:
+        commit_dates = cache.get_commit_dates(repo, repo_filepaths)
+    else:
+        commit_dates, _ = _find_path_commits(repo, repo.head.commit.hexsha,
+                                             repo_filepaths)
+
+    timestamps = {}
+    for path, commit_date in commit_dates.items():
+        commit_datetime = from_timestamp(commit_date.timestamp,
+                                         commit_date.tz_offset)
+        for filepath in repo_filepaths[path]:
+            timestamps[filepath] = commit_datetime
+    return timestamps
+
+
 def get_content_commit_date(extensions, acceptance_callback=None,
                             root_dir='.'):
     """Get the datetime for the most recent commit to a project that
@@ -128,36 +260,43 @@ def get_content_commit_date(extensions, acceptance_callback=None,
 
     # Cache the repo object for each query
     root_dir = os.path.abspath(root_dir)
-    repo = git.repo.base.Repo(path=root_dir, search_parent_directories=True)
+    repo = _open_repo(root_dir)
 
-    # Iterate over all files with all file extensions, looking for the
-    # newest commit datetime.
-    newest_datetime = None
-    iters = [_iter_filepaths_with_extension(ext, root_dir=root_dir)
-             for ext in extensions]
-    for content_path in itertools.chain(*iters):
+    # Find all files with all file extensions.
+    content_paths = []
+    for content_path in _iter_filepaths_with_extensions(extensions,
+                                                        root_dir=root_dir):
         content_path = os.path.abspath(os.path.join(root_dir, content_path))
 
         if acceptance_callback(content_path):
             logger.debug('Found content path %r', content_path)
-            try:
-                commit_datetime = read_git_commit_timestamp_for_file(
-                    content_path, repo=repo)
-                logger.debug('Commit timestamp of %r is %s',
-                             content_path, commit_datetime)
-            except IOError:
-                logger.warning(
-                    'Count not get commit for %r, skipping',
-                    content_path)
-                continue
+            content_paths.append(content_path)
 
-            if not newest_datetime or commit_datetime > newest_datetime:
-                # Seed initial newest_datetime
-                # or set a newer newest_datetime
-                newest_datetime = commit_datetime
-                logger.debug('Newest commit timestamp is %s', newest_datetime)
+    # Get commit timestamps for all content files from one walk of the
+    # history.
+    commit_datetimes = read_git_commit_timestamps_for_files(content_paths,
+                                                            repo=repo)
 
-        logger.debug('Final commit timestamp is %s', newest_datetime)
+    # Look for the newest commit datetime.
+    newest_datetime = None
+    for content_path in content_paths:
+        try:
+            commit_datetime = commit_datetimes[content_path]
+            logger.debug('Commit timestamp of %r is %s',
+                         content_path, commit_datetime)
+        except KeyError:
+            logger.warning(
+                'Count not get commit for %r, skipping',
+                content_path)
+            continue
+
+        if not newest_datetime or commit_datetime > newest_datetime:
+            # Seed initial newest_datetime
+            # or set a newer newest_datetime
+            newest_datetime = commit_datetime
+            logger.debug('Newest commit timestamp is %s', newest_datetime)
+
+    logger.debug('Final commit timestamp is %s', newest_datetime)
 
     if newest_datetime is None:
         raise RuntimeError('No content files found in {}'.format(root_dir))
@@ -165,6 +304,490 @@ def get_content_commit_date(extensions, acceptance_callback=None,
     return newest_datetime
 
 
+class GitTimestampCache(object):
+    """A persistent index of the most recent commit to each file in Git
+    repositories.
+
+    For each repository, the index maps each path in the tree of the HEAD
+    commit to the most recent commit that changed it, as found by
+    `read_git_commit_timestamp_for_file`. When a repository's HEAD changes,
+    the index is updated by walking only the commits that aren't in the
+    history of the previously indexed HEAD. Queries for paths that aren't
+    in HEAD's tree are answered from Git and remembered until HEAD changes.
+
+    The index is a SQLite database, so several processes can share the
+    same index file.
+
+    Parameters
+    ----------
+    path : `str`
+        Path of the index database file. The file is created if necessary.
+    timeout : `float`, optional
+        Time, in seconds, to wait for another process to release a lock on
+        the index database.
+
+    Examples
+    --------
+    Use an index for all commit timestamp queries:
+
+    .. code-block:: python
+
+       from lsstprojectmeta.git.timestamp import set_git_timestamp_cache
+
+       cache = set_git_timestamp_cache('git-timestamps.sqlite3')
+       # ... run queries
+       print(cache.stats)
+    """
+
+    def __init__(self, path, timeout=30.):
+        super().__init__()
+        self._logger = logging.getLogger(__name__)
+        self.path = os.path.abspath(path)
+        self.timeout = timeout
+
+        self.hits = 0
+        """Number of paths answered from the index by this process (`int`).
+        """
+
+        self.misses = 0
+        """Number of paths looked up in Git by this process because they
+        aren't in the index (`int`).
+        """
+
+        self.updates = 0
+        """Number of times this process indexed a new HEAD commit (`int`).
+        """
+
+        self._lock = threading.Lock()
+        self._connection = None
+        self._connection_pid = None
+
+    def get_commit_dates(self, repo, paths):
+        """Get the most recent commits to paths in a Git repository, updating
+        the repository's index if its HEAD changed.
+
+        Parameters
+        ----------
+        repo : `git.Repo`
+            A `git.Repo` instance.
+        paths : iterable of `str`
+            Repository-relative paths, with ``/`` separators.
+
+        Returns
+        -------
+        commit_dates : `dict`
+            Keys are paths and values are ``_CommitDate`` tuples of the
+            most recent commit to each path. Paths that aren't found in the
+            Git history are omitted.
+        """
+        paths = list(paths)
+        repo_key = _get_repo_key(repo)
+        head_sha = repo.head.commit.hexsha
+
+        with self._lock:
+            connection = self._connect()
+            commit_dates, missing_paths = self._read(
+                connection, repo_key, head_sha, paths)
+            if commit_dates is not None and not missing_paths:
+                self.hits += len(paths)
+                return commit_dates
+
+            with connection:
+                # Take the write lock, and check the index again, so that
+                # concurrent processes don't update the index twice.
+                connection.execute('BEGIN IMMEDIATE')
+                commit_dates, missing_paths = self._read(
+                    connection, repo_key, head_sha, paths)
+                if commit_dates is None:
+                    self._update(connection, repo, repo_key, head_sha)
+                    commit_dates, missing_paths = self._read(
+                        connection, repo_key, head_sha, paths)
+
+                if missing_paths:
+                    found, _ = _find_path_commits(repo, head_sha,
+                                                  missing_paths)
+                    self._write(connection, repo_key,
+                                {path: found.get(path)
+                                 for path in missing_paths})
+                    commit_dates.update(found)
+
+        self.misses += len(missing_paths)
+        self.hits += len(paths) - len(missing_paths)
+        return commit_dates
+
+    def clear(self):
+        """Delete all repositories from the index."""
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                connection.execute('BEGIN IMMEDIATE')
+                connection.execute('DELETE FROM paths')
+                connection.execute('DELETE FROM repos')
+
+    @property
+    def stats(self):
+        """Index statistics for this process (`dict`).
+
+        Keys are ``hits``, ``misses``, and ``updates``.
+        """
+        return {'hits': self.hits,
+                'misses': self.misses,
+                'updates': self.updates}
+
+    def _read(self, connection, repo_key, head_sha, paths):
+        """Read paths from the index.
+
+        Returns
+        -------
+        commit_dates : `dict`
+            The ``_CommitDate`` of each indexed path that has a commit, or
+            `None` if the index isn't for ``head_sha``.
+        missing_paths : `list`
+            Paths that aren't in the index.
+        """
+        row = connection.execute('SELECT head FROM repos WHERE repo = ?',
+                                 (repo_key,)).fetchone()
+        if row is None or row[0] != head_sha:
+            return None, paths
+
+        commit_dates = {}
+        missing_paths = []
+        for path in paths:
+            row = connection.execute(
+                'SELECT hexsha, timestamp, tz_offset FROM paths '
+                'WHERE repo = ? AND path = ?',
+                (repo_key, path)).fetchone()
+            if row is None:
+                missing_paths.append(path)
+            elif row[0] is not None:
+                commit_dates[path] = _CommitDate(*row)
+        return commit_dates, missing_paths
+
+    def _write(self, connection, repo_key, commit_dates):
+        """Write paths to the index. A `None` commit date records that a path
+        has no commit.
+        """
+        connection.executemany(
+            'INSERT OR REPLACE INTO paths '
+            '(repo, path, hexsha, timestamp, tz_offset) '
+            'VALUES (?, ?, ?, ?, ?)',
+            ((repo_key, path) + (tuple(commit_date) if commit_date
+                                 else (None, None, None))
+             for path, commit_date in commit_dates.items()))
+
+    def _update(self, connection, repo, repo_key, head_sha):
+        """Index the tree of a new HEAD commit.
+        """
+        row = connection.execute('SELECT head FROM repos WHERE repo = ?',
+                                 (repo_key,)).fetchone()
+        indexed_sha = row[0] if row is not None else None
+        if indexed_sha is not None and not _has_commit(repo, indexed_sha):
+            # The indexed HEAD no longer exists, like after a rebase and
+            # garbage collection.
+            indexed_sha = None
+
+        tree_paths = _list_tree_paths(repo, head_sha)
+        indexed_paths = set(
+            path for path, in connection.execute(
+                'SELECT path FROM paths WHERE repo = ?', (repo_key,)))
+
+        if indexed_sha is None:
+            self._logger.debug('Indexing %s of Git repo at %r',
+                               head_sha, repo_key)
+            commit_dates, _ = _find_path_commits(repo, head_sha, tree_paths)
+            connection.execute('DELETE FROM paths WHERE repo = ?',
+                               (repo_key,))
+            self._write(connection, repo_key,
+                        {path: commit_dates.get(path) for path in tree_paths})
+        else:
+            self._logger.debug('Updating index of Git repo at %r from %s '
+                               'to %s', repo_key, indexed_sha, head_sha)
+            # Only walk commits that are new since the indexed HEAD.
+            commit_dates, boundary_paths = _find_path_commits(
+                repo, head_sha, tree_paths, exclude_sha=indexed_sha)
+            for boundary_sha, paths in boundary_paths.items():
+                if boundary_sha == indexed_sha:
+                    continue
+                # The path is the same as in an older commit, like the base
+                # of a merged branch. Walk its history from that commit.
+                found, _ = _find_path_commits(repo, boundary_sha, paths)
+                for path in paths:
+                    commit_dates[path] = found.get(path)
+
+            # Remove paths that aren't in the tree, including remembered
+            # queries for the indexed HEAD.
+            connection.executemany(
+                'DELETE FROM paths WHERE repo = ? AND path = ?',
+                ((repo_key, path) for path in indexed_paths - tree_paths))
+            # Index entries of paths that haven't changed since the indexed
+            # HEAD are still valid.
+            unchanged_paths = boundary_paths.get(indexed_sha, set())
+            self._write(connection, repo_key,
+                        {path: commit_dates.get(path)
+                         for path in tree_paths - unchanged_paths})
+
+        connection.execute(
+            'INSERT OR REPLACE INTO repos (repo, head) VALUES (?, ?)',
+            (repo_key, head_sha))
+        self.updates += 1
+
+    def _connect(self):
+        """Get a database connection for this process, creating the schema
+        if necessary.
+        """
+        # SQLite connections can't be shared with forked processes.
+        if self._connection is not None and \
+                self._connection_pid == os.getpid():
+            return self._connection
+
+        dirname = os.path.dirname(self.path)
+        if not os.path.isdir(dirname):
+            os.makedirs(dirname)
+
+        # isolation_level=None lets transactions be managed explicitly.
+        connection = sqlite3.connect(self.path, timeout=self.timeout,
+                                     isolation_level=None,
+                                     check_same_thread=False)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute(
+            'CREATE TABLE IF NOT EXISTS repos ('
+            'repo TEXT PRIMARY KEY, '
+            'head TEXT NOT NULL)')
+        connection.execute(
+            'CREATE TABLE IF NOT EXISTS paths ('
+            'repo TEXT NOT NULL, '
+            'path TEXT NOT NULL, '
+            'hexsha TEXT, '
+            'timestamp INTEGER, '
+            'tz_offset INTEGER, '
+            'PRIMARY KEY (repo, path))')
+        self._connection = connection
+        self._connection_pid = os.getpid()
+        return connection
+
+
+def _open_repo(path):
+    """Open the Git repository that contains a path (the current working
+    directory if ``path`` is `None`).
+    """
+    import git
+
+    return git.repo.base.Repo(path=path, search_parent_directories=True)
+
+
+def _get_repo_key(repo):
+    """Get the key of a repository in a `GitTimestampCache`."""
+    if repo.working_tree_dir is not None:
+        return os.path.abspath(repo.working_tree_dir)
+    else:
+        return os.path.abspath(repo.git_dir)
+
+
+def _has_commit(repo, hexsha):
+    """Test if a repository has a commit."""
+    from git.exc import GitCommandError
+
+    try:
+        repo.git.cat_file('-e', hexsha + '^{commit}')
+    except GitCommandError:
+        return False
+    return True
+
+
+def _list_tree_paths(repo, rev):
+    """Get the paths of all files in the tree of a commit.
+
+    Returns
+    -------
+    paths : `set` of `str`
+        Repository-relative paths, with ``/`` separators.
+    """
+    output = repo.git.ls_tree(rev, r=True, name_only=True, full_tree=True,
+                              z=True, stdout_as_string=False)
+    return set(os.fsdecode(path) for path in output.split(b'\0') if path)
+
+
+def _find_path_commits(repo, rev, paths, exclude_sha=None):
+    """Find the most recent commit to each path from a single walk of a
+    repository's history.
+
+    Parameters
+    ----------
+    repo : `git.Repo`
+        A `git.Repo` instance.
+    rev : `str`
+        Commit to start from.
+    paths : iterable of `str`
+        Repository-relative paths, with ``/`` separators.
+    exclude_sha : `str`, optional
+        Hexsha of a commit whose history isn't walked.
+
+    Returns
+    -------
+    commit_dates : `dict`
+        Keys are paths and values are the ``_CommitDate`` of the most recent
+        commit to each path, as found by ``git rev-list <rev> -- <path>``.
+        Paths that aren't found in the history are omitted.
+    boundary_paths : `dict`
+        Paths whose history continues to a commit in the history of
+        ``exclude_sha``. Keys are the hexshas of those commits, and values
+        are `set` objects of paths. Each path is the same in that commit as
+        in ``rev``.
+    """
+    commit_dates = {}
+
+    # Emulate `git rev-list <rev> -- <path>` (see
+    # read_git_commit_timestamp_for_file) for each path. With default
+    # history simplification, the first commit it finds for a path is on a
+    # single chain from <rev>: a commit that changes the path ends the
+    # chain, and a merge commit continues to the first parent that has the
+    # same version of the path. Otherwise the merge itself is the commit.
+    # waiting_paths maps a commit's hexsha to the paths whose chains
+    # continue to that commit.
+    waiting_paths = {}
+    paths = set(paths)
+    if not paths:
+        return commit_dates, waiting_paths
+    waiting_paths[repo.commit(rev).hexsha] = paths
+
+    revs = [rev]
+    if exclude_sha is not None:
+        revs.append('^' + exclude_sha)
+    # --date-order shows each commit before its parents, so all of the
+    # chains that reach a commit are known when the commit is read. Turning
+    # off core.quotepath prints non-ASCII paths verbatim.
+    process = repo.git(c='core.quotepath=off').log(
+        *revs, pretty='raw', date_order=True, m=True, raw=True,
+        no_abbrev=True, no_renames=True, root=True, as_process=True)
+    try:
+        for commit_date, parent_shas, changes in _iter_commit_changes(
+                process.stdout):
+            paths = waiting_paths.pop(commit_date.hexsha, None)
+            if not paths:
+                continue
+            if len(parent_shas) > 1:
+                # Merge commit; each path follows the first parent with the
+                # same version of the path.
+                for parent_sha in parent_shas:
+                    changed_paths = _intersect(
+                        paths, changes.get(parent_sha, ()))
+                    paths.difference_update(changed_paths)
+                    _add_waiting_paths(waiting_paths, parent_sha, paths)
+                    paths = changed_paths
+                # Any remaining paths differ from all parents.
+                changed_paths = paths
+            else:
+                changed_paths = _intersect(paths, changes.get(None, ()))
+                paths.difference_update(changed_paths)
+                if parent_shas:
+                    _add_waiting_paths(waiting_paths, parent_shas[0], paths)
+            for path in changed_paths:
+                commit_dates[path] = commit_date
+            if not waiting_paths:
+                # Stop walking history as soon as every path's chain has
+                # ended.
+                break
+    finally:
+        process.proc.kill()
+        process.proc.wait()
+
+    # Chains that continue past the walked commits.
+    return commit_dates, waiting_paths
+
+
+def _intersect(paths, changed_paths):
+    """Get the paths that are in ``changed_paths``, iterating over the
+    (usually smaller) ``changed_paths``.
+    """
+    return set(path for path in changed_paths if path in paths)
+
+
+def _add_waiting_paths(waiting_paths, commit_sha, paths):
+    """Add paths whose chains continue to a commit, merging the smaller set
+    into the larger one.
+    """
+    if not paths:
+        return
+    existing_paths = waiting_paths.get(commit_sha)
+    if existing_paths is None:
+        waiting_paths[commit_sha] = paths
+    elif len(existing_paths) < len(paths):
+        paths.update(existing_paths)
+        waiting_paths[commit_sha] = paths
+    else:
+        existing_paths.update(paths)
+
+
+def _iter_commit_changes(stream):
+    """Iterate over the commits printed by
+    ``git log --pretty=raw -m --raw --no-renames``.
+
+    Parameters
+    ----------
+    stream : file-like
+        Binary stream of the ``git log`` output.
+
+    Yields
+    ------
+    commit_date : ``_CommitDate``
+        Hexsha and committer date of the commit.
+    parent_shas : `list` of `str`
+        Hexshas of the commit's parents.
+    changes : `dict`
+        Repo-relative paths changed by the commit, as a `set` of `str`. For a
+        merge commit, keys are the parent hexshas and values are the paths
+        changed relative to that parent (a parent is omitted if nothing
+        changed relative to it). Otherwise the key is `None`.
+    """
+    from git.objects.util import utctz_to_altz
+
+    commit_date = None
+    parent_shas = []
+    changes = {}
+    # Key of changes for the current block of diff lines
+    changes_key = None
+    for line in stream:
+        if line.startswith(b'commit '):
+            # Header of a commit. With -m, a merge commit has a header and
+            # diff for each parent, like 'commit <sha> (from <parent>)'.
+            fields = line.decode('ascii').split()
+            if commit_date is None or fields[1] != commit_date.hexsha:
+                if commit_date is not None:
+                    yield commit_date, parent_shas, changes
+                commit_date = _CommitDate(fields[1], None, None)
+                parent_shas = []
+                changes = {}
+            changes_key = fields[3].rstrip(')') if len(fields) > 3 else None
+            changes.setdefault(changes_key, set())
+        elif line.startswith(b'parent '):
+            # Each header of a merge commit repeats the parents.
+            parent_sha = line.decode('ascii').split()[1]
+            if parent_sha not in parent_shas:
+                parent_shas.append(parent_sha)
+        elif line.startswith(b'committer '):
+            # Like 'committer Name <email> 1500000000 +0100'
+            fields = line.rstrip(b'\n').rsplit(b' ', 2)
+            commit_date = commit_date._replace(
+                timestamp=int(fields[1]),
+                tz_offset=utctz_to_altz(fields[2].decode('ascii')))
+        elif line.startswith(b':'):
+            # Raw diff line, like ':100644 100644 <sha> <sha> M\t<path>'
+            path = line.rstrip(b'\n').split(b'\t', 1)[1]
+            changes[changes_key].add(_decode_git_path(path))
+    if commit_date is not None:
+        yield commit_date, parent_shas, changes
+
+
+def _decode_git_path(path):
+    """Decode a path printed by git, with ``core.quotepath`` turned off.
+
+    Paths with special characters, like tabs and quotes, are C-style quoted.
+    """
+    if path.startswith(b'"') and path.endswith(b'"'):
+        path = codecs.escape_decode(path[1:-1])[0]
+    return os.fsdecode(path)
+
+
 def _iter_filepaths_with_extension(extname, root_dir='.'):
     """Iterative over relative filepaths of files in a directory, and
     sub-directories, with the given extension.
@@ -194,3 +817,42 @@ def _iter_filepaths_with_extension(extname, root_dir='.'):
                 full_filename = os.path.join(dirname, filename)
                 rel_filepath = os.path.relpath(full_filename, start=root_dir)
                 yield rel_filepath
+
+
+def _iter_filepaths_with_extensions(extnames, root_dir='.'):
+    """Iterative over relative filepaths of files in a directory, and
+    sub-directories, with any of the given extensions, walking the directory
+    only once.
+
+    Parameters
+    ----------
+    extnames : sequence of `str`
+        Extension names (such as 'txt' or 'rst'). Extension comparison is
+        case sensitive.
+    root_dir : 'str`, optional
+        Root directory. Current working directory by default.
+
+    Yields
+    ------
+    filepath : `str`
+        File path, relative to ``root_dir``, with one of the given extensions.
+        File paths are grouped by extension, in the order of ``extnames``,
+        like chaining `_iter_filepaths_with_extension` for each extension.
+    """
+    # needed for comparison with os.path.splitext
+    extnames = [extname if extname.startswith('.') else '.' + extname
+                for extname in extnames]
+
+    root_dir = os.path.abspath(root_dir)
+
+    filepaths = collections.defaultdict(list)
+    for dirname, sub_dirnames, filenames in os.walk(root_dir):
+        for filename in filenames:
+            extname = os.path.splitext(filename)[-1]
+            if extname in extnames:
+                full_filename = os.path.join(dirname, filename)
+                rel_filepath = os.path.relpath(full_filename, start=root_dir)
+                filepaths[extname].append(rel_filepath)
+
+    for extname in extnames:
+        yield from filepaths[extname]
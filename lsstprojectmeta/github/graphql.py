@@ -3,16 +3,37 @@
 https://developer.github.com/v4/
 """
 
-__all__ = ('github_request', 'GitHubQuery')
+__all__ = ('github_request', 'GitHubClient', 'GitHubRequestError',
+           'GitHubQuery', 'GitHubRepoBatcher')
 
+import asyncio
+import datetime
+import json
+import logging
 import os
+import re
+import time
+
+import aiohttp
+
+GITHUB_GRAPHQL_URL = 'https://api.github.com/graphql'
+"""URL of the GitHub v4 (GraphQL) API endpoint.
+"""
+
+# Comment that imports a fragment into a pre-made query, like
+# ``#import "technote_repo_fields.graphql"``.
+_IMPORT_PATTERN = re.compile(
+    r'^#import\s+"([\w\-]+)\.graphql"[ \t]*(?:\n|$)', flags=re.M)
 
 
 async def github_request(session, api_token,
                          query=None, mutation=None, variables=None):
     """Send a request to the GitHub v4 (GraphQL) API.
 
-    The request is asynchronous, with asyncio.
+    The request is asynchronous, with asyncio. Requests that hit a rate limit
+    or a server error are retried, as with `GitHubClient.request`. To share
+    a rate limit budget between many requests, use a single `GitHubClient`
+    instead.
 
     Parameters
     ----------
@@ -38,24 +59,320 @@ async def github_request(session, api_token,
     data : `dict`
         Parsed JSON as a `dict` object.
 
+    Raises
+    ------
+    GitHubRequestError
+        Raised if the request still fails after retrying, or if the response
+        isn't JSON.
+
     .. `GitHub personal access token guide`: https://ls.st/41d
     .. `GitHub guide to query and mutation operations`: https://ls.st/9s7
     """
-    payload = {}
-    if query is not None:
-        payload['query'] = str(query)  # converts a GitHubQuery
-    if mutation is not None:
-        payload['mutation'] = str(mutation)  # converts a GitHubQuery
-    if variables is not None:
-        payload['variables'] = variables
+    client = GitHubClient(session, api_token)
+    return await client.request(query=query, mutation=mutation,
+                                variables=variables)
+
+
+class GitHubClient(object):
+    """Client for the GitHub v4 (GraphQL) API that paces requests to stay
+    within GitHub's rate limits.
+
+    The client tracks the remaining rate limit budget from the ``rateLimit``
+    field of query responses and from the ``X-RateLimit-*`` response
+    headers. Before each request, it reserves the cost of the previous query
+    from the remaining budget; if the budget can't cover it, the request
+    waits until the rate limit resets.
+
+    Requests are retried, with exponential backoff, if GitHub responds with
+    a server error (502, 503, or 504), a secondary (abuse) rate limit, a
+    ``RATE_LIMITED`` GraphQL error, or if the connection fails. A
+    ``Retry-After`` header sets the time to wait.
+
+    Parameters
+    ----------
+    session : `aiohttp.ClientSession`
+        Your application's aiohttp client session. All requests use it.
+    api_token : `str`
+        A GitHub personal API token. See the `GitHub personal access token
+        guide`_.
+    max_retries : `int`, optional
+        Maximum number of times a request is retried.
+    backoff : `float`, optional
+        Time, in seconds, to wait before the first retry. The wait doubles
+        with each retry, up to ``max_backoff``.
+    max_backoff : `float`, optional
+        Maximum time, in seconds, to wait before a retry.
+    secondary_backoff : `float`, optional
+        Minimum time, in seconds, to wait after hitting a secondary rate
+        limit, if GitHub doesn't send a ``Retry-After`` header.
+    reserve : `int`, optional
+        Number of rate limit points to leave unused.
+
+    .. `GitHub personal access token guide`: https://ls.st/41d
+    """
+
+    def __init__(self, session, api_token, max_retries=5, backoff=1.,
+                 max_backoff=60., secondary_backoff=60., reserve=0):
+        super().__init__()
+        self._session = session
+        self._api_token = api_token
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.secondary_backoff = secondary_backoff
+        self.reserve = reserve
+        self._logger = logging.getLogger(__name__)
+
+        # Rate limit state, from the most recent response
+        self._remaining = None
+        self._reset_at = None
+        self._cost_estimate = 1
+        # Rate limit points reserved by requests in flight
+        self._reserved = 0
+
+        self._requests = 0
+        self._retries = 0
+        self._cost = 0
+        self._waited = 0.
+
+        # Hooks for tests
+        self._clock = time.time
+        self._sleep = asyncio.sleep
+
+    @property
+    def metrics(self):
+        """Snapshot of the client's API usage (`dict`).
+
+        Keys are:
+
+        - ``requests``: number of HTTP requests sent, including retries.
+        - ``retries``: number of retried requests.
+        - ``cost``: rate limit points used by queries (from the ``rateLimit``
+          field, or 1 for responses without it).
+        - ``remaining``: rate limit points remaining, if known.
+        - ``reset_at``: time when the rate limit resets
+          (`datetime.datetime`, in UTC), if known.
+        - ``waited``: time, in seconds, spent waiting for rate limits and
+          backoffs.
+        """
+        if self._reset_at is not None:
+            reset_at = datetime.datetime.fromtimestamp(
+                self._reset_at, tz=datetime.timezone.utc)
+        else:
+            reset_at = None
+        return {'requests': self._requests,
+                'retries': self._retries,
+                'cost': self._cost,
+                'remaining': self._remaining,
+                'reset_at': reset_at,
+                'waited': self._waited}
+
+    async def request(self, query=None, mutation=None, variables=None):
+        """Send a request to the GitHub v4 (GraphQL) API.
+
+        Parameters
+        ----------
+        query : `str` or `GitHubQuery`
+            GraphQL query string. If provided, then the ``mutation``
+            parameter should not be set.
+        mutation : `str` or `GitHubQuery`
+            GraphQL mutation string. If provided, then the ``query``
+            parameter should not be set.
+        variables : `dict`
+            GraphQL variables, as a JSON-compatible dictionary.
+
+        Returns
+        -------
+        data : `dict`
+            Parsed JSON as a `dict` object.
+
+        Raises
+        ------
+        GitHubRequestError
+            Raised if the request still fails after ``max_retries`` retries,
+            or if the response isn't JSON.
+        """
+        payload = {}
+        if query is not None:
+            payload['query'] = str(query)  # converts a GitHubQuery
+        if mutation is not None:
+            payload['mutation'] = str(mutation)  # converts a GitHubQuery
+        if variables is not None:
+            payload['variables'] = variables
+
+        headers = {'Authorization': 'token {}'.format(self._api_token)}
+
+        attempt = 0
+        while True:
+            estimate = await self._reserve_budget()
+            status = None
+            response_headers = {}
+            data = None
+            error = None
+            try:
+                self._requests += 1
+                async with self._session.post(GITHUB_GRAPHQL_URL,
+                                              json=payload,
+                                              headers=headers) as response:
+                    status = response.status
+                    response_headers = response.headers
+                    text = await response.text()
+                try:
+                    data = json.loads(text)
+                except ValueError:
+                    data = None
+            except (aiohttp.ClientConnectionError,
+                    asyncio.TimeoutError) as err:
+                error = err
+            finally:
+                self._reserved -= estimate
+
+            if error is None:
+                self._update_rate_limit(response_headers, data)
+                delay = self._get_retry_delay(status, response_headers, data,
+                                              attempt)
+            else:
+                delay = self._get_backoff(attempt)
+
+            if delay is None:
+                if data is None:
+                    raise GitHubRequestError(
+                        'GitHub responded with status {0} and a non-JSON '
+                        'body'.format(status),
+                        status=status)
+                return data
+
+            if attempt >= self.max_retries:
+                if error is not None:
+                    message = 'GitHub request failed: {0!r}'.format(error)
+                else:
+                    message = 'GitHub request failed with status {0}'.format(
+                        status)
+                raise GitHubRequestError(message, status=status, data=data)
+
+            self._logger.warning(
+                'GitHub request failed (status %s, %r); retrying in %.1f s',
+                status, error, delay)
+            attempt += 1
+            self._retries += 1
+            await self._wait(delay)
+
+    async def _reserve_budget(self):
+        """Wait until the rate limit budget can cover a request, and reserve
+        the request's estimated cost.
+        """
+        estimate = self._cost_estimate
+        while self._remaining is not None and \
+                self._remaining - self._reserved < estimate + self.reserve:
+            if self._reset_at is None:
+                delay = self.max_backoff
+            else:
+                delay = self._reset_at - self._clock() + 1.
+            if delay <= 0.:
+                break
+            self._logger.warning(
+                'GitHub rate limit budget is spent (%d points remaining); '
+                'waiting %.0f s for it to reset', self._remaining, delay)
+            await self._wait(delay)
+            # The rate limit has reset, but the new budget isn't known until
+            # the next response.
+            if self._reset_at is None or self._reset_at <= self._clock():
+                self._remaining = None
+                self._reset_at = None
+        self._reserved += estimate
+        return estimate
+
+    def _update_rate_limit(self, headers, data):
+        """Update the rate limit state from a response."""
+        remaining = headers.get('X-RateLimit-Remaining')
+        if remaining is not None:
+            self._remaining = int(remaining)
+        reset_at = headers.get('X-RateLimit-Reset')
+        if reset_at is not None:
+            self._reset_at = float(reset_at)
+
+        try:
+            rate_limit = data['data']['rateLimit']
+        except (KeyError, TypeError):
+            rate_limit = None
+        if rate_limit:
+            if rate_limit.get('remaining') is not None:
+                self._remaining = rate_limit['remaining']
+            if rate_limit.get('cost') is not None:
+                self._cost += rate_limit['cost']
+                self._cost_estimate = max(1, rate_limit['cost'])
+        elif data is not None:
+            # Queries have a minimum cost of 1 point
+            self._cost += 1
+
+    def _get_retry_delay(self, status, headers, data, attempt):
+        """Get the time to wait before retrying a request, or `None` if the
+        response shouldn't be retried.
+        """
+        if status in (502, 503, 504):
+            return self._get_retry_after(headers, self._get_backoff(attempt))
+
+        if status in (403, 429):
+            retry_after = self._get_retry_after(headers, None)
+            if retry_after is not None:
+                return retry_after
+            if headers.get('X-RateLimit-Remaining') == '0':
+                return self._get_reset_delay(attempt)
+            message = ''
+            if isinstance(data, dict):
+                message = str(data.get('message', '')).lower()
+            if 'secondary rate limit' in message or 'abuse' in message:
+                return max(self.secondary_backoff,
+                           self._get_backoff(attempt))
+            return None
 
-    headers = {'Authorization': 'token {}'.format(api_token)}
+        if isinstance(data, dict):
+            for error in data.get('errors') or []:
+                if isinstance(error, dict) and \
+                        error.get('type') == 'RATE_LIMITED':
+                    return self._get_retry_after(
+                        headers, self._get_reset_delay(attempt))
 
-    url = 'https://api.github.com/graphql'
-    async with session.post(url, json=payload, headers=headers) as response:
-        data = await response.json()
+        return None
 
-    return data
+    def _get_retry_after(self, headers, default):
+        try:
+            return max(0., float(headers['Retry-After']))
+        except (KeyError, ValueError):
+            return default
+
+    def _get_backoff(self, attempt):
+        return min(self.max_backoff, self.backoff * 2 ** attempt)
+
+    def _get_reset_delay(self, attempt):
+        if self._reset_at is not None:
+            delay = self._reset_at - self._clock() + 1.
+            if delay > 0.:
+                return delay
+        return self._get_backoff(attempt)
+
+    async def _wait(self, delay):
+        self._waited += delay
+        await self._sleep(delay)
+
+
+class GitHubRequestError(Exception):
+    """Exception raised when a GitHub API request fails.
+
+    Parameters
+    ----------
+    message : `str`
+        Error message.
+    status : `int`, optional
+        HTTP status code of the last response, if any.
+    data : `dict`, optional
+        Parsed JSON body of the last response, if any.
+    """
+
+    def __init__(self, message, status=None, data=None):
+        super().__init__(message)
+        self.status = status
+        self.data = data
 
 
 class GitHubQuery(object):
@@ -82,7 +399,9 @@ class GitHubQuery(object):
 
         These queries are distributed with lsstprojectmeta. See
         :file:`lsstrojectmeta/data/githubv4/README.rst` inside the
-        package repository for details on available queries.
+        package repository for details on available queries. Fragments that
+        the query imports with ``#import "<name>.graphql"`` comments replace
+        those comments, at the end of the query.
 
         Parameters
         ----------
@@ -103,7 +422,205 @@ class GitHubQuery(object):
         with open(template_path) as f:
             query_data = f.read()
 
+        # Replace the import comments by the fragments they import, at the
+        # end of the query
+        fragment_names = _IMPORT_PATTERN.findall(query_data)
+        query_data = _IMPORT_PATTERN.sub('', query_data)
+        for fragment_name in fragment_names:
+            query_data += '\n' + str(cls.load(fragment_name))
+
         return cls(query_data, name=query_name)
 
     def __str__(self):
         return self.query
+
+
+class GitHubRepoBatcher(object):
+    """Batch ``technote_repo`` GitHub GraphQL lookups of many repositories
+    into single queries.
+
+    Lookups that are requested at about the same time (within ``delay``
+    seconds of the first pending lookup) are combined into one query, up to
+    ``batch_size`` repositories per query. Each repository is a separate
+    field of the query with its own alias, and each caller gets a result
+    shaped like the response to the ``technote_repo`` query for that
+    repository alone.
+
+    Parameters
+    ----------
+    client : `GitHubClient`
+        Client that sends the batched queries.
+    batch_size : `int`, optional
+        Maximum number of repositories in a query.
+    delay : `float`, optional
+        Maximum time, in seconds, that a lookup waits for others to join its
+        batch.
+
+    Examples
+    --------
+    .. code-block:: python
+
+       batcher = GitHubRepoBatcher(GitHubClient(session, api_token))
+       github_data = await batcher.technote_repo('lsst-sqre', 'sqr-000')
+    """
+
+    def __init__(self, client, batch_size=20, delay=0.05):
+        super().__init__()
+        if batch_size < 1:
+            raise ValueError(
+                'batch_size must be at least 1: {0!r}'.format(batch_size))
+        self._client = client
+        self.batch_size = batch_size
+        self.delay = delay
+        self._pending = []
+        self._flush_handle = None
+        self._send_tasks = set()
+        self._fragment = None
+
+        self.lookups = 0
+        """Number of repository lookups requested (`int`)."""
+
+        self.requests = 0
+        """Number of GraphQL requests sent (`int`)."""
+
+    async def technote_repo(self, owner, name):
+        """Look up a technote repository, batched with other lookups.
+
+        Parameters
+        ----------
+        owner : `str`
+            Repository owner or organization.
+        name : `str`
+            Repository name.
+
+        Returns
+        -------
+        data : `dict`
+            Response to the ``technote_repo`` query for this repository.
+            The ``rateLimit`` field is for the whole batched query, and
+            ``errors`` only has the errors for this repository, if any.
+        """
+        loop = asyncio.get_event_loop()
+        future = loop.create_future()
+        self._pending.append(((owner, name), future))
+        self.lookups += 1
+        if len(self._pending) >= self.batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.delay, self._flush)
+        return await future
+
+    def _flush(self):
+        """Send the pending lookups as a batched query."""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self._pending = self._pending, []
+        if batch:
+            # Keep a reference so the task isn't garbage collected while
+            # it's running.
+            task = asyncio.ensure_future(self._send(batch))
+            self._send_tasks.add(task)
+            task.add_done_callback(self._send_tasks.discard)
+
+    async def _send(self, batch):
+        repos = []
+        for repo, _ in batch:
+            if repo not in repos:
+                repos.append(repo)
+        query, variables = self._build_query(repos)
+        self.requests += 1
+        try:
+            data = await self._client.request(query=query,
+                                              variables=variables)
+            results = self._split_response(data, repos)
+        except Exception as exception:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(exception)
+            return
+
+        for repo, future in batch:
+            if not future.done():
+                future.set_result(results[repos.index(repo)])
+
+    def _build_query(self, repos):
+        """Build a query that looks up several repositories.
+
+        Parameters
+        ----------
+        repos : `list` of `tuple`
+            ``(owner, name)`` tuples of the repositories. The repository
+            at index ``i`` has the alias ``repo<i>``.
+
+        Returns
+        -------
+        query : `GitHubQuery`
+            Batched query.
+        variables : `dict`
+            Variables for the query.
+        """
+        if self._fragment is None:
+            self._fragment = str(GitHubQuery.load('technote_repo_fields'))
+
+        variables = {}
+        variable_definitions = []
+        fields = []
+        for i, (owner, name) in enumerate(repos):
+            variables['owner{0:d}'.format(i)] = owner
+            variables['name{0:d}'.format(i)] = name
+            variable_definitions.append(
+                '$owner{0:d}: String!, $name{0:d}: String!'.format(i))
+            fields.append(
+                '  repo{0:d}: repository(owner: $owner{0:d}, '
+                'name: $name{0:d}) {{\n'
+                '    ...technoteRepoFields\n'
+                '  }}\n'.format(i))
+
+        query = (
+            'query ({0}) {{\n'
+            '  rateLimit {{\n'
+            '    remaining\n'
+            '    cost\n'
+            '  }}\n'
+            '{1}'
+            '}}\n'
+            '{2}'.format(', '.join(variable_definitions),
+                         ''.join(fields),
+                         self._fragment))
+        return GitHubQuery(query, name='technote_repo_batch'), variables
+
+    @staticmethod
+    def _split_response(data, repos):
+        """Split the response to a batched query into a ``technote_repo``
+        response for each repository.
+        """
+        if not isinstance(data, dict) or not data.get('data'):
+            # The query failed as a whole (such as bad credentials), so
+            # every lookup gets the same response.
+            return [data] * len(repos)
+
+        aliases = ['repo{0:d}'.format(i) for i in range(len(repos))]
+        errors = {alias: [] for alias in aliases}
+        shared_errors = []
+        for error in data.get('errors', []):
+            path = error.get('path') or []
+            if path and path[0] in errors:
+                error = dict(error)
+                error['path'] = ['repository'] + list(path[1:])
+                errors[path[0]].append(error)
+            else:
+                shared_errors.append(error)
+
+        results = []
+        for alias in aliases:
+            result = {
+                'data': {
+                    'rateLimit': data['data'].get('rateLimit'),
+                    'repository': data['data'].get(alias)
+                }
+            }
+            if errors[alias] or shared_errors:
+                result['errors'] = errors[alias] + shared_errors
+            results.append(result)
+        return results
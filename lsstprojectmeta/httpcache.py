@@ -0,0 +1,553 @@
+"""Persistent cache of HTTP GET responses, revalidated with conditional
+requests.
+"""
+
+__all__ = ('HttpCache', 'CachingSession', 'CachedResponse', 'parse_response')
+
+from collections import namedtuple
+import hashlib
+import json
+import logging
+import os
+import pickle
+import sqlite3
+import sys
+import threading
+import time
+
+from multidict import CIMultiDict, CIMultiDictProxy
+
+from . import __version__
+from .scheduler import run_cpu_bound
+
+# Response headers that are stored with a cached body.
+_STORED_HEADERS = ('Content-Type', 'ETag', 'Last-Modified')
+
+# Validator headers, which are refreshed by ``304 Not Modified`` responses.
+_VALIDATOR_HEADERS = ('ETag', 'Last-Modified')
+
+_CacheEntry = namedtuple('_CacheEntry', ['headers', 'body', 'digest'])
+
+
+class HttpCache(object):
+    """An on-disk cache of HTTP response bodies and their validators
+    (``ETag`` and ``Last-Modified`` headers).
+
+    Use the cache through a `CachingSession`. Responses are cached if they
+    have a validator, and the cached body is served when the server
+    responds to a conditional request with ``304 Not Modified``. The cache
+    also stores values parsed from cached bodies (see `parse_response`).
+
+    The cache is a SQLite database, so several processes can share the same
+    cache file. There is one entry for each URL, so the cache's size is
+    bounded by the number of URLs that are fetched.
+
+    Parameters
+    ----------
+    path : `str`
+        Path of the cache database file. The file is created if necessary.
+    timeout : `float`, optional
+        Time, in seconds, to wait for another process to release a lock on
+        the cache database.
+
+    Notes
+    -----
+    Parsed values are stored with `pickle`, so only use a cache file that
+    you trust.
+    """
+
+    def __init__(self, path, timeout=30.):
+        super().__init__()
+        self._logger = logging.getLogger(__name__)
+        self.path = os.path.abspath(path)
+        self.timeout = timeout
+
+        self.hits = 0
+        """Number of responses served from the cache after a ``304 Not
+        Modified`` response, by this process (`int`).
+        """
+
+        self.misses = 0
+        """Number of full responses received by this process (`int`)."""
+
+        self.parse_hits = 0
+        """Number of parsed values served from the cache by this process
+        (`int`).
+        """
+
+        self._lock = threading.Lock()
+        self._connection = None
+        self._connection_pid = None
+
+    def get(self, url):
+        """Get the cached response for a URL.
+
+        Parameters
+        ----------
+        url : `str`
+            URL.
+
+        Returns
+        -------
+        entry : ``_CacheEntry``
+            Named tuple with ``headers`` (`dict`), ``body`` (`bytes`), and
+            ``digest`` (`str`, the SHA-256 digest of the body) fields, or
+            `None` if the URL isn't cached.
+        """
+        with self._lock:
+            connection = self._connect()
+            row = connection.execute(
+                'SELECT headers, body, digest FROM responses WHERE url = ?',
+                (url,)).fetchone()
+        if row is None:
+            return None
+        return _CacheEntry(headers=json.loads(row[0]), body=row[1],
+                           digest=row[2])
+
+    def set(self, url, headers, body):
+        """Cache a response, if it has a validator and allows storage.
+
+        Parameters
+        ----------
+        url : `str`
+            URL.
+        headers : `multidict.CIMultiDictProxy` or `dict`
+            Response headers.
+        body : `bytes`
+            Response body.
+
+        Returns
+        -------
+        entry : ``_CacheEntry``
+            The cached entry, or `None` if the response wasn't cached.
+        """
+        headers = CIMultiDict(headers)
+        if 'ETag' not in headers and 'Last-Modified' not in headers:
+            return None
+        if 'no-store' in headers.get('Cache-Control', '').lower():
+            return None
+
+        stored_headers = {name: headers[name] for name in _STORED_HEADERS
+                          if name in headers}
+        digest = hashlib.sha256(body).hexdigest()
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                connection.execute('BEGIN IMMEDIATE')
+                row = connection.execute(
+                    'SELECT digest FROM responses WHERE url = ?',
+                    (url,)).fetchone()
+                connection.execute(
+                    'INSERT OR REPLACE INTO responses '
+                    '(url, headers, body, digest, stored) '
+                    'VALUES (?, ?, ?, ?, ?)',
+                    (url, json.dumps(stored_headers), body, digest,
+                     time.time()))
+                if row is not None and row[0] != digest:
+                    self._delete_unused_parsed(connection, row[0])
+        return _CacheEntry(headers=stored_headers, body=body, digest=digest)
+
+    def refresh(self, url, headers):
+        """Update the validators of a cached response from the headers of a
+        ``304 Not Modified`` response.
+
+        Parameters
+        ----------
+        url : `str`
+            URL.
+        headers : `multidict.CIMultiDictProxy` or `dict`
+            Headers of the ``304 Not Modified`` response.
+
+        Returns
+        -------
+        entry : ``_CacheEntry``
+            The cached entry, with the refreshed validators, or `None` if
+            the URL isn't cached.
+        """
+        headers = CIMultiDict(headers)
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                connection.execute('BEGIN IMMEDIATE')
+                row = connection.execute(
+                    'SELECT headers, body, digest FROM responses '
+                    'WHERE url = ?', (url,)).fetchone()
+                if row is None:
+                    return None
+                stored_headers = json.loads(row[0])
+                validators = {name: headers[name]
+                              for name in _VALIDATOR_HEADERS
+                              if name in headers}
+                if any(stored_headers.get(name) != value
+                       for name, value in validators.items()):
+                    stored_headers.update(validators)
+                    connection.execute(
+                        'UPDATE responses SET headers = ? WHERE url = ?',
+                        (json.dumps(stored_headers), url))
+        return _CacheEntry(headers=stored_headers, body=row[1],
+                           digest=row[2])
+
+    def get_parsed(self, digest, parser_name):
+        """Get a cached value parsed from a response body.
+
+        Parameters
+        ----------
+        digest : `str`
+            SHA-256 digest of the response body.
+        parser_name : `str`
+            Name of the parser.
+
+        Returns
+        -------
+        found : `bool`
+            `True` if a parsed value is cached.
+        value
+            The parsed value, or `None` if it's not cached.
+        """
+        with self._lock:
+            connection = self._connect()
+            row = connection.execute(
+                'SELECT value FROM parsed WHERE digest = ? AND parser = ?',
+                (digest, parser_name)).fetchone()
+        if row is None:
+            return False, None
+        try:
+            value = pickle.loads(row[0])
+        except Exception:
+            self._logger.warning('Could not load parsed value of %s from '
+                                 'the HTTP cache', digest, exc_info=True)
+            return False, None
+        self.parse_hits += 1
+        return True, value
+
+    def set_parsed(self, digest, parser_name, value):
+        """Cache a value parsed from a cached response body.
+
+        Parameters
+        ----------
+        digest : `str`
+            SHA-256 digest of the response body.
+        parser_name : `str`
+            Name of the parser.
+        value
+            Parsed value. It must be picklable.
+        """
+        try:
+            data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception:
+            self._logger.debug('Not caching unpicklable parsed value',
+                               exc_info=True)
+            return
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                connection.execute('BEGIN IMMEDIATE')
+                # Only keep parsed values of bodies that are cached.
+                if connection.execute(
+                        'SELECT 1 FROM responses WHERE digest = ? LIMIT 1',
+                        (digest,)).fetchone() is None:
+                    return
+                connection.execute(
+                    'INSERT OR REPLACE INTO parsed (digest, parser, value) '
+                    'VALUES (?, ?, ?)',
+                    (digest, parser_name, data))
+
+    def clear(self):
+        """Delete all entries from the cache."""
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                connection.execute('BEGIN IMMEDIATE')
+                connection.execute('DELETE FROM responses')
+                connection.execute('DELETE FROM parsed')
+
+    def __len__(self):
+        with self._lock:
+            connection = self._connect()
+            row = connection.execute(
+                'SELECT COUNT(*) FROM responses').fetchone()
+        return row[0]
+
+    @property
+    def stats(self):
+        """Cache statistics for this process (`dict`).
+
+        Keys are ``hits``, ``misses``, and ``parse_hits``.
+        """
+        return {'hits': self.hits,
+                'misses': self.misses,
+                'parse_hits': self.parse_hits}
+
+    def _delete_unused_parsed(self, connection, digest):
+        if connection.execute(
+                'SELECT 1 FROM responses WHERE digest = ? LIMIT 1',
+                (digest,)).fetchone() is None:
+            connection.execute('DELETE FROM parsed WHERE digest = ?',
+                               (digest,))
+
+    def _connect(self):
+        """Get a database connection for this process, creating the schema
+        if necessary.
+        """
+        # SQLite connections can't be shared with forked processes.
+        if self._connection is not None and \
+                self._connection_pid == os.getpid():
+            return self._connection
+
+        dirname = os.path.dirname(self.path)
+        if not os.path.isdir(dirname):
+            os.makedirs(dirname)
+
+        # isolation_level=None lets transactions be managed explicitly.
+        connection = sqlite3.connect(self.path, timeout=self.timeout,
+                                     isolation_level=None,
+                                     check_same_thread=False)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute(
+            'CREATE TABLE IF NOT EXISTS responses ('
+            'url TEXT PRIMARY KEY, '
+            'headers TEXT NOT NULL, '
+            'body BLOB NOT NULL, '
+            'digest TEXT NOT NULL, '
+            'stored REAL NOT NULL)')
+        connection.execute(
+            'CREATE INDEX IF NOT EXISTS responses_digest '
+            'ON responses (digest)')
+        connection.execute(
+            'CREATE TABLE IF NOT EXISTS parsed ('
+            'digest TEXT NOT NULL, '
+            'parser TEXT NOT NULL, '
+            'value BLOB NOT NULL, '
+            'PRIMARY KEY (digest, parser))')
+        self._connection = connection
+        self._connection_pid = os.getpid()
+        return connection
+
+
+class CachingSession(object):
+    """Wrapper around an `aiohttp.ClientSession` that caches ``GET``
+    responses in an `HttpCache`.
+
+    ``GET`` requests for cached URLs are sent with ``If-None-Match`` and
+    ``If-Modified-Since`` headers. If the server responds with ``304 Not
+    Modified``, the request yields a `CachedResponse` with the cached body
+    and a ``200`` status, and any new validators in the ``304`` response
+    replace the cached ones. Successful (``200``) responses are read, cached,
+    and yielded as a `CachedResponse`. Other responses, and other methods,
+    are passed through unchanged.
+
+    Parameters
+    ----------
+    session : `aiohttp.ClientSession` or `HostLimitedSession`
+        Session that makes the requests.
+    cache : `HttpCache`
+        The cache.
+
+    Examples
+    --------
+    .. code-block:: python
+
+       session = CachingSession(client_session, HttpCache('http.sqlite3'))
+       async with session.get(url) as response:
+           response.raise_for_status()
+           data = await response.json()
+    """
+
+    def __init__(self, session, cache):
+        super().__init__()
+        self._session = session
+        self.cache = cache
+
+    def get(self, url, **kwargs):
+        """Make a ``GET`` request, revalidating a cached response.
+
+        Parameters
+        ----------
+        url : `str`
+            URL.
+        **kwargs
+            Keyword arguments for `aiohttp.ClientSession.get`.
+
+        Returns
+        -------
+        request : asynchronous context manager
+            Asynchronous context manager that yields a `CachedResponse` for
+            successful responses, or the `aiohttp.ClientResponse` otherwise.
+        """
+        return _CachingRequest(self._session, self.cache, url, kwargs)
+
+    def request(self, method, url, **kwargs):
+        """Make a request (see `get`). Only ``GET`` requests are cached."""
+        if method.upper() == 'GET':
+            return self.get(url, **kwargs)
+        return self._session.request(method, url, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._session, name)
+
+
+class _CachingRequest(object):
+    """Asynchronous context manager for a ``GET`` request made through a
+    `CachingSession`.
+    """
+
+    def __init__(self, session, cache, url, kwargs):
+        self._session = session
+        self._cache = cache
+        self._url = url
+        self._kwargs = kwargs
+        self._request = None
+
+    async def __aenter__(self):
+        entry = self._cache.get(self._url)
+        kwargs = dict(self._kwargs)
+        headers = dict(kwargs.pop('headers', None) or {})
+        if entry is not None:
+            if 'ETag' in entry.headers:
+                headers['If-None-Match'] = entry.headers['ETag']
+            if 'Last-Modified' in entry.headers:
+                headers['If-Modified-Since'] = entry.headers['Last-Modified']
+
+        self._request = self._session.get(self._url, headers=headers,
+                                          **kwargs)
+        response = await self._request.__aenter__()
+
+        # Release the inner request (and its connection and host slot) if
+        # reading or caching the response fails, since __aexit__ isn't
+        # called when __aenter__ raises.
+        try:
+            if response.status == 304 and entry is not None:
+                self._cache.hits += 1
+                # The server can send new validators for an unchanged body.
+                entry = self._cache.refresh(self._url,
+                                            response.headers) or entry
+                return CachedResponse(self._url, entry.headers, entry.body,
+                                      digest=entry.digest, cache=self._cache,
+                                      from_cache=True)
+            elif response.status == 200:
+                self._cache.misses += 1
+                body = await response.read()
+                stored = self._cache.set(self._url, response.headers, body)
+                return CachedResponse(
+                    self._url, response.headers, body,
+                    digest=stored.digest if stored is not None else None,
+                    cache=self._cache if stored is not None else None,
+                    from_cache=False)
+            else:
+                return response
+        except BaseException:
+            await self._request.__aexit__(*sys.exc_info())
+            raise
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return await self._request.__aexit__(exc_type, exc, tb)
+
+
+class CachedResponse(object):
+    """A successful response from a `CachingSession`, with the same reading
+    methods as `aiohttp.ClientResponse`.
+
+    Parameters
+    ----------
+    url : `str`
+        URL of the request.
+    headers : `dict` or `multidict.CIMultiDictProxy`
+        Response headers. For responses served from the cache, these are the
+        ``Content-Type``, ``ETag``, and ``Last-Modified`` headers of the
+        cached response.
+    body : `bytes`
+        Response body.
+    digest : `str`, optional
+        SHA-256 digest of the body, if the response is cached.
+    cache : `HttpCache`, optional
+        The cache that stores the response, if it is cached.
+    from_cache : `bool`, optional
+        `True` if the body was served from the cache.
+    """
+
+    status = 200
+    """HTTP status code (`int`). Always ``200``."""
+
+    def __init__(self, url, headers, body, digest=None, cache=None,
+                 from_cache=False):
+        self.url = url
+        self.headers = CIMultiDictProxy(CIMultiDict(headers))
+        self.body = body
+        self.digest = digest
+        self.cache = cache
+        self.from_cache = from_cache
+
+    @property
+    def charset(self):
+        """Character set of the body, from the ``Content-Type`` header
+        (`str` or `None`).
+        """
+        content_type = self.headers.get('Content-Type', '')
+        for param in content_type.split(';')[1:]:
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'charset':
+                return value.strip().strip('"')
+        return None
+
+    def raise_for_status(self):
+        """Do nothing, since the response is successful."""
+
+    async def read(self):
+        """Get the response body (`bytes`)."""
+        return self.body
+
+    async def text(self, encoding=None):
+        """Get the response body as text (`str`).
+
+        The body is decoded with ``encoding``, or the character set of the
+        ``Content-Type`` header, or UTF-8.
+        """
+        if encoding is None:
+            encoding = self.charset or 'utf-8'
+        return self.body.decode(encoding, errors='replace')
+
+    async def json(self, encoding=None, loads=json.loads, **kwargs):
+        """Parse the response body as JSON."""
+        return loads(await self.text(encoding=encoding))
+
+    def release(self):
+        """Do nothing, since the body has already been read."""
+
+
+async def parse_response(response, parser, parser_name=None):
+    """Parse the text of a response in an executor, reusing the parsed
+    value if the response body is unchanged from a previous run.
+
+    Parameters
+    ----------
+    response : `CachedResponse` or `aiohttp.ClientResponse`
+        Response. Only cached responses from a `CachingSession` reuse parsed
+        values.
+    parser : callable
+        Function that parses the response text. It runs in an executor (see
+        `lsstprojectmeta.scheduler.run_cpu_bound`).
+    parser_name : `str`, optional
+        Name that identifies the parser in the cache. The default is the
+        parser's module and qualified name, with the lsstprojectmeta version,
+        so that values parsed by earlier versions aren't reused. If you
+        provide a name, change it when the parser's output changes.
+
+    Returns
+    -------
+    value
+        Return value of ``parser``.
+    """
+    cache = getattr(response, 'cache', None)
+    digest = getattr(response, 'digest', None)
+    if cache is None or digest is None:
+        return await run_cpu_bound(parser, await response.text())
+
+    if parser_name is None:
+        parser_name = '{0}.{1} {2}'.format(parser.__module__,
+                                           parser.__qualname__, __version__)
+    found, value = cache.get_parsed(digest, parser_name)
+    if found:
+        return value
+    value = await run_cpu_bound(parser, await response.text())
+    cache.set_parsed(digest, parser_name, value)
+    return value
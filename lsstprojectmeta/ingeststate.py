@@ -0,0 +1,207 @@
+"""State of incremental ingests: fingerprints of the sources of each
+ingested LSST the Docs product.
+"""
+
+__all__ = ('IngestState', 'get_ltd_doc_fingerprint')
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+from urllib.parse import urljoin
+
+from . import __version__
+from .github.urls import parse_repo_slug_from_url, normalize_repo_root_url
+
+
+class IngestState(object):
+    """Fingerprints of the LSST the Docs products that were successfully
+    ingested, stored in a local JSON file.
+
+    Parameters
+    ----------
+    path : `str`
+        Path of the state file. It's read if it exists, and created by
+        `save`.
+
+    Examples
+    --------
+    .. code-block:: python
+
+       state = IngestState('ingest-state.json')
+       fingerprint = await get_ltd_doc_fingerprint(session, token, product)
+       if not state.is_unchanged(product['slug'], fingerprint):
+           # ... ingest the product
+           state.record(product['slug'], fingerprint)
+       state.save()
+    """
+
+    def __init__(self, path):
+        super().__init__()
+        self._logger = logging.getLogger(__name__)
+        self.path = os.path.abspath(path)
+        self._fingerprints = {}
+        if os.path.exists(self.path):
+            with open(self.path, encoding='utf-8') as f:
+                data = json.load(f)
+            self._fingerprints = data.get('products', {})
+
+        self.skipped = 0
+        """Number of unchanged products skipped in this process (`int`)."""
+
+        self.recorded = 0
+        """Number of products recorded in this process (`int`)."""
+
+    def is_unchanged(self, slug, fingerprint):
+        """Test whether a product is unchanged since its last successful
+        ingest.
+
+        Parameters
+        ----------
+        slug : `str`
+            Slug of the LTD product.
+        fingerprint : `dict`
+            Current fingerprint of the product (see
+            `get_ltd_doc_fingerprint`).
+
+        Returns
+        -------
+        unchanged : `bool`
+            `True` if ``fingerprint`` is the fingerprint recorded for the
+            product's last successful ingest. If so, the product is counted
+            in `skipped`.
+        """
+        unchanged = self._fingerprints.get(slug) == fingerprint
+        if unchanged:
+            self.skipped += 1
+        return unchanged
+
+    def record(self, slug, fingerprint):
+        """Record the fingerprint of a successfully ingested product.
+
+        Parameters
+        ----------
+        slug : `str`
+            Slug of the LTD product.
+        fingerprint : `dict`
+            Fingerprint of the product, computed before it was ingested.
+        """
+        self._fingerprints[slug] = fingerprint
+        self.recorded += 1
+
+    def save(self):
+        """Write the state file.
+
+        The file is replaced atomically, so an interrupted save doesn't
+        corrupt it.
+        """
+        dirname = os.path.dirname(self.path)
+        if not os.path.isdir(dirname):
+            os.makedirs(dirname)
+        temp_path = '{0}.{1:d}.tmp'.format(self.path, os.getpid())
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({'products': self._fingerprints}, f, indent=2,
+                      sort_keys=True)
+        os.replace(temp_path, self.path)
+        self._logger.debug('Saved ingest state for %d products to %s',
+                           len(self._fingerprints), self.path)
+
+    def __len__(self):
+        return len(self._fingerprints)
+
+
+async def get_ltd_doc_fingerprint(session, github_api_token,
+                                  ltd_product_data):
+    """Get a fingerprint of the sources of an LSST the Docs product.
+
+    The fingerprint changes if any of these change:
+
+    - The LTD product resource (including its ``date_rebuilt``, if
+      present).
+    - The SHA of the head commit of the default branch of the product's
+      GitHub repository.
+    - The ``ETag`` (or ``Last-Modified``) header of the published
+      ``/metadata.jsonld`` file, if there is one.
+    - The version of lsstprojectmeta.
+
+    The GitHub commit and ``metadata.jsonld`` file are checked without
+    downloading the repository or the file. With a
+    `lsstprojectmeta.httpcache.CachingSession`, checking the commit of an
+    unchanged repository is a conditional request that doesn't count
+    against GitHub's rate limit.
+
+    Parameters
+    ----------
+    session : `aiohttp.ClientSession`
+        Your application's aiohttp client session.
+    github_api_token : `str`
+        A GitHub personal API token.
+    ltd_product_data : `dict`
+        Data for the product from the LTD Keeper API
+        (``GET /products/<slug>``).
+
+    Returns
+    -------
+    fingerprint : `dict`
+        JSON-serializable fingerprint.
+
+    Raises
+    ------
+    aiohttp.ClientError
+        Raised if GitHub or the published site can't be checked. A product
+        whose fingerprint can't be computed shouldn't be skipped.
+    """
+    product_json = json.dumps(ltd_product_data, sort_keys=True)
+    github_sha, jsonld_etag = await asyncio.gather(
+        _get_default_branch_sha(session, github_api_token,
+                                ltd_product_data.get('doc_repo')),
+        _get_jsonld_etag(session, ltd_product_data.get('published_url')))
+    return {
+        'version': __version__,
+        'ltd_product': hashlib.sha256(
+            product_json.encode('utf-8')).hexdigest(),
+        'github_sha': github_sha,
+        'jsonld_etag': jsonld_etag,
+    }
+
+
+async def _get_default_branch_sha(session, github_api_token, github_url):
+    """Get the SHA of the head commit of a GitHub repository's default
+    branch, or `None` if the repository or commit doesn't exist.
+    """
+    if not github_url:
+        return None
+    try:
+        repo_slug = parse_repo_slug_from_url(
+            normalize_repo_root_url(github_url))
+    except RuntimeError:
+        # Not a GitHub repository URL
+        return None
+
+    url = 'https://api.github.com/repos/{0}/commits/HEAD'.format(
+        repo_slug.full)
+    headers = {'Accept': 'application/vnd.github.sha'}
+    if github_api_token is not None:
+        headers['Authorization'] = 'token {}'.format(github_api_token)
+    async with session.get(url, headers=headers) as response:
+        # 404: no repository; 409 and 422: no commits
+        if response.status in (404, 409, 422):
+            return None
+        response.raise_for_status()
+        return (await response.text()).strip()
+
+
+async def _get_jsonld_etag(session, published_url):
+    """Get the validator of a product's published ``/metadata.jsonld``
+    file, or `None` if it doesn't exist.
+    """
+    if not published_url:
+        return None
+    url = urljoin(published_url, '/metadata.jsonld')
+    async with session.request('HEAD', url) as response:
+        if response.status in (403, 404):
+            return None
+        response.raise_for_status()
+        return response.headers.get('ETag') or \
+            response.headers.get('Last-Modified')
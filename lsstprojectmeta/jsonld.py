@@ -1,10 +1,47 @@
 """JSON-LD utilities.
 """
 
-__all__ = ('encode_jsonld', 'JsonLdEncoder', 'decode_jsonld')
+__all__ = ('encode_jsonld', 'JsonLdEncoder', 'decode_jsonld',
+           'JSONLD_DATE_KEYS', 'iterencode_jsonld', 'write_jsonld',
+           'write_jsonld_async')
 
 import datetime
+import functools
+import inspect
 import json
+from json.encoder import encode_basestring, encode_basestring_ascii
+import re
+
+
+JSONLD_DATE_KEYS = frozenset((
+    'dateCreated',
+    'dateModified',
+    'datePublished',
+    'dateIssued',
+    'uploadDate',
+    'startDate',
+    'endDate',
+    'expires',
+))
+"""Keys of the schema.org date properties that `decode_jsonld` converts to
+`datetime.datetime` objects when it's given ``date_keys=JSONLD_DATE_KEYS``.
+"""
+
+# The '%Y-%m-%dT%H:%M:%SZ' format that JsonLdEncoder produces, made from the
+# same field patterns that datetime.strptime uses for it. Like strptime, this
+# accepts unpadded fields, a space-padded day, and a lower-case 'T' and 'Z'.
+_DATETIME_PATTERN = re.compile(
+    r'(\d\d\d\d)'
+    r'-(1[0-2]|0[1-9]|[1-9])'
+    r'-(3[0-1]|[1-2]\d|0[1-9]|[1-9]| [1-9])'
+    r'[Tt](2[0-3]|[0-1]\d|\d)'
+    r':([0-5]\d|\d)'
+    r':(6[0-1]|[0-5]\d|\d)'
+    r'[Zz]')
+
+# Lengths of the strings that _DATETIME_PATTERN can match
+_MIN_DATETIME_LENGTH = len('2018-1-1T1:1:1Z')
+_MAX_DATETIME_LENGTH = len('2018-01-01T12:00:00Z')
 
 
 def encode_jsonld(jsonld_dataset, **kwargs):
@@ -50,17 +87,207 @@ class JsonLdEncoder(json.JSONEncoder):
         (it does have a tzinfo attribute set). Regardless, the datetime
         is transformed into UTC.
         """
-        if dt.tzinfo is None:
-            # Force it to be a UTC datetime
-            dt = dt.replace(tzinfo=datetime.timezone.utc)
+        return _format_datetime(dt)
+
+
+def _format_datetime(dt):
+    """Format a datetime, converted to UTC, as '%Y-%m-%dT%H:%M:%SZ'."""
+    if dt.tzinfo is None:
+        # Force it to be a UTC datetime
+        dt = dt.replace(tzinfo=datetime.timezone.utc)
+
+    # Convert to UTC (no matter what)
+    dt = dt.astimezone(datetime.timezone.utc)
+
+    return dt.strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def iterencode_jsonld(jsonld_dataset, sort_keys=False, ensure_ascii=True,
+                      separators=None, chunk_size=65536):
+    """Encode a JSON-LD dataset as a sequence of string chunks.
+
+    The chunks join to the same string as ``encode_jsonld(jsonld_dataset,
+    sort_keys=sort_keys, ensure_ascii=ensure_ascii,
+    separators=separators)``, but the whole encoded dataset is never held
+    in memory: long strings, such as the ``articleBody`` of a LaTeX
+    document, are encoded in slices. Datetimes are encoded directly, rather
+    than through `JsonLdEncoder.default`.
+
+    Parameters
+    ----------
+    jsonld_dataset : `dict`
+        A JSON-LD dataset.
+    sort_keys : `bool`, optional
+        Whether to sort the keys of objects.
+    ensure_ascii : `bool`, optional
+        Whether to escape non-ASCII characters.
+    separators : `tuple`, optional
+        ``(item_separator, key_separator)`` tuple. The default is
+        ``(', ', ': ')``, as with `json.JSONEncoder`. Indentation isn't
+        supported.
+    chunk_size : `int`, optional
+        Approximate size, in characters, of each chunk.
+
+    Yields
+    ------
+    chunk : `str`
+        Part of the encoded dataset.
+
+    Raises
+    ------
+    TypeError
+        Raised if the dataset contains a value that isn't JSON
+        serializable.
+    """
+    if separators is None:
+        separators = (', ', ': ')
+    item_separator, key_separator = separators
+    encode_string = encode_basestring_ascii if ensure_ascii \
+        else encode_basestring
+
+    def encode_scalar(obj):
+        if isinstance(obj, str):
+            return encode_string(obj)
+        elif obj is None:
+            return 'null'
+        elif obj is True:
+            return 'true'
+        elif obj is False:
+            return 'false'
+        elif isinstance(obj, int):
+            return int.__repr__(obj)
+        elif isinstance(obj, float):
+            return _encode_float(obj)
+        elif isinstance(obj, datetime.datetime):
+            return '"' + _format_datetime(obj) + '"'
+        return None
+
+    def encode_key(key):
+        if isinstance(key, str):
+            return encode_string(key)
+        elif isinstance(key, (int, float)) or key is None:
+            # As json does, use the JSON encoding of the key as its name
+            return '"' + encode_scalar(key) + '"'
+        raise TypeError('keys must be str, int, float, bool or None, '
+                        'not {0}'.format(type(key).__name__))
+
+    def iterencode(obj):
+        if isinstance(obj, str) and len(obj) > chunk_size:
+            # Encode long strings in slices, so that their encoded form
+            # isn't held in memory all at once. Slicing by code point
+            # doesn't split escape sequences.
+            yield '"'
+            for start in range(0, len(obj), chunk_size):
+                yield encode_string(obj[start:start + chunk_size])[1:-1]
+            yield '"'
+            return
+
+        encoded = encode_scalar(obj)
+        if encoded is not None:
+            yield encoded
+        elif isinstance(obj, dict):
+            if not obj:
+                yield '{}'
+                return
+            items = sorted(obj.items()) if sort_keys else obj.items()
+            yield '{'
+            first = True
+            for key, value in items:
+                if first:
+                    first = False
+                else:
+                    yield item_separator
+                yield encode_key(key)
+                yield key_separator
+                yield from iterencode(value)
+            yield '}'
+        elif isinstance(obj, (list, tuple)):
+            if not obj:
+                yield '[]'
+                return
+            yield '['
+            first = True
+            for value in obj:
+                if first:
+                    first = False
+                else:
+                    yield item_separator
+                yield from iterencode(value)
+            yield ']'
+        else:
+            raise TypeError('Object of type {0} is not JSON '
+                            'serializable'.format(type(obj).__name__))
+
+    # Join the small tokens into chunks of about chunk_size
+    buffer = []
+    buffered = 0
+    for token in iterencode(jsonld_dataset):
+        buffer.append(token)
+        buffered += len(token)
+        if buffered >= chunk_size:
+            yield ''.join(buffer)
+            buffer = []
+            buffered = 0
+    if buffer:
+        yield ''.join(buffer)
+
 
-        # Convert to UTC (no matter what)
-        dt = dt.astimezone(datetime.timezone.utc)
+def _encode_float(value):
+    if value != value:
+        return 'NaN'
+    elif value == float('inf'):
+        return 'Infinity'
+    elif value == -float('inf'):
+        return '-Infinity'
+    return float.__repr__(value)
 
-        return dt.strftime('%Y-%m-%dT%H:%M:%SZ')
 
+def write_jsonld(jsonld_dataset, fp, **kwargs):
+    """Encode a JSON-LD dataset into a file-like object, in chunks.
 
-def decode_jsonld(jsonld_text):
+    Parameters
+    ----------
+    jsonld_dataset : `dict`
+        A JSON-LD dataset.
+    fp : file-like object
+        Text stream with a ``write`` method.
+    kwargs
+        Keyword arguments passed to `iterencode_jsonld`.
+    """
+    for chunk in iterencode_jsonld(jsonld_dataset, **kwargs):
+        fp.write(chunk)
+
+
+async def write_jsonld_async(jsonld_dataset, writer, encoding='utf-8',
+                             **kwargs):
+    """Encode a JSON-LD dataset into an asynchronous byte stream, in
+    chunks.
+
+    Parameters
+    ----------
+    jsonld_dataset : `dict`
+        A JSON-LD dataset.
+    writer
+        Byte stream with a ``write`` method, which can be a coroutine
+        function (like `aiohttp.web.StreamResponse.write`). If the writer
+        has a ``drain`` coroutine method (like `asyncio.StreamWriter`), it's
+        awaited after each chunk is written, so the writer's buffer doesn't
+        grow.
+    encoding : `str`, optional
+        Encoding of the bytes written.
+    kwargs
+        Keyword arguments passed to `iterencode_jsonld`.
+    """
+    drain = getattr(writer, 'drain', None)
+    for chunk in iterencode_jsonld(jsonld_dataset, **kwargs):
+        result = writer.write(chunk.encode(encoding))
+        if inspect.isawaitable(result):
+            await result
+        if drain is not None:
+            await drain()
+
+
+def decode_jsonld(jsonld_text, date_keys=None):
     """Decode a JSON-LD dataset, including decoding datetime
     strings into `datetime.datetime` objects.
 
@@ -68,6 +295,11 @@ def decode_jsonld(jsonld_text):
     ----------
     encoded_dataset : `str`
         The JSON-LD dataset encoded as a string.
+    date_keys : collection of `str`, optional
+        If provided, only the values of these keys (such as
+        `JSONLD_DATE_KEYS`) are decoded as datetimes. By default, every
+        string value in a JSON object that's formatted as
+        ``'%Y-%m-%dT%H:%M:%SZ'`` is decoded as a datetime.
 
     Returns
     -------
@@ -81,7 +313,12 @@ def decode_jsonld(jsonld_text):
     >>> decode_jsonld(doc)
     {'dt': datetime.datetime(2018, 1, 1, 12, 0, tzinfo=datetime.timezone.utc)}
     """
-    decoder = json.JSONDecoder(object_pairs_hook=_decode_object_pairs)
+    if date_keys is None:
+        object_pairs_hook = _decode_object_pairs
+    else:
+        object_pairs_hook = functools.partial(_decode_object_pairs_for_keys,
+                                              frozenset(date_keys))
+    decoder = json.JSONDecoder(object_pairs_hook=object_pairs_hook)
     return decoder.decode(jsonld_text)
 
 
@@ -89,15 +326,36 @@ def _decode_object_pairs(pairs):
     doc = {}
     for key, value in pairs:
         if isinstance(value, str):
-            # attempt to parse as a datetime
-            try:
-                value = datetime.datetime.strptime(value, '%Y-%m-%dT%H:%M:%SZ')
-                # ensure timezone is UTC
-                if value.tzinfo is None:
-                    value = value.replace(tzinfo=datetime.timezone.utc)
-                value = value.astimezone(datetime.timezone.utc)
-            except ValueError:
-                pass
+            value = _decode_datetime(value)
+        doc[key] = value
+    return doc
+
 
+def _decode_object_pairs_for_keys(date_keys, pairs):
+    doc = {}
+    for key, value in pairs:
+        if key in date_keys and isinstance(value, str):
+            value = _decode_datetime(value)
         doc[key] = value
     return doc
+
+
+def _decode_datetime(value):
+    """Decode a '%Y-%m-%dT%H:%M:%SZ'-formatted string as a UTC datetime,
+    or return the string if it isn't a datetime.
+
+    Most strings are rejected by their length or fifth character, without
+    a regular expression match.
+    """
+    if not _MIN_DATETIME_LENGTH <= len(value) <= _MAX_DATETIME_LENGTH \
+            or value[4] != '-':
+        return value
+    match = _DATETIME_PATTERN.fullmatch(value)
+    if match is None:
+        return value
+    try:
+        return datetime.datetime(*[int(field) for field in match.groups()],
+                                 tzinfo=datetime.timezone.utc)
+    except ValueError:
+        # Out-of-range fields, such as a 13th month
+        return value
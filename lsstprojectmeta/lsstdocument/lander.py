@@ -11,6 +11,8 @@ from urllib.parse import urljoin
 import aiohttp
 
 from ..jsonld import decode_jsonld
+from ..httpcache import parse_response
+from ..mongo import upsert_jsonld
 
 
 async def process_lander_page(session, github_api_token, ltd_product_data,
@@ -33,7 +35,9 @@ async def process_lander_page(session, github_api_token, ltd_product_data,
     mongo_collection : `motor.motor_asyncio.AsyncIOMotorCollection`, optional
         MongoDB collection. This should be the common MongoDB collection for
         LSST projectmeta JSON-LD records. If provided, ths JSON-LD is upserted
-        into the MongoDB collection.
+        into the MongoDB collection. A
+        `lsstprojectmeta.mongo.MongoBulkWriter` for the collection can be
+        used instead.
 
     Returns
     -------
@@ -58,39 +62,21 @@ async def process_lander_page(session, github_api_token, ltd_product_data,
         async with session.get(jsonld_url) as response:
             logger.debug('%s response status %r', jsonld_url, response.status)
             response.raise_for_status()
-            json_data = await response.text()
+            # Use our own json parser to get datetimes. Parse in an executor
+            # so that large documents don't block the event loop, reusing
+            # the parsed data if the document is cached and unchanged.
+            metadata = await parse_response(response, decode_jsonld)
     except aiohttp.ClientResponseError as err:
         logger.debug('Tried to download %s, got status %d',
                      jsonld_url, err.code)
         raise NotLanderPageError()
-    # Use our own json parser to get datetimes
-    metadata = decode_jsonld(json_data)
 
     if mongo_collection is not None:
-        await _upload_to_mongodb(mongo_collection, metadata)
+        await upsert_jsonld(mongo_collection, metadata)
 
     return metadata
 
 
-async def _upload_to_mongodb(collection, jsonld):
-    """Upsert the technote resource into the projectmeta MongoDB collection.
-
-    Parameters
-    ----------
-    collection : `motor.motor_asyncio.AsyncIOMotorCollection`
-        The MongoDB collection.
-    jsonld : `dict`
-        The JSON-LD document that represents the document resource.
-    """
-    document = {
-        'data': jsonld
-    }
-    query = {
-        'data.reportNumber': jsonld['reportNumber']
-    }
-    await collection.update(query, document, upsert=True, multi=False)
-
-
 class NotLanderPageError(Exception):
     """Exception indicating that an LSST the Docs product cannot be a Lander
     landing page because ``/metadata.jsonld`` is missing.
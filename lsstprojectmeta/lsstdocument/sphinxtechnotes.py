@@ -13,10 +13,12 @@ import yaml
 from ..github.urls import (parse_repo_slug_from_url, make_raw_content_url,
                            normalize_repo_root_url)
 from ..github.graphql import github_request, GitHubQuery
+from ..httpcache import parse_response
+from ..mongo import upsert_jsonld
 
 
 async def process_sphinx_technote(session, github_api_token, ltd_product_data,
-                                  mongo_collection=None):
+                                  mongo_collection=None, github_batcher=None):
     """Extract, transform, and load Sphinx-based technote metadata.
 
     Parameters
@@ -35,7 +37,13 @@ async def process_sphinx_technote(session, github_api_token, ltd_product_data,
     mongo_collection : `motor.motor_asyncio.AsyncIOMotorCollection`, optional
         MongoDB collection. This should be the common MongoDB collection for
         LSST projectmeta JSON-LD records. If provided, ths JSON-LD is upserted
-        into the MongoDB collection.
+        into the MongoDB collection. A
+        `lsstprojectmeta.mongo.MongoBulkWriter` for the collection can be
+        used instead.
+    github_batcher : `GitHubRepoBatcher`, optional
+        If provided, the GitHub repository is looked up through this
+        `lsstprojectmeta.github.graphql.GitHubRepoBatcher`, combined with the
+        lookups for other technotes.
 
     Returns
     -------
@@ -67,14 +75,18 @@ async def process_sphinx_technote(session, github_api_token, ltd_product_data,
         raise NotSphinxTechnoteError()
 
     # Extract data from the GitHub API
-    github_query = GitHubQuery.load('technote_repo')
-    github_variables = {
-        "orgName": repo_slug.owner,
-        "repoName": repo_slug.repo
-    }
-    github_data = await github_request(session, github_api_token,
-                                       query=github_query,
-                                       variables=github_variables)
+    if github_batcher is not None:
+        github_data = await github_batcher.technote_repo(repo_slug.owner,
+                                                         repo_slug.repo)
+    else:
+        github_query = GitHubQuery.load('technote_repo')
+        github_variables = {
+            "orgName": repo_slug.owner,
+            "repoName": repo_slug.repo
+        }
+        github_data = await github_request(session, github_api_token,
+                                           query=github_query,
+                                           variables=github_variables)
 
     try:
         jsonld = reduce_technote_metadata(
@@ -85,7 +97,7 @@ async def process_sphinx_technote(session, github_api_token, ltd_product_data,
         raise
 
     if mongo_collection is not None:
-        await _upload_to_mongodb(mongo_collection, jsonld)
+        await upsert_jsonld(mongo_collection, jsonld)
 
     logger.info('Ingested technote %s into MongoDB', github_url)
 
@@ -210,8 +222,9 @@ async def download_metadata_yaml(session, github_url):
     metadata_yaml_url = _build_metadata_yaml_url(github_url)
     async with session.get(metadata_yaml_url) as response:
         response.raise_for_status()
-        yaml_data = await response.text()
-    return yaml.safe_load(yaml_data)
+        # Parse in an executor so that large files don't block the event
+        # loop, reusing the parsed data if the file is cached and unchanged.
+        return await parse_response(response, yaml.safe_load)
 
 
 def _build_metadata_yaml_url(github_url):
@@ -232,25 +245,6 @@ def _build_metadata_yaml_url(github_url):
     return make_raw_content_url(repo_slug, 'master', 'metadata.yaml')
 
 
-async def _upload_to_mongodb(collection, jsonld):
-    """Upsert the technote resource into the projectmeta MongoDB collection.
-
-    Parameters
-    ----------
-    collection : `motor.motor_asyncio.AsyncIOMotorCollection`
-        The MongoDB collection.
-    jsonld : `dict`
-        The JSON-LD document that reprsents the technote resource.
-    """
-    document = {
-        'data': jsonld
-    }
-    query = {
-        'data.reportNumber': jsonld['reportNumber']
-    }
-    await collection.update(query, document, upsert=True, multi=False)
-
-
 class NotSphinxTechnoteError(Exception):
     """Exception indicating that an LSST the Docs product cannot be a
     Sphinx-formatted technote and that a different format should be tried.
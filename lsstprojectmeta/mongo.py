@@ -0,0 +1,336 @@
+"""Load JSON-LD records into the LSST projectmeta MongoDB collection.
+"""
+
+__all__ = ('MongoBulkWriter', 'upsert_jsonld', 'make_jsonld_replacement',
+           'compute_jsonld_hash')
+
+import asyncio
+import hashlib
+import logging
+import time
+
+from .jsonld import encode_jsonld
+
+# pymongo is imported by the functions that use it, because it's slow to
+# import.
+
+
+def compute_jsonld_hash(jsonld):
+    """Compute a stable hash of a JSON-LD record's content.
+
+    The hash is computed from a canonical encoding of the record, with
+    sorted keys and no insignificant whitespace, so it doesn't depend on
+    the order that the record's fields were set in.
+
+    Parameters
+    ----------
+    jsonld : `dict`
+        The JSON-LD document that represents the document resource.
+
+    Returns
+    -------
+    content_hash : `str`
+        Hex-encoded SHA-256 hash.
+    """
+    encoded = encode_jsonld(jsonld, sort_keys=True, separators=(',', ':'),
+                            ensure_ascii=False)
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+
+def make_jsonld_replacement(jsonld, content_hash=None):
+    """Make the MongoDB operation that upserts a JSON-LD record.
+
+    Records are identified by their ``reportNumber``, and stored in the
+    ``data`` field of the MongoDB document. The ``contentHash`` field of the
+    document is the record's `compute_jsonld_hash` hash.
+
+    Parameters
+    ----------
+    jsonld : `dict`
+        The JSON-LD document that represents the document resource.
+    content_hash : `str`, optional
+        Hash of ``jsonld``, if it's already computed.
+
+    Returns
+    -------
+    operation : `pymongo.ReplaceOne`
+        Upsert operation.
+    """
+    from pymongo import ReplaceOne
+
+    query, document = _make_query_and_document(jsonld, content_hash)
+    return ReplaceOne(query, document, upsert=True)
+
+
+def _make_query_and_document(jsonld, content_hash=None):
+    if content_hash is None:
+        content_hash = compute_jsonld_hash(jsonld)
+    query = {
+        'data.reportNumber': jsonld['reportNumber']
+    }
+    document = {
+        'data': jsonld,
+        'contentHash': content_hash
+    }
+    return query, document
+
+
+async def upsert_jsonld(mongo_collection, jsonld, on_written=None):
+    """Upsert a JSON-LD record into the projectmeta MongoDB collection.
+
+    The record isn't written if the collection's copy has the same
+    ``contentHash`` (see `compute_jsonld_hash`).
+
+    Parameters
+    ----------
+    mongo_collection : `AsyncIOMotorCollection` or `MongoBulkWriter`
+        MongoDB collection (`motor.motor_asyncio.AsyncIOMotorCollection`),
+        or a writer that upserts records into the collection in batches.
+    jsonld : `dict`
+        The JSON-LD document that represents the document resource.
+    on_written : callable, optional
+        Called, without arguments, once the record is written or found to
+        be unchanged. With a `MongoBulkWriter`, this is after the record's
+        batch is written, and it's not called if writing the record fails.
+    """
+    if isinstance(mongo_collection, MongoBulkWriter):
+        await mongo_collection.upsert(jsonld, on_written=on_written)
+        return
+
+    query, document = _make_query_and_document(jsonld)
+    existing = await mongo_collection.find_one(query, {'contentHash': 1})
+    if existing is None or \
+            existing.get('contentHash') != document['contentHash']:
+        await mongo_collection.replace_one(query, document, upsert=True)
+    else:
+        logging.getLogger(__name__).debug(
+            '%s is unchanged in MongoDB', jsonld['reportNumber'])
+    if on_written is not None:
+        on_written()
+
+
+class MongoBulkWriter(object):
+    """Buffered writer that upserts JSON-LD records into a MongoDB collection
+    with unordered bulk writes.
+
+    Records are written in batches of ``batch_size``, or when the oldest
+    buffered record has waited ``flush_interval`` seconds. Before a batch is
+    written, the ``contentHash`` fields of its records are looked up in the
+    collection, and records with unchanged content are dropped from the
+    batch. Use the writer as
+    an asynchronous context manager, or call `start` and `close`:
+
+    .. code-block:: python
+
+       async with MongoBulkWriter(collection) as writer:
+           await writer.upsert(jsonld)
+
+    Parameters
+    ----------
+    collection : `motor.motor_asyncio.AsyncIOMotorCollection`
+        MongoDB collection. This should be the common MongoDB collection for
+        LSST projectmeta JSON-LD records.
+    batch_size : `int`, optional
+        Maximum number of records in a bulk write.
+    flush_interval : `float`, optional
+        Maximum time, in seconds, that a record is buffered before it's
+        written.
+    """
+
+    def __init__(self, collection, batch_size=100, flush_interval=5.):
+        super().__init__()
+        if batch_size < 1:
+            raise ValueError(
+                'batch_size must be at least 1: {0!r}'.format(batch_size))
+        self.collection = collection
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._logger = logging.getLogger(__name__)
+
+        # Buffered (report number, content hash, operation, on_written)
+        # tuples
+        self._buffer = []
+        self._flush_handle = None
+        self._flush_tasks = set()
+
+        self._batches = 0
+        self._written = 0
+        self._failed = 0
+        self._unchanged = 0
+        # Total and maximum bulk write latency, in seconds
+        self._total_latency = 0.
+        self._max_latency = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def start(self):
+        """Prepare the collection by creating the ``data.reportNumber``
+        index that upserts filter on.
+        """
+        await self.collection.create_index('data.reportNumber')
+
+    async def upsert(self, jsonld, on_written=None):
+        """Buffer a JSON-LD record to upsert.
+
+        If the buffer is full, this waits for the batch to be written.
+
+        Parameters
+        ----------
+        jsonld : `dict`
+            The JSON-LD document that represents the document resource.
+        on_written : callable, optional
+            Called, without arguments, after the record is successfully
+            written.
+        """
+        content_hash = compute_jsonld_hash(jsonld)
+        self._buffer.append((jsonld['reportNumber'],
+                             content_hash,
+                             make_jsonld_replacement(jsonld, content_hash),
+                             on_written))
+        if len(self._buffer) >= self.batch_size:
+            await self.flush()
+        elif self._flush_handle is None:
+            loop = asyncio.get_event_loop()
+            self._flush_handle = loop.call_later(self.flush_interval,
+                                                 self._flush_later)
+
+    async def flush(self):
+        """Write the buffered records."""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self._buffer = self._buffer, []
+        if batch:
+            await self._write(batch)
+
+    async def close(self):
+        """Write the buffered records, and wait for all writes to finish."""
+        await self.flush()
+        while self._flush_tasks:
+            await asyncio.wait(list(self._flush_tasks))
+        self._logger.info('MongoDB bulk writes: %r', self.metrics)
+
+    @property
+    def metrics(self):
+        """Snapshot of the writer's activity (`dict`).
+
+        Keys are:
+
+        - ``batches``: number of bulk writes.
+        - ``written``: number of records written.
+        - ``unchanged``: number of records not written because the
+          collection's copy has the same content.
+        - ``failed``: number of records that couldn't be written.
+        - ``buffered``: number of records waiting to be written.
+        - ``mean_latency`` and ``max_latency``: mean and maximum time, in
+          seconds, of a bulk write (`None` before the first write).
+        """
+        if self._batches > 0:
+            mean_latency = self._total_latency / self._batches
+        else:
+            mean_latency = None
+        return {'batches': self._batches,
+                'written': self._written,
+                'unchanged': self._unchanged,
+                'failed': self._failed,
+                'buffered': len(self._buffer),
+                'mean_latency': mean_latency,
+                'max_latency': self._max_latency}
+
+    def _flush_later(self):
+        """Flush the buffer when ``flush_interval`` expires."""
+        self._flush_handle = None
+        task = asyncio.ensure_future(self.flush())
+        self._flush_tasks.add(task)
+        task.add_done_callback(self._flush_tasks.discard)
+
+    async def _find_unchanged(self, batch):
+        """Get the indices of records in a batch whose content hash matches
+        the collection's copy.
+        """
+        report_numbers = list({report_number
+                               for report_number, _, _, _ in batch})
+        cursor = self.collection.find(
+            {'data.reportNumber': {'$in': report_numbers}},
+            {'data.reportNumber': 1, 'contentHash': 1})
+        stored_hashes = {}
+        for document in await cursor.to_list(length=None):
+            stored_hashes[document['data']['reportNumber']] = \
+                document.get('contentHash')
+        return {index
+                for index, (report_number, content_hash, _, _)
+                in enumerate(batch)
+                if stored_hashes.get(report_number) == content_hash}
+
+    async def _write(self, batch):
+        """Write a batch of records with an unordered bulk write."""
+        from pymongo.errors import BulkWriteError
+
+        try:
+            unchanged_indices = await self._find_unchanged(batch)
+        except Exception:
+            # Fall back to writing the whole batch
+            self._logger.exception('Could not look up content hashes')
+            unchanged_indices = set()
+        self._unchanged += len(unchanged_indices)
+        unchanged = [item for index, item in enumerate(batch)
+                     if index in unchanged_indices]
+        batch = [item for index, item in enumerate(batch)
+                 if index not in unchanged_indices]
+        if unchanged:
+            self._logger.info('Skipped %d unchanged records', len(unchanged))
+        for _, _, _, on_written in unchanged:
+            if on_written is not None:
+                on_written()
+        if not batch:
+            return
+
+        operations = [operation for _, _, operation, _ in batch]
+        failed_indices = set()
+        start = time.perf_counter()
+        try:
+            result = await self.collection.bulk_write(operations,
+                                                      ordered=False)
+        except BulkWriteError as err:
+            # In an unordered bulk write, only the operations with write
+            # errors failed.
+            result = None
+            write_errors = err.details.get('writeErrors', [])
+            failed_indices = {error['index'] for error in write_errors}
+            for error in write_errors:
+                self._logger.error(
+                    'Could not upsert %s: %s',
+                    batch[error['index']][0], error.get('errmsg'))
+        except Exception:
+            result = None
+            failed_indices = set(range(len(batch)))
+            self._logger.exception('Bulk write of %d records failed',
+                                   len(batch))
+        latency = time.perf_counter() - start
+
+        self._batches += 1
+        self._total_latency += latency
+        if self._max_latency is None or latency > self._max_latency:
+            self._max_latency = latency
+        self._failed += len(failed_indices)
+        self._written += len(batch) - len(failed_indices)
+        if result is not None:
+            self._logger.info(
+                'Wrote %d records to MongoDB in %.1f ms '
+                '(%d upserted, %d modified)',
+                len(batch), latency * 1000., result.upserted_count,
+                result.modified_count)
+        else:
+            self._logger.info(
+                'Wrote %d of %d records to MongoDB in %.1f ms',
+                len(batch) - len(failed_indices), len(batch),
+                latency * 1000.)
+
+        for index, (_, _, _, on_written) in enumerate(batch):
+            if on_written is not None and index not in failed_indices:
+                on_written()
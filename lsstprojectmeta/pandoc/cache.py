@@ -0,0 +1,319 @@
+"""Persistent, content-addressed cache of pandoc conversions.
+"""
+
+__all__ = ['PandocCache', 'get_pandoc_cache', 'set_pandoc_cache']
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+
+# The cache used by lsstprojectmeta.pandoc.convert. See set_pandoc_cache.
+_PANDOC_CACHE = None
+
+
+def get_pandoc_cache():
+    """Get the pandoc conversion cache used by
+    `lsstprojectmeta.pandoc.convert.convert_text`.
+
+    Returns
+    -------
+    cache : `PandocCache`
+        The active cache, or `None` if caching is disabled (the default).
+    """
+    return _PANDOC_CACHE
+
+
+def set_pandoc_cache(cache):
+    """Set the pandoc conversion cache used by
+    `lsstprojectmeta.pandoc.convert.convert_text`.
+
+    Parameters
+    ----------
+    cache : `PandocCache` or `str`
+        A `PandocCache` instance, or the path of a cache database file.
+        `None` disables caching.
+
+    Returns
+    -------
+    cache : `PandocCache`
+        The active cache, or `None` if caching is disabled.
+    """
+    global _PANDOC_CACHE
+    if isinstance(cache, str):
+        cache = PandocCache(cache)
+    _PANDOC_CACHE = cache
+    return cache
+
+
+class PandocCache(object):
+    """An on-disk cache of pandoc output, keyed by a hash of the conversion
+    inputs.
+
+    The cache is a SQLite database, so several processes can share the same
+    cache file. When the total size of the cached output exceeds
+    ``max_size``, the least recently used entries are evicted.
+
+    Parameters
+    ----------
+    path : `str`
+        Path of the cache database file. The file is created if necessary.
+    max_size : `int`, optional
+        Maximum total size, in bytes, of the cached output. Default is
+        256 MB.
+    timeout : `float`, optional
+        Time, in seconds, to wait for another process to release a lock on
+        the cache database.
+
+    Examples
+    --------
+    Use a cache for all conversions by
+    `lsstprojectmeta.pandoc.convert.convert_text`:
+
+    .. code-block:: python
+
+       from lsstprojectmeta.pandoc.cache import set_pandoc_cache
+
+       cache = set_pandoc_cache('pandoc-cache.sqlite3')
+       # ... run conversions
+       print(cache.stats)
+    """
+
+    def __init__(self, path, max_size=256 * 1024 * 1024, timeout=30.):
+        super().__init__()
+        self._logger = logging.getLogger(__name__)
+        self.path = os.path.abspath(path)
+        self.max_size = max_size
+        self.timeout = timeout
+
+        self.hits = 0
+        """Number of cache hits by this process (`int`)."""
+
+        self.misses = 0
+        """Number of cache misses by this process (`int`)."""
+
+        self.evictions = 0
+        """Number of entries evicted by this process (`int`)."""
+
+        self._lock = threading.Lock()
+        self._connection = None
+        self._connection_pid = None
+
+    @staticmethod
+    def make_key(content, from_fmt, to_fmt, extra_args=None,
+                 pandoc_version=None, batch=False):
+        """Make the cache key for a conversion.
+
+        Parameters
+        ----------
+        content : `str`
+            Original content.
+        from_fmt : `str`
+            Format of the original ``content``.
+        to_fmt : `str`
+            Output format.
+        extra_args : iterable of `str`, optional
+            Pandoc command line arguments. The order and repetition of
+            arguments does not affect the key.
+        pandoc_version : `str`, optional
+            Version of pandoc that runs the conversion.
+        batch : `bool`, optional
+            If `True`, make the key for a snippet that's converted in a batch
+            (see `lsstprojectmeta.pandoc.convert.convert_text_batch`), which
+            is distinct from the key of the same conversion run on its own.
+
+        Returns
+        -------
+        key : `str`
+            Hexadecimal SHA-256 digest of the conversion inputs.
+
+        Examples
+        --------
+        >>> key1 = PandocCache.make_key('Text', 'latex', 'html5',
+        ...                             ['--smart', '--wrap=none'])
+        >>> key2 = PandocCache.make_key('Text', 'latex', 'html5',
+        ...                             ['--wrap=none', '--smart'])
+        >>> key1 == key2
+        True
+        """
+        if extra_args is None:
+            extra_args = []
+        data = [pandoc_version, from_fmt, to_fmt, sorted(set(extra_args)),
+                content]
+        if batch:
+            data.append('batch')
+        data = json.dumps(data)
+        return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+    def get(self, key, count_miss=True):
+        """Get cached output.
+
+        Parameters
+        ----------
+        key : `str`
+            The cache key (see `make_key`).
+        count_miss : `bool`, optional
+            If `False`, a miss isn't counted in `misses`, for a lookup that
+            is followed by another lookup of the same conversion.
+
+        Returns
+        -------
+        output : `str`
+            The cached output, or `None` if ``key`` is not cached.
+        """
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                row = connection.execute(
+                    'SELECT output FROM conversions WHERE key = ?',
+                    (key,)).fetchone()
+                if row is not None:
+                    connection.execute(
+                        'UPDATE conversions SET accessed = ? WHERE key = ?',
+                        (time.time(), key))
+
+        if row is None:
+            if count_miss:
+                self.misses += 1
+            return None
+        else:
+            self.hits += 1
+            return row[0]
+
+    def set(self, key, output):
+        """Add output to the cache, evicting least recently used entries if
+        the cache is larger than ``max_size``.
+
+        Parameters
+        ----------
+        key : `str`
+            The cache key (see `make_key`).
+        output : `str`
+            Output to cache.
+        """
+        size = len(output.encode('utf-8'))
+        if size > self.max_size:
+            self._logger.debug('Not caching pandoc output of %d bytes', size)
+            return
+
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                # Take the write lock up front so that concurrent processes
+                # don't evict entries twice.
+                connection.execute('BEGIN IMMEDIATE')
+                row = connection.execute(
+                    'SELECT size FROM conversions WHERE key = ?',
+                    (key,)).fetchone()
+                replaced_size = row[0] if row is not None else 0
+                connection.execute(
+                    'INSERT OR REPLACE INTO conversions '
+                    '(key, output, size, accessed) VALUES (?, ?, ?, ?)',
+                    (key, output, size, time.time()))
+                connection.execute(
+                    'UPDATE cache_size SET size = size + ?',
+                    (size - replaced_size,))
+                self._evict(connection)
+
+    def clear(self):
+        """Delete all entries from the cache."""
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                connection.execute('BEGIN IMMEDIATE')
+                connection.execute('DELETE FROM conversions')
+                connection.execute('UPDATE cache_size SET size = 0')
+
+    @property
+    def size(self):
+        """Total size, in bytes, of the cached output (`int`)."""
+        with self._lock:
+            connection = self._connect()
+            row = connection.execute(
+                'SELECT size FROM cache_size').fetchone()
+        return row[0]
+
+    def __len__(self):
+        with self._lock:
+            connection = self._connect()
+            row = connection.execute(
+                'SELECT COUNT(*) FROM conversions').fetchone()
+        return row[0]
+
+    @property
+    def stats(self):
+        """Cache statistics for this process (`dict`).
+
+        Keys are ``hits``, ``misses``, and ``evictions``.
+        """
+        return {'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions}
+
+    def _evict(self, connection):
+        """Delete least recently used entries until the cache fits in
+        ``max_size``.
+        """
+        total_size = connection.execute(
+            'SELECT size FROM cache_size').fetchone()[0]
+        if total_size <= self.max_size:
+            return
+
+        evicted_keys = []
+        cursor = connection.execute(
+            'SELECT key, size FROM conversions ORDER BY accessed ASC')
+        for key, size in cursor:
+            if total_size <= self.max_size:
+                break
+            evicted_keys.append((key,))
+            total_size -= size
+        connection.executemany('DELETE FROM conversions WHERE key = ?',
+                               evicted_keys)
+        connection.execute('UPDATE cache_size SET size = ?', (total_size,))
+        self.evictions += len(evicted_keys)
+        self._logger.debug('Evicted %d entries from the pandoc cache',
+                           len(evicted_keys))
+
+    def _connect(self):
+        """Get a database connection for this process, creating the schema
+        if necessary.
+        """
+        # SQLite connections can't be shared with forked processes.
+        if self._connection is not None and \
+                self._connection_pid == os.getpid():
+            return self._connection
+
+        dirname = os.path.dirname(self.path)
+        if not os.path.isdir(dirname):
+            os.makedirs(dirname)
+
+        # isolation_level=None lets transactions be managed explicitly.
+        connection = sqlite3.connect(self.path, timeout=self.timeout,
+                                     isolation_level=None,
+                                     check_same_thread=False)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute(
+            'CREATE TABLE IF NOT EXISTS conversions ('
+            'key TEXT PRIMARY KEY, '
+            'output TEXT NOT NULL, '
+            'size INTEGER NOT NULL, '
+            'accessed REAL NOT NULL)')
+        connection.execute(
+            'CREATE INDEX IF NOT EXISTS conversions_accessed '
+            'ON conversions (accessed)')
+        # Running total of the size column, updated with the conversions
+        # table, so that adding an entry doesn't sum the whole table.
+        connection.execute(
+            'CREATE TABLE IF NOT EXISTS cache_size ('
+            'id INTEGER PRIMARY KEY CHECK (id = 0), '
+            'size INTEGER NOT NULL)')
+        connection.execute(
+            'INSERT OR IGNORE INTO cache_size (id, size) '
+            'SELECT 0, COALESCE(SUM(size), 0) FROM conversions')
+        self._connection = connection
+        self._connection_pid = os.getpid()
+        return connection
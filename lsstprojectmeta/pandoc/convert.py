@@ -1,14 +1,38 @@
 """Pandoc conversion helper functions.
 """
 
-__all__ = ['convert_text', 'ensure_pandoc']
+__all__ = ['convert_text', 'convert_text_batch', 'convert_lsstdoc_tex',
+           'convert_lsstdoc_tex_batch', 'ensure_pandoc']
 
 import functools
+import json
 import logging
+import re
 
 import pypandoc
 
 from ..tex.lsstmacros import LSSTDOC_MACROS
+from .cache import get_pandoc_cache
+from .filters.deparagraph import (SNIPPET_MARKER, DEPARAGRAPH_SNIPPET_MARKER,
+                                  deparagraph_ast)
+
+
+# The pandoc argument for the deparagraph filter. convert_text applies this
+# filter in-process rather than running it as a pandoc filter.
+_DEPARAGRAPH_FILTER_ARG = '--filter=lsstprojectmeta-deparagraph'
+
+
+# Matches the output lines of the marker paragraphs that separate snippets in
+# a batched conversion. DEPARAGRAPH_SNIPPET_MARKER starts with SNIPPET_MARKER.
+_SNIPPET_MARKER_LINE_PATTERN = re.compile(
+    r'^.*' + re.escape(SNIPPET_MARKER) + r'.*$\n?',
+    flags=re.M)
+
+# Matches notes in LaTeX or Markdown content. Pandoc places all notes at the
+# end of the document and numbers them across the document, so snippets with
+# notes can't be batched.
+_NOTE_PATTERN = re.compile(
+    r'\\(?:footnote|footnotetext|thanks)(?![A-Za-z])|\[\^|\^\[')
 
 
 def ensure_pandoc(func):
@@ -99,9 +123,273 @@ def convert_text(content, from_fmt, to_fmt, deparagraph=False, mathjax=False,
     -----
     This function will automatically install Pandoc if it is not available.
     See `ensure_pandoc`.
+
+    The deparagraph filter is applied in-process to pandoc's JSON AST (see
+    `lsstprojectmeta.pandoc.filters.deparagraph.deparagraph_ast`) rather than
+    by running ``lsstprojectmeta-deparagraph`` as a pandoc filter. This
+    avoids starting a Python interpreter for each conversion.
+
+    If a cache is configured with
+    `lsstprojectmeta.pandoc.cache.set_pandoc_cache`, pandoc only runs if
+    the conversion isn't already cached.
     """
     logger = logging.getLogger(__name__)
 
+    extra_args = _make_extra_args(deparagraph=deparagraph, mathjax=mathjax,
+                                  smart=smart, extra_args=extra_args)
+
+    cache = get_pandoc_cache()
+    if cache is not None:
+        cache_key = cache.make_key(
+            content, from_fmt, to_fmt, extra_args=extra_args,
+            pandoc_version=pypandoc.get_pandoc_version())
+        output = cache.get(cache_key)
+        if output is not None:
+            return output
+
+    logger.debug('Running pandoc from %s to %s with extra_args %s',
+                 from_fmt, to_fmt, extra_args)
+
+    output = _run_pandoc(content, from_fmt, to_fmt, extra_args)
+
+    if cache is not None:
+        cache.set(cache_key, output)
+
+    return output
+
+
+@ensure_pandoc
+def convert_text_batch(contents, from_fmt, to_fmt, deparagraph=False,
+                       mathjax=False, smart=True, extra_args=None,
+                       preamble=None):
+    """Convert several snippets of text from one markup format to another
+    with a single pandoc run.
+
+    Parameters
+    ----------
+    contents : sequence of `str`
+        Original content snippets.
+
+    from_fmt : `str`
+        Format of the original ``contents``. Format identifier must be one of
+        those known by Pandoc. The format must treat blank lines as paragraph
+        breaks (``latex``, ``markdown``, and ``rst`` do).
+
+    to_fmt : `str`
+        Output format for the content.
+
+    deparagraph : `bool` or sequence of `bool`, optional
+        If `True`, the paragraph wrapper of single-paragraph snippets is
+        removed (see `convert_text`). Provide a sequence, with one item per
+        snippet in ``contents``, to control this for each snippet. Default is
+        `False`.
+
+    mathjax : `bool`, optional
+        If `True` then Pandoc will markup output content to work with MathJax.
+        Default is False.
+
+    smart : `bool`, optional
+        If `True` (default) then ascii characters will be converted to unicode
+        characters like smart quotes and em dashes.
+
+    extra_args : `list`, optional
+        Sequence of Pandoc arguments command line arguments (such as
+        ``'--normalize'``).
+
+    preamble : `str`, optional
+        Content, such as macro definitions, that is placed once at the
+        beginning of the batch. The preamble must not produce any output.
+
+    Returns
+    -------
+    outputs : `list` of `str`
+        Content in the output (``to_fmt``) format, in the same order as
+        ``contents``.
+
+    Raises
+    ------
+    RuntimeError
+        Raised if pandoc fails, or if the pandoc output cannot be split back
+        into the original snippets.
+
+    Notes
+    -----
+    Each snippet is preceded by a marker paragraph in the pandoc input (see
+    `lsstprojectmeta.pandoc.filters.deparagraph`). The output is split on the
+    lines that contain those markers. The snippets share a single document,
+    so a snippet with unbalanced LaTeX groups or environments affects the
+    snippets that come after it. Pandoc places notes at the end of the
+    document, so snippets with notes (``\\footnote``, ``\\footnotetext``,
+    and ``\\thanks`` in LaTeX, or Markdown notes) are converted individually
+    with `convert_text`.
+
+    This function will automatically install Pandoc if it is not available.
+    See `ensure_pandoc`.
+
+    If a cache is configured with
+    `lsstprojectmeta.pandoc.cache.set_pandoc_cache`, each snippet is looked
+    up individually and pandoc only runs on the snippets that aren't already
+    cached. A snippet's output from `convert_text` is used if it's cached: a
+    snippet converted with a ``preamble`` is looked up as
+    ``convert_text('\\n'.join((preamble, content)), ...)``. Outputs of
+    batched conversions are cached with their own keys (see
+    `lsstprojectmeta.pandoc.cache.PandocCache.make_key`), so they're never
+    returned by `convert_text`. Snippets with notes are only cached by
+    `convert_text`.
+    """
+    contents = list(contents)
+    if len(contents) == 0:
+        return []
+
+    if isinstance(deparagraph, bool):
+        deparagraphs = [deparagraph] * len(contents)
+    else:
+        deparagraphs = list(deparagraph)
+        if len(deparagraphs) != len(contents):
+            raise ValueError('deparagraph must have one item per snippet')
+
+    outputs = [None] * len(contents)
+    batched = []
+    for i, content in enumerate(contents):
+        if _NOTE_PATTERN.search(content) is None:
+            batched.append(i)
+            continue
+        if preamble is not None:
+            content = '\n'.join((preamble, content))
+        outputs[i] = convert_text(content, from_fmt, to_fmt,
+                                  deparagraph=deparagraphs[i],
+                                  mathjax=mathjax, smart=smart,
+                                  extra_args=extra_args)
+
+    cache = get_pandoc_cache()
+    cache_keys = {}
+    if cache is not None:
+        pandoc_version = pypandoc.get_pandoc_version()
+        for i in batched:
+            if preamble is not None:
+                key_content = '\n'.join((preamble, contents[i]))
+            else:
+                key_content = contents[i]
+            snippet_args = _make_extra_args(deparagraph=deparagraphs[i],
+                                            mathjax=mathjax, smart=smart,
+                                            extra_args=extra_args)
+            # Use the output of a conversion run on its own, if it's cached.
+            # Otherwise, use the output of a batched conversion, which is
+            # cached separately so that it's never returned by convert_text.
+            outputs[i] = cache.get(cache.make_key(
+                key_content, from_fmt, to_fmt, extra_args=snippet_args,
+                pandoc_version=pandoc_version), count_miss=False)
+            if outputs[i] is None:
+                cache_keys[i] = cache.make_key(
+                    key_content, from_fmt, to_fmt, extra_args=snippet_args,
+                    pandoc_version=pandoc_version, batch=True)
+                outputs[i] = cache.get(cache_keys[i])
+
+    pending = [i for i in batched if outputs[i] is None]
+    if len(pending) > 0:
+        converted = _run_pandoc_batch(
+            [contents[i] for i in pending],
+            [deparagraphs[i] for i in pending],
+            from_fmt, to_fmt,
+            mathjax=mathjax, smart=smart,
+            extra_args=extra_args, preamble=preamble)
+        for i, output in zip(pending, converted):
+            if cache is not None:
+                cache.set(cache_keys[i], output)
+            outputs[i] = output
+
+    return outputs
+
+
+def _run_pandoc_batch(contents, deparagraphs, from_fmt, to_fmt,
+                      mathjax=False, smart=True, extra_args=None,
+                      preamble=None):
+    """Run pandoc on a batch of snippets (see `convert_text_batch`).
+    """
+    logger = logging.getLogger(__name__)
+
+    parts = []
+    if preamble is not None:
+        parts.append(preamble)
+    for content, deparagraph_snippet in zip(contents, deparagraphs):
+        if SNIPPET_MARKER in content:
+            raise ValueError(
+                'Snippet contains the reserved {!r} marker'.format(
+                    SNIPPET_MARKER))
+        if deparagraph_snippet:
+            parts.append(DEPARAGRAPH_SNIPPET_MARKER)
+        else:
+            parts.append(SNIPPET_MARKER)
+        parts.append(content)
+    batch_content = '\n\n'.join(parts)
+
+    extra_args = _make_extra_args(deparagraph=any(deparagraphs),
+                                  mathjax=mathjax, smart=smart,
+                                  extra_args=extra_args)
+
+    logger.debug('Running pandoc from %s to %s on %d snippets with '
+                 'extra_args %s',
+                 from_fmt, to_fmt, len(contents), extra_args)
+
+    output = _run_pandoc(batch_content, from_fmt, to_fmt, extra_args)
+
+    # The first item is any output from the preamble, before the first marker
+    output_parts = _SNIPPET_MARKER_LINE_PATTERN.split(output)[1:]
+    if len(output_parts) != len(contents):
+        raise RuntimeError(
+            'Could not split pandoc output into {0:d} snippets '
+            '(found {1:d})'.format(len(contents), len(output_parts)))
+
+    outputs = []
+    for output_part in output_parts:
+        # Normalize the blank lines around each block to match the output of
+        # a single-snippet pandoc run.
+        outputs.append(output_part.strip('\n') + '\n')
+    return outputs
+
+
+def _run_pandoc(content, from_fmt, to_fmt, extra_args):
+    """Run pandoc, applying the deparagraph filter in-process.
+
+    Parameters
+    ----------
+    content : `str`
+        Original content.
+    from_fmt : `str`
+        Format of the original ``content``.
+    to_fmt : `str`
+        Output format for the content.
+    extra_args : `set` of `str`
+        Pandoc command line arguments (see `_make_extra_args`).
+
+    Returns
+    -------
+    output : `str`
+        Content in the output (``to_fmt``) format.
+    """
+    if _DEPARAGRAPH_FILTER_ARG not in extra_args:
+        return pypandoc.convert_text(content, to_fmt, format=from_fmt,
+                                     extra_args=extra_args)
+
+    extra_args = set(extra_args)
+    extra_args.remove(_DEPARAGRAPH_FILTER_ARG)
+
+    # Read the content into pandoc's JSON AST. Any other filters run when
+    # the AST is rendered so that they aren't applied twice.
+    reader_args = [arg for arg in extra_args
+                   if not arg.startswith(('--filter', '--lua-filter'))]
+    ast = json.loads(pypandoc.convert_text(content, 'json', format=from_fmt,
+                                           extra_args=reader_args))
+    ast = deparagraph_ast(ast)
+    return pypandoc.convert_text(json.dumps(ast), to_fmt, format='json',
+                                 extra_args=extra_args)
+
+
+def _make_extra_args(deparagraph=False, mathjax=False, smart=True,
+                     extra_args=None):
+    """Build the set of pandoc command line arguments from the convenience
+    arguments of `convert_text`.
+    """
     if extra_args is not None:
         extra_args = list(extra_args)
     else:
@@ -119,14 +407,7 @@ def convert_text(content, from_fmt, to_fmt, deparagraph=False, mathjax=False,
     extra_args.append('--wrap=none')
 
     # de-dupe extra args
-    extra_args = set(extra_args)
-
-    logger.debug('Running pandoc from %s to %s with extra_args %s',
-                 from_fmt, to_fmt, extra_args)
-
-    output = pypandoc.convert_text(content, to_fmt, format=from_fmt,
-                                   extra_args=extra_args)
-    return output
+    return set(extra_args)
 
 
 def convert_lsstdoc_tex(
@@ -192,3 +473,53 @@ def convert_lsstdoc_tex(
         augmented_content, 'latex', to_fmt,
         deparagraph=deparagraph, mathjax=mathjax,
         smart=smart, extra_args=extra_args)
+
+
+def convert_lsstdoc_tex_batch(
+        contents, to_fmt, deparagraph=False, mathjax=False,
+        smart=True, extra_args=None):
+    """Convert several snippets of lsstdoc-class LaTeX to another markup
+    format with a single pandoc run.
+
+    This function is a thin wrapper around `convert_text_batch` that
+    automatically includes common lsstdoc LaTeX macros once for the whole
+    batch.
+
+    Parameters
+    ----------
+    contents : sequence of `str`
+        Original LaTeX snippets.
+
+    to_fmt : `str`
+        Output format for the content (see https://pandoc.org/MANUAL.html).
+        For example, 'html5'.
+
+    deparagraph : `bool` or sequence of `bool`, optional
+        If `True`, the paragraph wrapper of single-paragraph snippets is
+        removed (see `convert_lsstdoc_tex`). Provide a sequence, with one item
+        per snippet in ``contents``, to control this for each snippet. Default
+        is `False`.
+
+    mathjax : `bool`, optional
+        If `True` then Pandoc will markup output content to work with MathJax.
+        Default is False.
+
+    smart : `bool`, optional
+        If `True` (default) then ascii characters will be converted to unicode
+        characters like smart quotes and em dashes.
+
+    extra_args : `list`, optional
+        Sequence of Pandoc arguments command line arguments (such as
+        ``'--normalize'``).
+
+    Returns
+    -------
+    outputs : `list` of `str`
+        Content in the output (``to_fmt``) format, in the same order as
+        ``contents``.
+    """
+    return convert_text_batch(
+        contents, 'latex', to_fmt,
+        deparagraph=deparagraph, mathjax=mathjax,
+        smart=smart, extra_args=extra_args,
+        preamble=LSSTDOC_MACROS)
@@ -1,8 +1,22 @@
 """Pandoc filter to remove the outer Para wrapper and replace it with a
 Plain wrapper.
+
+The filter is available both as a panflute-based pandoc filter
+(`deparagraph`, run as ``lsstprojectmeta-deparagraph``) and as a function
+that transforms a pandoc JSON AST in-process (`deparagraph_ast`).
 """
 
-from panflute import toJSONFilter, Para, Plain
+from panflute import toJSONFilter, Doc, Para, Plain, Str
+
+SNIPPET_MARKER = 'lsstprojectmetasnippet'
+"""Text of a marker paragraph that precedes each snippet in a batched
+conversion (see `lsstprojectmeta.pandoc.convert.convert_text_batch`).
+"""
+
+DEPARAGRAPH_SNIPPET_MARKER = SNIPPET_MARKER + 'deparagraph'
+"""Text of a marker paragraph that precedes a snippet in a batched conversion
+that should be deparagraphed.
+"""
 
 
 def deparagraph(element, doc):
@@ -22,17 +36,162 @@ def deparagraph(element, doc):
     ``<p>The title</p>`` in HTML. These ``<p>`` tags aren't useful if you
     intend to put the title text in ``<h1>`` tags using your own templating
     system.
+
+    In a batched conversion, the document consists of several snippets that
+    are each preceded by a marker paragraph (`SNIPPET_MARKER` or
+    `DEPARAGRAPH_SNIPPET_MARKER`). Only the snippets that follow a
+    `DEPARAGRAPH_SNIPPET_MARKER` are deparagraphed. A top-level paragraph of
+    such a snippet is deparagraphed if it is the only block between the
+    marker and the next marker (or the end of the document).
     """
-    if isinstance(element, Para):
-        # Check if siblings exist; don't process the paragraph in that case.
-        if element.next is not None:
+    if not isinstance(element, Para) or _is_marker(element):
+        return element
+
+    # Find the snippet that the paragraph belongs to, in a batched
+    # conversion, from the marker before its top-level block.
+    top_level_block = element
+    while not isinstance(top_level_block.parent, Doc):
+        top_level_block = top_level_block.parent
+    marker = top_level_block.prev
+    while marker is not None and not _is_marker(marker):
+        marker = marker.prev
+
+    if marker is not None:
+        if not _is_marker(marker, DEPARAGRAPH_SNIPPET_MARKER):
             return element
-        elif element.prev is not None:
+        if element is top_level_block:
+            # Lone paragraph of a snippet in a batched conversion.
+            if element.prev is marker and \
+                    (element.next is None or _is_marker(element.next)):
+                return Plain(*element.content)
             return element
 
-        # Remove the Para wrapper from the lone paragraph.
-        # `Plain` is a container that isn't rendered as a paragraph.
-        return Plain(*element.content)
+    # Check if siblings exist; don't process the paragraph in that case.
+    if element.next is not None:
+        return element
+    elif element.prev is not None:
+        return element
+
+    # Remove the Para wrapper from the lone paragraph.
+    # `Plain` is a container that isn't rendered as a paragraph.
+    return Plain(*element.content)
+
+
+def deparagraph_ast(ast):
+    """Convert lone paragraphs in a pandoc JSON AST into Plain blocks.
+
+    This function applies the same transformation as the `deparagraph`
+    filter, but directly to the JSON AST produced by ``pandoc -t json``. It
+    lets `lsstprojectmeta.pandoc.convert.convert_text` apply the
+    transformation without starting a Python interpreter for a pandoc
+    filter.
+
+    Parameters
+    ----------
+    ast : `dict` or `list`
+        Decoded pandoc JSON AST. Both the pandoc 1.x (``[meta, blocks]``) and
+        2.x (``{"meta": ..., "blocks": ...}``) layouts are supported.
+
+    Returns
+    -------
+    ast : `dict` or `list`
+        The same AST, modified in place.
+
+    Examples
+    --------
+    >>> ast = {'meta': {}, 'blocks': [
+    ...     {'t': 'Para', 'c': [{'t': 'Str', 'c': 'Title'}]}]}
+    >>> deparagraph_ast(ast)['blocks']
+    [{'t': 'Plain', 'c': [{'t': 'Str', 'c': 'Title'}]}]
+    """
+    if isinstance(ast, dict):
+        blocks = ast['blocks']
+    else:
+        blocks = ast[1]
+
+    if not any(_is_ast_marker(block) for block in blocks):
+        _deparagraph_ast_node(blocks)
+        return ast
+
+    # In a batched conversion, only deparagraph the snippets that follow a
+    # DEPARAGRAPH_SNIPPET_MARKER, and the top-level paragraph of a snippet
+    # only if it's the snippet's only block.
+    marker = None
+    for i, block in enumerate(blocks):
+        if _is_ast_marker(block):
+            marker = block
+            continue
+        if marker is None or \
+                not _is_ast_marker(marker, DEPARAGRAPH_SNIPPET_MARKER):
+            continue
+        _deparagraph_ast_node(block)
+        next_block = blocks[i + 1] if i < len(blocks) - 1 else None
+        if _is_ast_element(block, 'Para') and blocks[i - 1] is marker and \
+                (next_block is None or _is_ast_marker(next_block)):
+            block['t'] = 'Plain'
+    return ast
+
+
+def _deparagraph_ast_node(node):
+    """Recursively apply the deparagraph transformation to a node of a
+    pandoc JSON AST.
+
+    Any list in the AST is treated as a possible sequence of sibling
+    elements. Para elements only occur in sequences of blocks.
+    """
+    if isinstance(node, dict):
+        if 'c' in node:
+            _deparagraph_ast_node(node['c'])
+        return
+
+    if not isinstance(node, list):
+        return
+
+    for item in node:
+        _deparagraph_ast_node(item)
+
+    if len(node) == 1 and _is_ast_element(node[0], 'Para'):
+        node[0]['t'] = 'Plain'
+
+
+def _is_ast_element(node, element_type):
+    """Test if a pandoc JSON AST node is an element of the given type."""
+    return isinstance(node, dict) and node.get('t') == element_type
+
+
+def _is_ast_marker(node, marker_text=None):
+    """Test if a pandoc JSON AST node is a snippet marker paragraph (see
+    `_is_marker`).
+    """
+    if not _is_ast_element(node, 'Para') or len(node['c']) != 1:
+        return False
+    token = node['c'][0]
+    if not _is_ast_element(token, 'Str'):
+        return False
+    if marker_text is None:
+        return token['c'] in (SNIPPET_MARKER, DEPARAGRAPH_SNIPPET_MARKER)
+    return token['c'] == marker_text
+
+
+def _is_marker(element, marker_text=None):
+    """Test if an element is a snippet marker paragraph.
+
+    Parameters
+    ----------
+    element : `panflute.Element`
+        An element, or `None`.
+    marker_text : `str`, optional
+        Text of the marker. By default, either `SNIPPET_MARKER` or
+        `DEPARAGRAPH_SNIPPET_MARKER` is matched.
+    """
+    if not isinstance(element, Para) or len(element.content) != 1:
+        return False
+    token = element.content[0]
+    if not isinstance(token, Str):
+        return False
+    if marker_text is None:
+        return token.text in (SNIPPET_MARKER, DEPARAGRAPH_SNIPPET_MARKER)
+    return token.text == marker_text
 
 
 def main():
@@ -0,0 +1,355 @@
+"""Scheduling for bulk asyncio pipelines: bounded concurrency, per-host
+request limits, progress reporting, and offloading CPU-bound work from the
+event loop.
+"""
+
+__all__ = ('HostLimits', 'HostLimitedSession', 'BoundedScheduler',
+           'SchedulerProgress', 'run_cpu_bound')
+
+import asyncio
+from collections import namedtuple
+import functools
+import logging
+import time
+from urllib.parse import urlsplit
+
+
+class HostLimits(object):
+    """Limits on the number of concurrent HTTP requests to each host.
+
+    Parameters
+    ----------
+    default : `int`, optional
+        Maximum number of concurrent requests to a host that doesn't have
+        its own limit in ``limits``.
+    limits : `dict`, optional
+        Maximum number of concurrent requests (`int` values) to specific
+        hosts (`str` keys, such as ``'api.github.com'``).
+
+    Examples
+    --------
+    >>> limits = HostLimits(default=8, limits={'api.github.com': 2})
+    >>> limits.limit_for('https://api.github.com/graphql')
+    2
+    >>> limits.limit_for('https://keeper.lsst.codes/products/')
+    8
+    """
+
+    def __init__(self, default=8, limits=None):
+        super().__init__()
+        self.default = default
+        self.limits = dict(limits) if limits is not None else {}
+        for host, limit in list(self.limits.items()) + [(None, default)]:
+            if limit < 1:
+                raise ValueError(
+                    'Host limit must be at least 1: {0}={1!r}'.format(
+                        host or 'default', limit))
+        self._semaphores = {}
+
+    @classmethod
+    def from_strings(cls, items, default=8):
+        """Create limits from ``'host=limit'`` strings, such as those given
+        on the command line.
+
+        Parameters
+        ----------
+        items : iterable of `str`
+            Strings formatted as ``'host=limit'``. For example,
+            ``'api.github.com=2'``.
+        default : `int`, optional
+            Limit for other hosts.
+
+        Returns
+        -------
+        host_limits : `HostLimits`
+            Host limits.
+
+        Raises
+        ------
+        ValueError
+            Raised if an item isn't formatted as ``'host=limit'``.
+        """
+        limits = {}
+        for item in items:
+            host, _, limit = item.partition('=')
+            host = host.strip().lower()
+            try:
+                limits[host] = int(limit)
+            except ValueError:
+                raise ValueError(
+                    'Host limit must be formatted as host=limit: '
+                    '{0!r}'.format(item))
+            if not host:
+                raise ValueError(
+                    'Host limit must be formatted as host=limit: '
+                    '{0!r}'.format(item))
+        return cls(default=default, limits=limits)
+
+    def limit_for(self, url):
+        """Get the concurrent request limit for a URL's host.
+
+        Parameters
+        ----------
+        url : `str`
+            URL.
+
+        Returns
+        -------
+        limit : `int`
+            Maximum number of concurrent requests to the URL's host.
+        """
+        host = _get_host(url)
+        return self.limits.get(host, self.default)
+
+    def semaphore_for(self, url):
+        """Get the semaphore that limits concurrent requests to a URL's host.
+
+        Semaphores are created on first use, from within the running event
+        loop.
+
+        Parameters
+        ----------
+        url : `str`
+            URL.
+
+        Returns
+        -------
+        semaphore : `asyncio.Semaphore`
+            Semaphore shared by all requests to the URL's host.
+        """
+        host = _get_host(url)
+        try:
+            return self._semaphores[host]
+        except KeyError:
+            semaphore = asyncio.Semaphore(self.limits.get(host, self.default))
+            self._semaphores[host] = semaphore
+            return semaphore
+
+
+class HostLimitedSession(object):
+    """Wrapper around an `aiohttp.ClientSession` that limits the number of
+    concurrent requests to each host.
+
+    Requests are made with the ``async with`` form, as with the wrapped
+    session:
+
+    .. code-block:: python
+
+       async with session.get(url) as response:
+           data = await response.json()
+
+    A request holds one of its host's slots until the ``async with`` block
+    exits, so reading the response body counts towards the limit. Other
+    attributes are passed through to the wrapped session.
+
+    Parameters
+    ----------
+    session : `aiohttp.ClientSession`
+        Your application's aiohttp client session.
+    host_limits : `HostLimits`
+        Concurrent request limits for each host.
+    """
+
+    def __init__(self, session, host_limits):
+        super().__init__()
+        self._session = session
+        self.host_limits = host_limits
+
+    def request(self, method, url, **kwargs):
+        """Make a request with the wrapped session once the host has a free
+        slot.
+
+        Parameters
+        ----------
+        method : `str`
+            HTTP method, such as ``'GET'``.
+        url : `str`
+            URL.
+        **kwargs
+            Keyword arguments for `aiohttp.ClientSession.request`.
+
+        Returns
+        -------
+        request : asynchronous context manager
+            Asynchronous context manager that yields the
+            `aiohttp.ClientResponse`.
+        """
+        return _HostLimitedRequest(
+            self.host_limits.semaphore_for(url),
+            functools.partial(self._session.request, method, url, **kwargs))
+
+    def get(self, url, **kwargs):
+        """Make a ``GET`` request (see `request`)."""
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        """Make a ``POST`` request (see `request`)."""
+        return self.request('POST', url, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._session, name)
+
+
+class _HostLimitedRequest(object):
+    """Asynchronous context manager for a request made through a
+    `HostLimitedSession`.
+    """
+
+    def __init__(self, semaphore, make_request):
+        self._semaphore = semaphore
+        self._make_request = make_request
+        self._request = None
+
+    async def __aenter__(self):
+        await self._semaphore.acquire()
+        try:
+            self._request = self._make_request()
+            return await self._request.__aenter__()
+        except BaseException:
+            self._semaphore.release()
+            raise
+
+    async def __aexit__(self, exc_type, exc, tb):
+        try:
+            return await self._request.__aexit__(exc_type, exc, tb)
+        finally:
+            self._semaphore.release()
+
+
+SchedulerProgress = namedtuple(
+    'SchedulerProgress',
+    ['total', 'done', 'failed', 'active', 'elapsed'])
+"""Snapshot of a `BoundedScheduler` run.
+
+Fields are:
+
+- ``total``: number of items to process.
+- ``done``: number of items finished, including failures.
+- ``failed``: number of items whose task raised an exception.
+- ``active``: number of items being processed.
+- ``elapsed``: seconds since the run started.
+"""
+
+
+class BoundedScheduler(object):
+    """Run a coroutine function over many items with a bounded number of
+    concurrent tasks.
+
+    Unlike `asyncio.gather` over one task per item, at most ``concurrency``
+    coroutines exist at once, so memory use and the number of in-flight
+    requests stay bounded however many items there are.
+
+    Parameters
+    ----------
+    concurrency : `int`, optional
+        Maximum number of items processed at once.
+    progress_interval : `float`, optional
+        Minimum time, in seconds, between progress reports.
+    progress_callback : callable, optional
+        Called with a `SchedulerProgress` to report progress. The default
+        logs the progress at the ``INFO`` level.
+    """
+
+    def __init__(self, concurrency=8, progress_interval=10.,
+                 progress_callback=None):
+        super().__init__()
+        if concurrency < 1:
+            raise ValueError(
+                'concurrency must be at least 1: {0!r}'.format(concurrency))
+        self.concurrency = concurrency
+        self.progress_interval = progress_interval
+        if progress_callback is None:
+            progress_callback = self._log_progress
+        self.progress_callback = progress_callback
+        self._logger = logging.getLogger(__name__)
+
+    async def map(self, coro_func, items):
+        """Process items concurrently.
+
+        Parameters
+        ----------
+        coro_func : callable
+            Coroutine function called with each item.
+        items : iterable
+            Items to process.
+
+        Returns
+        -------
+        results : `list`
+            Result of ``coro_func`` for each item, in the order of
+            ``items``. If processing an item raises an exception, the
+            exception is logged and its result is `None`.
+        """
+        items = list(items)
+        results = [None] * len(items)
+        state = {'done': 0, 'failed': 0, 'active': 0,
+                 'start': time.monotonic(), 'last_report': None}
+        pending = iter(enumerate(items))
+
+        def progress():
+            return SchedulerProgress(
+                total=len(items),
+                done=state['done'],
+                failed=state['failed'],
+                active=state['active'],
+                elapsed=time.monotonic() - state['start'])
+
+        async def worker():
+            # Workers share the iterator, so each item is taken once.
+            for index, item in pending:
+                state['active'] += 1
+                try:
+                    results[index] = await coro_func(item)
+                except Exception:
+                    state['failed'] += 1
+                    self._logger.exception('Error processing %r', item)
+                finally:
+                    state['active'] -= 1
+                    state['done'] += 1
+                now = time.monotonic()
+                if state['last_report'] is None or \
+                        now - state['last_report'] >= self.progress_interval:
+                    state['last_report'] = now
+                    self.progress_callback(progress())
+
+        n_workers = min(self.concurrency, len(items))
+        await asyncio.gather(*[worker() for _ in range(n_workers)])
+
+        self.progress_callback(progress())
+        return results
+
+    def _log_progress(self, progress):
+        rate = progress.done / progress.elapsed if progress.elapsed else 0.
+        self._logger.info(
+            'Processed %d of %d items (%d failed, %d active) in %.1f s, '
+            '%.2f items/s',
+            progress.done, progress.total, progress.failed, progress.active,
+            progress.elapsed, rate)
+
+
+async def run_cpu_bound(func, *args, executor=None):
+    """Run a CPU-bound function in an executor so that it doesn't block the
+    event loop.
+
+    Parameters
+    ----------
+    func : callable
+        Function to run.
+    *args
+        Positional arguments for ``func``.
+    executor : `concurrent.futures.Executor`, optional
+        Executor to run ``func`` in. The default is the event loop's default
+        executor. A `concurrent.futures.ProcessPoolExecutor` also requires
+        ``func`` and ``args`` to be picklable.
+
+    Returns
+    -------
+    result
+        Return value of ``func``.
+    """
+    loop = asyncio.get_event_loop()
+    return await loop.run_in_executor(executor, func, *args)
+
+
+def _get_host(url):
+    return (urlsplit(url).hostname or '').lower()
@@ -0,0 +1,243 @@
+"""Index BibTeX files by cite key, and parse their entries on demand.
+"""
+
+__all__ = ['BibtexIndex', 'index_bibtex', 'LazyBibliographyData']
+
+from collections import OrderedDict
+from collections.abc import Mapping
+import logging
+import re
+
+from pybtex.database import BibliographyData
+from pybtex.database.input.bibtex import Parser
+
+# Start of a BibTeX command, like ``@article{`` or ``@string(``.
+_COMMAND_START_PATTERN = re.compile(r'@\s*([A-Za-z][\w\-:.]*)\s*([{(])')
+
+# Cite key at the start of an entry's body.
+_KEY_PATTERN = re.compile(r'\s*([^\s,{}()"#%\']+)\s*,')
+
+# Closing delimiter of a command's body, given its opening delimiter.
+_CLOSING_DELIMITERS = {'{': '}', '(': ')'}
+
+# Characters that delimit a command's body, its braced values, and its
+# quoted values.
+_DELIMITER_PATTERN = re.compile(r'[{}()"]')
+
+
+class BibtexIndex(object):
+    """Index of the entries in BibTeX content, made by `index_bibtex`.
+
+    Indices are small and picklable, so they can be stored (for example, in
+    an `lsstprojectmeta.httpcache.HttpCache`) and reused for unchanged
+    content.
+
+    Attributes
+    ----------
+    entries : `collections.OrderedDict`
+        Spans of entries, keyed by lower-case cite key. Values are
+        ``(key, start, end)`` tuples, where ``key`` is the cite key as it's
+        written in the content, and ``content[start:end]`` is the entry's
+        source.
+    strings : `str`
+        Source of the content's ``@string`` commands, which entries can
+        refer to.
+    preamble : `list` of `str`
+        LaTeX preamble defined by the content's ``@preamble`` commands.
+    """
+
+    def __init__(self, entries, strings='', preamble=None):
+        super().__init__()
+        self.entries = entries
+        self.strings = strings
+        self.preamble = preamble or []
+
+    def __len__(self):
+        return len(self.entries)
+
+
+def index_bibtex(bibtex):
+    """Index the entries in BibTeX content without parsing them.
+
+    The scanner only finds the cite key and the extent of each entry, by
+    matching the braces (or parentheses) around its body. This is much
+    faster than parsing the content with pybtex, and the index is much
+    smaller than a `pybtex.database.BibliographyData`.
+
+    Parameters
+    ----------
+    bibtex : `str`
+        BibTeX content.
+
+    Returns
+    -------
+    index : `BibtexIndex`
+        Index of the entries in ``bibtex``. If a cite key is repeated, the
+        first entry is indexed.
+
+    Examples
+    --------
+    >>> index = index_bibtex('@Article{Key1, title = {A}}\\n'
+    ...                      '@book(key2, title = "B")\\n')
+    >>> list(index.entries.items())
+    [('key1', ('Key1', 0, 27)), ('key2', ('key2', 28, 52))]
+    """
+    logger = logging.getLogger(__name__)
+    entries = OrderedDict()
+    strings = []
+    preambles = []
+
+    position = 0
+    while True:
+        match = _COMMAND_START_PATTERN.search(bibtex, position)
+        if match is None:
+            break
+        command = match.group(1).lower()
+        if command == 'comment':
+            # Like BibTeX, only skip the command itself; its body is text
+            # between entries.
+            position = match.end()
+            continue
+
+        start = match.start()
+        end = _find_body_end(bibtex, match.end(), match.group(2))
+        position = end
+        if command == 'string':
+            strings.append(bibtex[start:end])
+            continue
+        elif command == 'preamble':
+            preambles.append(bibtex[start:end])
+            continue
+
+        key_match = _KEY_PATTERN.match(bibtex, match.end())
+        if key_match is None:
+            logger.warning('Could not find the cite key of the BibTeX entry '
+                           'at %d: %r', start, bibtex[start:start + 80])
+            continue
+        key = key_match.group(1)
+        if key.lower() in entries:
+            logger.warning('Repeated BibTeX entry %r at %d', key, start)
+            continue
+        entries[key.lower()] = (key, start, end)
+
+    strings = '\n'.join(strings)
+    if preambles:
+        preamble = Parser().parse_string(
+            strings + '\n' + '\n'.join(preambles)).preamble_list
+    else:
+        preamble = []
+    return BibtexIndex(entries, strings=strings, preamble=preamble)
+
+
+def _find_body_end(bibtex, position, opening_delimiter):
+    """Find the end of a BibTeX command's body, just after its closing
+    delimiter, given the position just after its opening delimiter.
+
+    Braces are matched, so closing delimiters in braced or quoted field
+    values don't end the body. If the body isn't closed, it ends at the end
+    of the content.
+    """
+    closing_delimiter = _CLOSING_DELIMITERS[opening_delimiter]
+    depth = 0
+    quoted = False
+    for match in _DELIMITER_PATTERN.finditer(bibtex, position):
+        char = match.group()
+        if depth == 0 and not quoted and char == closing_delimiter:
+            return match.end()
+        elif char == '{':
+            depth += 1
+        elif char == '}':
+            depth -= 1
+        elif char == '"' and depth == 0:
+            quoted = not quoted
+    return len(bibtex)
+
+
+class LazyBibliographyData(BibliographyData):
+    """A read-only pybtex bibliography of BibTeX files, whose entries are
+    parsed when they're first accessed.
+
+    Entries are looked up in a `BibtexIndex` of each file, and each entry is
+    parsed with pybtex the first time it's accessed through ``entries``.
+    Parsed entries are kept. Looking up a few cite keys is much faster, and
+    uses much less memory, than parsing the whole files.
+
+    Parameters
+    ----------
+    bibtexs : sequence of `str`
+        Content of BibTeX files. If a cite key is in more than one file, the
+        entry in the first file is used.
+    indices : sequence of `BibtexIndex`, optional
+        Indices of ``bibtexs``, made by `index_bibtex`. By default, the
+        content is indexed.
+
+    Examples
+    --------
+    >>> bib = LazyBibliographyData(['@article{key, year = 2018}'])
+    >>> 'KEY' in bib.entries
+    True
+    >>> print(bib.entries['key'].fields['year'])
+    2018
+    """
+
+    def __init__(self, bibtexs, indices=None):
+        super().__init__()
+        if indices is None:
+            indices = [index_bibtex(bibtex) for bibtex in bibtexs]
+        self.entries = _LazyEntries(bibtexs, indices)
+        for index in indices:
+            self.add_to_preamble(*index.preamble)
+
+    @property
+    def parsed_count(self):
+        """Number of entries that are parsed (`int`)."""
+        return len(self.entries._parsed)
+
+
+class _LazyEntries(Mapping):
+    """Case-insensitive mapping of the entries of a `LazyBibliographyData`
+    that parses entries on demand.
+    """
+
+    def __init__(self, bibtexs, indices):
+        self._bibtexs = list(bibtexs)
+        self._strings = [index.strings for index in indices]
+        # (file number, key, start, end) tuples, keyed by lower-case key
+        self._spans = OrderedDict()
+        for number, index in enumerate(indices):
+            for lower_key, (key, start, end) in index.entries.items():
+                if lower_key in self._spans:
+                    logging.getLogger(__name__).warning(
+                        'Repeated BibTeX entry %r', key)
+                    continue
+                self._spans[lower_key] = (number, key, start, end)
+        self._parsed = {}
+
+    def __getitem__(self, key):
+        lower_key = key.lower()
+        try:
+            return self._parsed[lower_key]
+        except KeyError:
+            pass
+        number, key, start, end = self._spans[lower_key]
+        bibtex = self._bibtexs[number]
+        # The BibTeX parser is used directly, because parse_string looks it
+        # up in the installed plugins, which is slower than parsing an entry.
+        parsed = Parser().parse_string(
+            self._strings[number] + '\n' + bibtex[start:end])
+        entry = parsed.entries[key]
+        self._parsed[lower_key] = entry
+        return entry
+
+    def __contains__(self, key):
+        return key.lower() in self._spans
+
+    def __iter__(self):
+        return (key for _, key, _, _ in self._spans.values())
+
+    def __len__(self):
+        return len(self._spans)
+
+    def __repr__(self):
+        return '{0}({1:d} entries, {2:d} parsed)'.format(
+            type(self).__name__, len(self._spans), len(self._parsed))
@@ -1,5 +1,8 @@
 __all__ = ['CitationLinker']
 
+import functools
+import re
+
 from .commandparser import LatexCommand
 
 from .lsstbib import (
@@ -27,8 +30,10 @@ class CitationLinker(object):
         self._db = bibtex_database
 
         # Register and build Linker classes. They all share the same API.
-        self._linker_classes = [CitedsLinker, CitedspLinker]
-        self._linkers = [cls(self._db) for cls in self._linker_classes]
+        self._linker_classes = [CitedsLinker, CitedspLinker, CitepLinker,
+                                CitetLinker, CitealpLinker, CitealtLinker]
+        self._linkers = {cls.command_name: cls(self._db)
+                         for cls in self._linker_classes}
 
     def __call__(self, tex_source):
         r"""Convert citations in LaTeX source to Hyperref links.
@@ -43,17 +48,27 @@ class CitationLinker(object):
         processed_tex : `str`
             LaTeX document source with all citation commands converted to
             ``\hyperref`` commands.
+
+        Notes
+        -----
+        All types of citation commands are converted in a single pass
+        through the source.
         """
-        for linker in self._linkers:
-            tex_source = linker(tex_source)
-        return tex_source
+        return _link_commands(tex_source, self._linkers)
 
 
 class BaseCommandLinker(object):
     """Baseclass for citation linkers that process specific types of
     LaTeX commands.
+
+    Subclasses set the ``command_name`` and ``command`` attributes, and
+    implement a ``_format_command`` method that returns the replacement
+    for a `~lsstprojectmeta.tex.commandparser.ParsedCommand`.
     """
 
+    command_name = None
+    """Name of LaTeX command."""
+
     def __call__(self, tex_source):
         r"""Convert commands of type ``command`` in LaTeX source to Hyperref
         links.
@@ -69,13 +84,7 @@ class BaseCommandLinker(object):
             LaTeX document source with commands of type ``command`` to
             ``\hyperref`` commands.
         """
-        while True:
-            try:
-                parsed = next(self.command.parse(tex_source))
-            except StopIteration:
-                break
-            tex_source = self._replace_command(tex_source, parsed)
-        return tex_source
+        return _link_commands(tex_source, {self.command_name: self})
 
 
 class CitedsLinker(BaseCommandLinker):
@@ -111,7 +120,7 @@ class CitedsLinker(BaseCommandLinker):
             self.parens[0] + r'\href{{{url}}}{{{content}}}' + self.parens[1]
         )
 
-    def _replace_command(self, tex_source, parsed):
+    def _format_command(self, parsed):
         if 'title' in parsed:
             content = parsed['title']
         else:
@@ -121,12 +130,7 @@ class CitedsLinker(BaseCommandLinker):
 
         url = 'https://ls.st/{citekey}'.format(citekey=parsed['citekey'])
 
-        href_command = self.template.format(url=url, content=content)
-        tex_source = tex_source.replace(
-            parsed.command_source,
-            href_command)
-
-        return tex_source
+        return self.template.format(url=url, content=content)
 
 
 class CitedspLinker(CitedsLinker):
@@ -183,52 +187,165 @@ class CitepLinker(BaseCommandLinker):
     [\href{http://adsabs.harvard.edu/abs/2001ApJ...}{Bell and de Jong 2001}]
     """
 
+    command_name = 'citep'
+    """Name of LaTeX command."""
+
+    paren = False
+    """Whether the year is wrapped in parentheses (see
+    `~lsstprojectmeta.tex.lsstbib.get_authoryear_from_entry`).
+    """
+
+    outer_template = "[{content}]"
+    """Template for the full citation, given the ``content`` of the linked
+    cite keys.
+    """
+
     def __init__(self, bibtex_database=None):
         super().__init__()
         self._db = bibtex_database
         self.command = LatexCommand(
-            'citep',
+            self.command_name,
             {'bracket': '[', 'required': False, 'name': 'prefix'},
             {'bracket': '[', 'required': False, 'name': 'suffix'},
             {'bracket': '{', 'required': True, 'name': 'citekeys'}
         )
-        self.outer_template = "[{content}]"
         self.link_template = r"\href{{{url}}}{{{content}}}"
 
-    def _replace_command(self, tex_source, parsed):
+        # Cache of formatted citations, keyed by cite key
+        self._citations = {}
+
+    def _format_command(self, parsed):
         cite_keys = [k.strip() for k in parsed['citekeys'].split(',')]
+        content = ', '.join(self._format_citation(cite_key)
+                            for cite_key in cite_keys)
+        return self.outer_template.format(content=content)
+
+    def _format_citation(self, cite_key):
+        """Format the citation of a single cite key, reusing previously
+        formatted citations.
+        """
+        try:
+            return self._citations[cite_key]
+        except KeyError:
+            pass
+
+        if self._db and cite_key in self._db.entries:
+            entry = self._db.entries[cite_key]
+            try:
+                url = get_url_from_entry(entry)
+            except NoEntryUrlError:
+                url = None
+
+            try:
+                authoryear = get_authoryear_from_entry(entry,
+                                                       paren=self.paren)
+            except AuthorYearError:
+                authoryear = None
+        else:
+            url = None
+            authoryear = None
+
+        if url is not None and authoryear is not None:
+            citation = self.link_template.format(url=url, content=authoryear)
+        elif url is None and authoryear is not None:
+            # No link in this case
+            citation = authoryear
+        elif url is not None and authoryear is None:
+            # Link with cite key
+            citation = self.link_template.format(url=url, content=cite_key)
+        else:
+            # Just show cite key
+            citation = cite_key
+
+        self._citations[cite_key] = citation
+        return citation
+
+
+class CitetLinker(CitepLinker):
+    r"""Replace a ``\citet`` citation with an ``\href`` command.
 
-        hrefs = []
-        for cite_key in cite_keys:
-            if self._db and cite_key in self._db.entries:
-                entry = self._db.entries[cite_key]
-                try:
-                    url = get_url_from_entry(entry)
-                except NoEntryUrlError:
-                    url = None
-
-                try:
-                    authoryear = get_authoryear_from_entry(entry, paren=False)
-                except AuthorYearError:
-                    authoryear = None
-
-                if url is not None and authoryear is not None:
-                    hrefs.append(self.link_template.format(url=url,
-                                                           content=authoryear))
-                elif url is None and authoryear is not None:
-                    # No link in this case
-                    hrefs.append(authoryear)
-                elif url is not None and authoryear is None:
-                    # Link with cite key
-                    hrefs.append(self.link_template.format(url=url,
-                                                           content=cite_key))
-                else:
-                    # Just show cite key
-                    hrefs.append(cite_key)
-
-        replacement = self.outer_template.format(content=', '.join(hrefs))
-        tex_source = tex_source.replace(
-            parsed.command_source,
-            replacement)
+    The textual citation has the year in parentheses, like
+    ``Bell and de Jong (2001)``.
+    """
+
+    command_name = 'citet'
+    """Name of LaTeX command."""
+
+    paren = True
 
+    outer_template = "{content}"
+
+
+class CitealpLinker(CitepLinker):
+    r"""Replace a ``\citealp`` citation with an ``\href`` command.
+
+    This is a ``\citep`` citation without the enclosing brackets.
+    """
+
+    command_name = 'citealp'
+    """Name of LaTeX command."""
+
+    outer_template = "{content}"
+
+
+class CitealtLinker(CitepLinker):
+    r"""Replace a ``\citealt`` citation with an ``\href`` command.
+
+    This is a ``\citet`` citation without parentheses around the year.
+    """
+
+    command_name = 'citealt'
+    """Name of LaTeX command."""
+
+    paren = False
+
+    outer_template = "{content}"
+
+
+def _link_commands(tex_source, linkers):
+    """Replace the commands processed by a set of linkers in a single pass
+    through the LaTeX source.
+
+    Parameters
+    ----------
+    tex_source : `str`
+        LaTeX document source.
+    linkers : `dict`
+        Linkers (`BaseCommandLinker` instances), keyed by the name of the
+        command they process.
+
+    Returns
+    -------
+    processed_tex : `str`
+        LaTeX document source with the commands replaced.
+    """
+    pattern = _make_linkers_pattern(tuple(sorted(linkers)))
+    pieces = []
+    # Index in tex_source up to which the source is processed
+    running_index = 0
+    for match in pattern.finditer(tex_source):
+        start_index = match.start()
+        if start_index < running_index:
+            # Command is inside the arguments of a replaced command
+            continue
+        linker = linkers[match.group(1)]
+        parsed = linker.command._parse_command(tex_source, start_index)
+        # Link commands nested in the replacement, like a \citeds inside
+        # the title of a \citeds.
+        replacement = _link_commands(linker._format_command(parsed), linkers)
+        pieces.append(tex_source[running_index:start_index])
+        pieces.append(replacement)
+        running_index = start_index + len(parsed.command_source)
+    if running_index == 0:
         return tex_source
+    pieces.append(tex_source[running_index:])
+    return ''.join(pieces)
+
+
+@functools.lru_cache()
+def _make_linkers_pattern(command_names):
+    """Make a regular expression that matches any of the named commands.
+
+    See `lsstprojectmeta.tex.commandparser.LatexCommand._make_command_regex`.
+    """
+    return re.compile(r'\\(' + '|'.join(command_names) + r')(?:[\s{[%])')
@@ -1,12 +1,46 @@
 """Flexible LaTeX command parsing.
 """
 
-__all__ = ['LatexCommand', 'ParsedCommand']
+__all__ = ['LatexCommand', 'ParsedCommand', 'LatexCommandIndex']
 
+import collections
 import logging
 import re
 
 
+# Matches any command with an alphabetic name, followed by the same
+# characters that LatexCommand._make_command_regex requires. The group
+# includes that trailing character, which is never a backslash, so consuming
+# it doesn't hide the next command (this is faster than a lookahead).
+COMMAND_PATTERN = re.compile(r'\\([a-zA-Z]+[\s{[%])')
+
+# Command names that can be found with COMMAND_PATTERN.
+_ALPHA_NAME_PATTERN = re.compile(r'[a-zA-Z]+$')
+
+# Patterns that LatexCommand._parse_command uses to jump to the next
+# character of interest without copying the source. Keys are the opening
+# bracket of a command element.
+# - _OPENING_PATTERNS find the opening bracket, or the end of the line.
+# - _OPTIONAL_OPENING_PATTERNS match the opening bracket of an optional
+#   element, after whitespace on the same line.
+# - _BRACKET_PATTERNS find the next opening or closing bracket, or an escape.
+_OPENING_PATTERNS = {
+    '{': re.compile(r'[{\n]'),
+    '[': re.compile(r'[\[\n]'),
+}
+_OPTIONAL_OPENING_PATTERNS = {
+    '{': re.compile(r'[^\S\n]*{'),
+    '[': re.compile(r'[^\S\n]*\['),
+}
+_BRACKET_PATTERNS = {
+    '{': re.compile(r'[{}\\]'),
+    '[': re.compile(r'[\[\]\\]'),
+}
+
+# Matches a whitespace-delimited command argument, like ``\input file``.
+_WHITESPACE_ARGUMENT_PATTERN = re.compile(r'(?P<content>\S+)(?:[ %\t\n]+)')
+
+
 class LatexCommand(object):
     r"""Definition of a LaTeX command's syntax that is used for parsing that
     command's content from a LaTeX source document.
@@ -48,8 +82,10 @@ class LatexCommand(object):
 
         Parameters
         ----------
-        source : `str`
-            The full source of the tex document.
+        source : `str` or `LatexCommandIndex`
+            The full source of the tex document, or an index of the commands
+            in that source. Parsing from a `LatexCommandIndex` avoids
+            searching the full source again.
 
         Yields
         ------
@@ -57,6 +93,10 @@ class LatexCommand(object):
             Yields parsed commands instances for each occurence of the command
             in the source.
         """
+        if isinstance(source, LatexCommandIndex):
+            yield from source.parse(self)
+            return
+
         command_regex = self._make_command_regex(self.name)
         for match in re.finditer(command_regex, source):
             self._logger.debug(match)
@@ -85,6 +125,17 @@ class LatexCommand(object):
         """
         return r'\\' + name + r'(?:[\s{[%])'
 
+    @property
+    def signature(self):
+        """Hashable description of the command's syntax (`tuple`).
+
+        Two `LatexCommand` instances with the same signature parse the same
+        content from a source.
+        """
+        return (self.name,) + tuple(
+            (element['bracket'], element['required'], element['name'])
+            for element in self.elements)
+
     def _parse_command(self, source, start_index):
         """Parse a single command.
 
@@ -105,35 +156,42 @@ class LatexCommand(object):
         # Index of the parser in the source
         running_index = start_index
 
+        # Index of the end of the command name
+        name_end = start_index + 1 + len(self.name)
+
         for element in self.elements:
             opening_bracket = element['bracket']
             closing_bracket = self._brackets[opening_bracket]
 
-            # Find the opening bracket.
             element_start = None
             element_end = None
-            for i, c in enumerate(source[running_index:], start=running_index):
-                if c == element['bracket']:
-                    element_start = i
-                    break
-                elif c == '\n':
-                    # No starting bracket on the line.
-                    if element['required'] is True:
-                        # Try to parse a single single-word token after the
-                        # command, like '\input file'
-                        content = self._parse_whitespace_argument(
-                            source[running_index:],
-                            self.name)
-                        return ParsedCommand(
-                            self.name,
-                            [{'index': element['index'],
-                              'name': element['name'],
-                              'content': content.strip()}],
-                            start_index,
-                            source[start_index:i])
-                    else:
-                        # Give up on finding an optional element
-                        break
+            if element['required'] is False:
+                # An optional element must follow the command name or the
+                # previous element, after any whitespace on the same line.
+                match = _OPTIONAL_OPENING_PATTERNS[opening_bracket].match(
+                    source, max(running_index, name_end))
+                if match is not None:
+                    element_start = match.end() - 1
+            else:
+                # Find the opening bracket, or the end of the line.
+                match = _OPENING_PATTERNS[opening_bracket].search(
+                    source, running_index)
+                if match is not None and match.group() == opening_bracket:
+                    element_start = match.start()
+                elif match is not None:
+                    # No starting bracket on the line. Try to parse a single
+                    # single-word token after the command, like '\input file'
+                    content = self._parse_whitespace_argument(
+                        source,
+                        self.name,
+                        start=running_index)
+                    return ParsedCommand(
+                        self.name,
+                        [{'index': element['index'],
+                          'name': element['name'],
+                          'content': content.strip()}],
+                        start_index,
+                        source[start_index:match.start()])
 
             # Handle cases when the opening bracket is never found.
             if element_start is None and element['required'] is False:
@@ -149,18 +207,24 @@ class LatexCommand(object):
                 raise CommandParserError(message)
 
             # Find the closing bracket, keeping track of the number of times
-            # the same type of bracket was opened and closed.
+            # the same type of bracket was opened and closed. Escaped
+            # characters, like '\{', are skipped.
             balance = 1
-            for i, c in enumerate(source[element_start + 1:],
-                                  start=element_start + 1):
-                if c == opening_bracket:
+            bracket_pattern = _BRACKET_PATTERNS[opening_bracket]
+            index = element_start + 1
+            while balance > 0:
+                match = bracket_pattern.search(source, index)
+                if match is None:
+                    break
+                c = match.group()
+                index = match.end()
+                if c == '\\':
+                    index += 1
+                elif c == opening_bracket:
                     balance += 1
                 elif c == closing_bracket:
                     balance -= 1
-
-                if balance == 0:
-                    element_end = i
-                    break
+            element_end = index - 1
 
             if balance > 0:
                 message = ('Parsing command {0} at index {1:d}, '
@@ -188,7 +252,7 @@ class LatexCommand(object):
         return parsed_command
 
     @staticmethod
-    def _parse_whitespace_argument(source, name):
+    def _parse_whitespace_argument(source, name, start=0):
         r"""Attempt to parse a single token on the first line of this source.
 
         This method is used for parsing whitespace-delimited arguments, like
@@ -201,18 +265,31 @@ class LatexCommand(object):
 
         Bracket delimited arguments (``\input{test.tex}``) are handled in
         the normal logic of `_parse_command`.
+
+        Parameters
+        ----------
+        source : `str`
+            The tex source.
+        name : `str`
+            Name of the command (without the backslash prefix).
+        start : `int`, optional
+            Character index in ``source`` where parsing begins.
+
+        Returns
+        -------
+        content : `str`
+            The whitespace-delimited argument.
         """
         # First match the command name itself so that we find the argument
         # *after* the command
-        command_pattern = r'\\(' + name + r')(?:[\s{[%])'
-        command_match = re.search(command_pattern, source)
+        command_pattern = re.compile(r'\\(' + name + r')(?:[\s{[%])')
+        command_match = command_pattern.search(source, start)
         if command_match is not None:
-            # Trim `source` so we only look after the command
-            source = source[command_match.end(1):]
+            # Only look after the command
+            start = command_match.end(1)
 
         # Find the whitespace-delimited argument itself.
-        pattern = r'(?P<content>\S+)(?:[ %\t\n]+)'
-        match = re.search(pattern, source)
+        match = _WHITESPACE_ARGUMENT_PATTERN.search(source, start)
         if match is None:
             message = (
                 'When parsing {}, did not find whitespace-delimited command '
@@ -224,6 +301,92 @@ class LatexCommand(object):
         return content
 
 
+class LatexCommandIndex(object):
+    r"""Index of the commands in a LaTeX source, built from a single scan
+    of the source.
+
+    The index maps each command name to the character indices where that
+    command occurs. The arguments of a command are parsed when they are first
+    requested with `parse` (or `LatexCommand.parse`), and the parsed commands
+    are cached for later requests with the same command syntax.
+
+    Parameters
+    ----------
+    source : `str`
+        The full source of the tex document.
+
+    Examples
+    --------
+    >>> source = r'\title{Title} \author{A.~Author} \title{Other}'
+    >>> index = LatexCommandIndex(source)
+    >>> index.find('title')
+    [0, 33]
+    >>> command = LatexCommand('title', {'name': 'title', 'bracket': '{'})
+    >>> [parsed['title'] for parsed in command.parse(index)]
+    ['Title', 'Other']
+    """
+
+    def __init__(self, source):
+        super().__init__()
+        self.source = source
+
+        self._positions = collections.defaultdict(list)
+        for match in COMMAND_PATTERN.finditer(source):
+            self._positions[match.group(1)[:-1]].append(match.start())
+
+        # Cache of parsed commands, keyed by LatexCommand.signature
+        self._parsed = {}
+
+    @property
+    def names(self):
+        """Names of the commands in the source (`set` of `str`)."""
+        return set(self._positions.keys())
+
+    def find(self, name):
+        """Get the character indices where a command occurs.
+
+        Parameters
+        ----------
+        name : `str`
+            Name of the command (without the backslash prefix).
+
+        Returns
+        -------
+        positions : `list` of `int`
+            Character indices in `source` where the command begins, in
+            order.
+        """
+        if name not in self._positions \
+                and _ALPHA_NAME_PATTERN.match(name) is None:
+            # COMMAND_PATTERN only indexes alphabetic command names.
+            command_regex = LatexCommand._make_command_regex(name)
+            self._positions[name] = [
+                match.start() for match in re.finditer(command_regex,
+                                                       self.source)]
+        return list(self._positions.get(name, []))
+
+    def parse(self, command):
+        """Parse the occurrences of a command.
+
+        Parameters
+        ----------
+        command : `LatexCommand`
+            Definition of the command's syntax.
+
+        Yields
+        ------
+        parsed_command : `ParsedCommand`
+            Yields parsed commands instances for each occurence of the command
+            in the source.
+        """
+        parsed_commands = self._parsed.setdefault(command.signature, [])
+        for i, start_index in enumerate(self.find(command.name)):
+            if i == len(parsed_commands):
+                parsed_commands.append(
+                    command._parse_command(self.source, start_index))
+            yield parsed_commands[i]
+
+
 class ParsedCommand(object):
     r"""Contents of a parsed LaTeX command.
 
@@ -1,23 +1,107 @@
 """APIs for getting and working with the BibTeX databases in lsst-texmf.
 """
 
-__all__ = ['get_lsst_bibtex', 'get_bibliography', 'get_url_from_entry',
-           'NoEntryUrlError', 'get_authoryear_from_entry', 'AuthorYearError']
+__all__ = ['get_lsst_bibtex', 'get_bibliography', 'get_lsst_bibtex_async',
+           'get_bibliography_async', 'get_url_from_entry',
+           'NoEntryUrlError', 'get_authoryear_from_entry', 'AuthorYearError',
+           'get_lsst_bib_cache', 'set_lsst_bib_cache', 'BibliographyOverlay']
 
 import asyncio
+from collections import OrderedDict
+from collections.abc import Mapping, MutableMapping
+import concurrent.futures
+import itertools
 import logging
 import os
+import threading
 
-from aiohttp import ClientSession
 import pybtex.database
 
+from ..httpcache import HttpCache, CachingSession
+from ..scheduler import run_cpu_bound
+from .bibindex import LazyBibliographyData, index_bibtex
+
 # https://lsst-texmf.lsst.io/lsstdoc.html#bibliographies
 KNOWN_LSSTTEXMF_BIB_NAMES = ('lsst', 'lsst-dm', 'refs', 'books', 'refs_ads')
 
+# URL of each lsst-texmf BibTeX file (master branch on GitHub)
+LSSTTEXMF_BIB_URL_TEMPLATE = (
+    'https://raw.githubusercontent.com/lsst/lsst-texmf/master/texmf/'
+    'bibtex/bib/{name}.bib'
+)
 
 # Cache of bibtex file content, keyed by name (see KNOWN_LSSTTEXMF_BIB_NAMES).
 _LSSTTEXMF_BIB_CACHE = {}
 
+# SHA-256 digests of the bibtex file content in _LSSTTEXMF_BIB_CACHE, keyed
+# by name, for files cached on disk in the bib cache (see
+# set_lsst_bib_cache).
+_LSSTTEXMF_BIB_DIGESTS = {}
+
+# Tasks of in-flight downloads of bibtex files, keyed by (event loop, name)
+# tuples. See _download_lsst_bibtex.
+_LSSTTEXMF_BIB_DOWNLOADS = {}
+
+# The on-disk cache of lsst-texmf BibTeX files and their indices. See
+# set_lsst_bib_cache.
+_LSST_BIB_CACHE = None
+
+# LazyBibliographyData of lsst-texmf BibTeX files, keyed by a tuple of
+# (name, content) tuples. See _get_lsst_bibliography.
+_LSST_BIBLIOGRAPHIES = OrderedDict()
+
+# Maximum number of bibliographies in _LSST_BIBLIOGRAPHIES.
+_MAX_LSST_BIBLIOGRAPHIES = 4
+
+# Lock held while getting or making an lsst-texmf bibliography.
+_LSST_BIBLIOGRAPHIES_LOCK = threading.Lock()
+
+# Name of BibTeX indexing in the bib cache. Increment the version if
+# BibtexIndex changes.
+_BIBTEX_INDEX_PARSER_NAME = 'lsstprojectmeta.tex.bibindex.index_bibtex 1'
+
+
+def get_lsst_bib_cache():
+    """Get the on-disk cache of lsst-texmf BibTeX files used by
+    `get_lsst_bibtex` and `get_bibliography`.
+
+    Returns
+    -------
+    cache : `lsstprojectmeta.httpcache.HttpCache`
+        The active cache, or `None` if the cache is disabled (the default).
+    """
+    return _LSST_BIB_CACHE
+
+
+def set_lsst_bib_cache(cache):
+    """Set the on-disk cache of lsst-texmf BibTeX files used by
+    `get_lsst_bibtex` and `get_bibliography`.
+
+    With a cache, the BibTeX files are revalidated with conditional requests
+    (an unchanged file isn't downloaded again), and the
+    `~lsstprojectmeta.tex.bibindex.BibtexIndex` of each file is stored,
+    keyed by the SHA-256 digest of the file's content, so unchanged files
+    aren't indexed again. If GitHub can't be reached, the cached files are
+    used.
+
+    Parameters
+    ----------
+    cache : `lsstprojectmeta.httpcache.HttpCache` or `str`
+        An `~lsstprojectmeta.httpcache.HttpCache` instance (which can be
+        shared with other downloads), or the path of a cache database file.
+        `None` disables the cache.
+
+    Returns
+    -------
+    cache : `lsstprojectmeta.httpcache.HttpCache`
+        The active cache, or `None` if the cache is disabled.
+    """
+    global _LSST_BIB_CACHE
+    if isinstance(cache, str):
+        cache = HttpCache(cache)
+    _LSST_BIB_CACHE = cache
+    return cache
+
 
 async def _download_text(url, session):
     """Asynchronously request a URL and get the encoded text content of the
@@ -28,23 +112,43 @@ async def _download_text(url, session):
     url : `str`
         URL to download.
     session : `aiohttp.ClientSession`
-        An open aiohttp session.
+        An open aiohttp session, or a
+        `lsstprojectmeta.httpcache.CachingSession`.
 
     Returns
     -------
     content : `str`
         Content downloaded from the URL.
+    digest : `str`
+        SHA-256 digest of the content if it's cached on disk by a
+        `~lsstprojectmeta.httpcache.CachingSession`, or `None`.
     """
-    logger = logging.getLogger(__name__)
-    async with session.get(url) as response:
-        # aiohttp decodes the content to a Python string
-        logger.info('Downloading %r', url)
-        return await response.text()
-
+    import aiohttp
 
-async def _download_lsst_bibtex(bibtex_names):
+    logger = logging.getLogger(__name__)
+    cache = getattr(session, 'cache', None)
+    try:
+        async with session.get(url) as response:
+            response.raise_for_status()
+            # aiohttp decodes the content to a Python string
+            logger.info('Downloading %r', url)
+            return (await response.text(),
+                    getattr(response, 'digest', None))
+    except (aiohttp.ClientError, asyncio.TimeoutError):
+        entry = cache.get(url) if cache is not None else None
+        if entry is None:
+            raise
+        logger.warning('Could not download %r; using the cached copy', url,
+                       exc_info=True)
+        return entry.body.decode('utf-8', errors='replace'), entry.digest
+
+
+async def _download_lsst_bibtex(bibtex_names, session):
     """Asynchronously download a set of lsst-texmf BibTeX bibliographies from
-    GitHub.
+    GitHub into the in-memory cache.
+
+    Downloads are coalesced: if a file is already being downloaded in the
+    event loop, this waits for that download instead of starting another.
 
     Parameters
     ----------
@@ -55,24 +159,87 @@ async def _download_lsst_bibtex(bibtex_names):
 
            ['lsst', 'lsst-dm', 'refs', 'books', 'refs_ads']
 
-    Returns
-    -------
-    bibtexs : `list` of `str`
-        List of BibTeX file content, in the same order as ``bibtex_names``.
+    session : `aiohttp.ClientSession`
+        An open aiohttp session. If the bib cache is enabled (see
+        `set_lsst_bib_cache`), the session is wrapped in a
+        `lsstprojectmeta.httpcache.CachingSession`.
     """
-    blob_url_template = (
-        'https://raw.githubusercontent.com/lsst/lsst-texmf/master/texmf/'
-        'bibtex/bib/{name}.bib'
-    )
-    urls = [blob_url_template.format(name=name) for name in bibtex_names]
+    cache = get_lsst_bib_cache()
+    if cache is not None and not isinstance(session, CachingSession):
+        session = CachingSession(session, cache)
 
+    loop = asyncio.get_event_loop()
     tasks = []
-    async with ClientSession() as session:
-        for url in urls:
-            task = asyncio.ensure_future(_download_text(url, session))
-            tasks.append(task)
+    for name in bibtex_names:
+        key = (loop, name)
+        task = _LSSTTEXMF_BIB_DOWNLOADS.get(key)
+        if task is None:
+            task = asyncio.ensure_future(
+                _download_lsst_bibtex_file(name, session))
+            _LSSTTEXMF_BIB_DOWNLOADS[key] = task
+            task.add_done_callback(
+                lambda _, key=key: _LSSTTEXMF_BIB_DOWNLOADS.pop(key, None))
+        # Cancelling one caller doesn't cancel a download that other
+        # callers are waiting for.
+        tasks.append(asyncio.shield(task))
+
+    await asyncio.gather(*tasks)
+
+
+async def _download_lsst_bibtex_file(name, session):
+    """Download an lsst-texmf BibTeX file into the in-memory cache."""
+    url = LSSTTEXMF_BIB_URL_TEMPLATE.format(name=name)
+    text, digest = await _download_text(url, session)
+    _LSSTTEXMF_BIB_CACHE[name] = text
+    if digest is not None:
+        _LSSTTEXMF_BIB_DIGESTS[name] = digest
+
+
+def _get_lsst_bib_names(bibtex_filenames):
+    """Get the names of lsst-texmf BibTeX files from a sequence of filenames
+    (see `get_lsst_bibtex`).
+    """
+    logger = logging.getLogger(__name__)
+
+    if bibtex_filenames is None:
+        # Default lsst-texmf bibliography files
+        return list(KNOWN_LSSTTEXMF_BIB_NAMES)
+
+    # Sanitize filenames (remove extensions, path)
+    bibtex_names = []
+    for filename in bibtex_filenames:
+        name = os.path.basename(os.path.splitext(filename)[0])
+        if name not in KNOWN_LSSTTEXMF_BIB_NAMES:
+            logger.warning('%r is not a known lsst-texmf bib file',
+                           name)
+            continue
+        bibtex_names.append(name)
+    return bibtex_names
+
+
+def _run_until_complete(coro_func, *args):
+    """Run a coroutine function to completion from synchronous code.
+
+    If the thread's event loop is running (the caller is itself called from
+    a coroutine), the coroutine runs in a new event loop in a worker thread.
+    """
+    try:
+        loop = asyncio.get_event_loop()
+    except RuntimeError:
+        # There's no event loop in threads other than the main thread
+        loop = None
+    if loop is not None and not loop.is_running():
+        return loop.run_until_complete(coro_func(*args))
 
-        return await asyncio.gather(*tasks)
+    def run_in_new_loop():
+        new_loop = asyncio.new_event_loop()
+        try:
+            return new_loop.run_until_complete(coro_func(*args))
+        finally:
+            new_loop.close()
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(run_in_new_loop).result()
 
 
 def get_lsst_bibtex(bibtex_filenames=None):
@@ -80,6 +247,8 @@ def get_lsst_bibtex(bibtex_filenames=None):
 
     BibTeX content is downloaded from GitHub (``master`` branch of
     https://github.com/lsst/lsst-texmf or retrieved from an in-memory cache.
+    If an on-disk cache is enabled with `set_lsst_bib_cache`, downloads are
+    conditional requests, so unchanged files aren't downloaded again.
 
     Parameters
     ----------
@@ -99,33 +268,60 @@ def get_lsst_bibtex(bibtex_filenames=None):
         Dictionary with keys that are bibtex file names (such as ``'lsst'``,
         ``'lsst-dm'``). Values are the corresponding bibtex file content
         (`str`).
-    """
-    logger = logging.getLogger(__name__)
 
-    if bibtex_filenames is None:
-        # Default lsst-texmf bibliography files
-        bibtex_names = KNOWN_LSSTTEXMF_BIB_NAMES
-    else:
-        # Sanitize filenames (remove extensions, path)
-        bibtex_names = []
-        for filename in bibtex_filenames:
-            name = os.path.basename(os.path.splitext(filename)[0])
-            if name not in KNOWN_LSSTTEXMF_BIB_NAMES:
-                logger.warning('%r is not a known lsst-texmf bib file',
-                               name)
-                continue
-            bibtex_names.append(name)
+    Notes
+    -----
+    If this is called from a coroutine, files that aren't cached in memory
+    are downloaded in a worker thread, which blocks the event loop. Use
+    `get_lsst_bibtex_async` in coroutines instead.
+    """
+    bibtex_names = _get_lsst_bib_names(bibtex_filenames)
 
     # names of bibtex files not in cache
     uncached_names = [name for name in bibtex_names
                       if name not in _LSSTTEXMF_BIB_CACHE]
     if len(uncached_names) > 0:
         # Download bibtex and put into the cache
-        loop = asyncio.get_event_loop()
-        future = asyncio.ensure_future(_download_lsst_bibtex(uncached_names))
-        loop.run_until_complete(future)
-        for name, text in zip(bibtex_names, future.result()):
-            _LSSTTEXMF_BIB_CACHE[name] = text
+        _run_until_complete(get_lsst_bibtex_async, uncached_names)
+
+    return {name: _LSSTTEXMF_BIB_CACHE[name] for name in bibtex_names}
+
+
+async def get_lsst_bibtex_async(bibtex_filenames=None, session=None):
+    """Get content of lsst-texmf bibliographies, asynchronously.
+
+    This is the coroutine version of `get_lsst_bibtex`, and shares its
+    in-memory cache. Concurrent calls share the download of each file.
+
+    Parameters
+    ----------
+    bibtex_filenames : sequence of `str`, optional
+        List of lsst-texmf BibTeX files to retrieve (see `get_lsst_bibtex`).
+        The default is to get all lsst-texmf bibliographies.
+    session : `aiohttp.ClientSession`, optional
+        Your application's aiohttp client session. By default, a session is
+        opened for the downloads.
+
+    Returns
+    -------
+    bibtex : `dict`
+        Dictionary with keys that are bibtex file names (such as ``'lsst'``,
+        ``'lsst-dm'``). Values are the corresponding bibtex file content
+        (`str`).
+    """
+    bibtex_names = _get_lsst_bib_names(bibtex_filenames)
+
+    uncached_names = [name for name in bibtex_names
+                      if name not in _LSSTTEXMF_BIB_CACHE]
+    if len(uncached_names) > 0:
+        if session is None:
+            # aiohttp is slow to import, so it's only imported to download
+            from aiohttp import ClientSession
+
+            async with ClientSession() as session:
+                await _download_lsst_bibtex(uncached_names, session)
+        else:
+            await _download_lsst_bibtex(uncached_names, session)
 
     return {name: _LSSTTEXMF_BIB_CACHE[name] for name in bibtex_names}
 
@@ -151,28 +347,209 @@ def get_bibliography(lsst_bib_names=None, bibtex=None):
 
     Returns
     -------
-    bibliography : `pybtex.database.BibliographyData`
-        A pybtex bibliography database that includes all given sources:
+    bibliography : `BibliographyOverlay`
+        A pybtex bibliography database (a
+        `pybtex.database.BibliographyData`) that includes all given sources:
         lsst-texmf bibliographies and ``bibtex``.
+
+    Notes
+    -----
+    The lsst-texmf bibliographies are indexed once per process (for each
+    set of ``lsst_bib_names``) into a
+    `~lsstprojectmeta.tex.bibindex.LazyBibliographyData`, which parses each
+    entry the first time it's accessed. It's shared by the bibliographies
+    returned by later calls. The returned `BibliographyOverlay` holds only
+    the entries of ``bibtex``, so the cost of each call is proportional to
+    the size of ``bibtex``. Entries added to the returned bibliography don't
+    affect other bibliographies, but the shared `pybtex.database.Entry`
+    objects shouldn't be modified.
+
+    If an on-disk cache is enabled with `set_lsst_bib_cache`, the indices of
+    the lsst-texmf bibliographies are read from the cache unless their
+    content changed.
     """
     bibtex_data = get_lsst_bibtex(bibtex_filenames=lsst_bib_names)
+    return _make_bibliography(bibtex_data, bibtex)
+
+
+async def get_bibliography_async(lsst_bib_names=None, bibtex=None,
+                                 session=None, executor=None):
+    """Make a pybtex BibliographyData instance from standard lsst-texmf
+    bibliography files and user-supplied bibtex content, asynchronously.
+
+    This is the coroutine version of `get_bibliography`. BibTeX files are
+    downloaded with `get_lsst_bibtex_async`, and parsed in an executor so
+    that parsing doesn't block the event loop.
+
+    Parameters
+    ----------
+    lsst_bib_names : sequence of `str`, optional
+        Names of lsst-texmf BibTeX files to include. Default is `None`, which
+        includes all lsst-texmf bibtex files.
+    bibtex : `str`, optional
+        BibTeX source content not included in lsst-texmf.
+    session : `aiohttp.ClientSession`, optional
+        Your application's aiohttp client session. By default, a session is
+        opened for the downloads.
+    executor : `concurrent.futures.Executor`, optional
+        Executor that parses the BibTeX content (see
+        `lsstprojectmeta.scheduler.run_cpu_bound`). The default is the event
+        loop's default executor.
+
+    Returns
+    -------
+    bibliography : `BibliographyOverlay`
+        A pybtex bibliography database that includes all given sources:
+        lsst-texmf bibliographies and ``bibtex``.
+    """
+    bibtex_data = await get_lsst_bibtex_async(
+        bibtex_filenames=lsst_bib_names, session=session)
+    return await run_cpu_bound(_make_bibliography, bibtex_data, bibtex,
+                               executor=executor)
 
-    # Parse with pybtex into BibliographyData instances
-    pybtex_data = [pybtex.database.parse_string(_bibtex, 'bibtex')
-                   for _bibtex in bibtex_data.values()]
 
-    # Also parse local bibtex content
+def _make_bibliography(bibtex_data, bibtex):
+    """Make the bibliography of `get_bibliography` from the content of
+    lsst-texmf BibTeX files and local BibTeX content.
+    """
+    base = _get_lsst_bibliography(bibtex_data)
+
+    # Layer the local bibtex content over the shared lsst-texmf entries
     if bibtex is not None:
-        pybtex_data.append(pybtex.database.parse_string(bibtex, 'bibtex'))
+        local = pybtex.database.parse_string(bibtex, 'bibtex')
+        return BibliographyOverlay(base, entries=local.entries,
+                                   preamble=local.preamble_list)
+    return BibliographyOverlay(base)
+
+
+def _get_lsst_bibliography(bibtex_data):
+    """Get the LazyBibliographyData of lsst-texmf BibTeX files.
+
+    Bibliographies are memoized in the process, keyed by the names and
+    content of the files, so documents that use the same lsst-texmf files
+    share one bibliography (and its parsed entries). `get_bibliography`
+    wraps it in a `BibliographyOverlay`.
+    """
+    key = tuple(bibtex_data.items())
+    # Threads that need the same bibliography wait for the first to index
+    # it, instead of indexing it again.
+    with _LSST_BIBLIOGRAPHIES_LOCK:
+        try:
+            bib = _LSST_BIBLIOGRAPHIES[key]
+        except KeyError:
+            pass
+        else:
+            _LSST_BIBLIOGRAPHIES.move_to_end(key)
+            return bib
+
+        bib = LazyBibliographyData(
+            list(bibtex_data.values()),
+            indices=[_index_lsst_bibtex(name, bibtex)
+                     for name, bibtex in bibtex_data.items()])
+
+        _LSST_BIBLIOGRAPHIES[key] = bib
+        while len(_LSST_BIBLIOGRAPHIES) > _MAX_LSST_BIBLIOGRAPHIES:
+            _LSST_BIBLIOGRAPHIES.popitem(last=False)
+        return bib
+
+
+def _index_lsst_bibtex(name, bibtex):
+    """Index an lsst-texmf BibTeX file, or get its index from the bib
+    cache.
+    """
+    cache = get_lsst_bib_cache()
+    digest = _LSSTTEXMF_BIB_DIGESTS.get(name)
+    if cache is not None and digest is not None:
+        found, index = cache.get_parsed(digest, _BIBTEX_INDEX_PARSER_NAME)
+        if found:
+            return index
+
+    index = index_bibtex(bibtex)
+    if cache is not None and digest is not None:
+        cache.set_parsed(digest, _BIBTEX_INDEX_PARSER_NAME, index)
+    return index
+
+
+class BibliographyOverlay(pybtex.database.BibliographyData):
+    """A pybtex bibliography whose own entries are layered over the entries
+    of a base bibliography, without copying them.
+
+    Parameters
+    ----------
+    base : `pybtex.database.BibliographyData`
+        The base bibliography, such as the shared lsst-texmf bibliography.
+        It isn't modified.
+    entries : mapping or sequence of ``(key, entry)`` tuples, optional
+        Entries of the overlay. Like entries added with ``add_entry``, they
+        can't have the same keys as entries of ``base``.
+    preamble : sequence of `str`, optional
+        LaTeX preamble of the overlay, which follows the preamble of
+        ``base``.
+
+    Examples
+    --------
+    >>> from pybtex.database import BibliographyData, Entry
+    >>> base = BibliographyData({'LDM-151': Entry('docushare')})
+    >>> bib = BibliographyOverlay(base, {'local': Entry('article')})
+    >>> list(bib.entries.keys())
+    ['LDM-151', 'local']
+    >>> bib.entries['ldm-151'] is base.entries['LDM-151']
+    True
+    >>> 'local' in base.entries
+    False
+    """
+
+    def __init__(self, base, entries=None, preamble=None):
+        super().__init__()
+        self.base = base
+        self.entries = _OverlayEntries(self.entries, base.entries)
+        self.add_to_preamble(*base.preamble_list)
+        if entries:
+            if isinstance(entries, Mapping):
+                entries = entries.items()
+            self.add_entries(entries)
+        if preamble:
+            self.add_to_preamble(*preamble)
+
+
+class _OverlayEntries(MutableMapping):
+    """Case-insensitive mapping of a `BibliographyOverlay`'s entries that
+    falls back to the entries of the base bibliography.
+
+    New entries are set in the overlay's own mapping; entries of the base
+    can't be replaced or deleted.
+    """
+
+    def __init__(self, entries, base_entries):
+        self._entries = entries
+        self._base_entries = base_entries
+
+    def __getitem__(self, key):
+        try:
+            return self._entries[key]
+        except KeyError:
+            return self._base_entries[key]
+
+    def __contains__(self, key):
+        return key in self._entries or key in self._base_entries
+
+    def __setitem__(self, key, value):
+        if key in self._base_entries:
+            raise KeyError(
+                '{0!r} is an entry of the base bibliography'.format(key))
+        self._entries[key] = value
+
+    def __delitem__(self, key):
+        del self._entries[key]
+
+    def __iter__(self):
+        return itertools.chain(self._base_entries, self._entries)
 
-    # Merge BibliographyData
-    bib = pybtex_data[0]
-    if len(pybtex_data) > 1:
-        for other_bib in pybtex_data[1:]:
-            for key, entry in other_bib.entries.items():
-                bib.add_entry(key, entry)
+    def __len__(self):
+        return len(self._base_entries) + len(self._entries)
 
-    return bib
+    def __repr__(self):
+        return '{0}({1!r})'.format(type(self).__name__, list(self.items()))
 
 
 def get_url_from_entry(entry):
@@ -6,17 +6,14 @@ import datetime
 import logging
 import os
 
-from pytz import timezone
-import pytz
-
-from .commandparser import LatexCommand
-from ..pandoc.convert import convert_lsstdoc_tex
+from .commandparser import LatexCommand, LatexCommandIndex
 from .scraper import get_macros
 from .normalizer import read_tex_file, replace_macros
-from .lsstbib import get_bibliography, KNOWN_LSSTTEXMF_BIB_NAMES
-from .citelink import CitationLinker
 from ..git.timestamp import get_content_commit_date
 
+# Modules that import pypandoc, pybtex, and pytz are imported by the methods
+# that use them, so that importing this module is fast.
+
 
 class LsstLatexDoc(object):
     """An lsstdoc-class LaTeX document with metadata access.
@@ -28,9 +25,12 @@ class LsstLatexDoc(object):
     root_dir : `str`, optional
         Root directory of the LaTeX project. `None` is treated as the
         current working directory.
+    command_index : `~lsstprojectmeta.tex.commandparser.LatexCommandIndex`
+        Index of the commands in ``tex_source`` (optional). The index is
+        built when it's first needed if not provided.
     """
 
-    def __init__(self, tex_source, root_dir=None):
+    def __init__(self, tex_source, root_dir=None, command_index=None):
         super().__init__()
         self._logger = logging.getLogger(__name__)
 
@@ -38,14 +38,26 @@ class LsstLatexDoc(object):
         # the self.bib_db attributed is first accessed.
         self._bib_db = None
 
+        # CitationLinker for the document's bibliography; created by
+        # _prep_snippet_for_pandoc.
+        self._citation_linker = None
+
+        # Cache of snippets converted by pandoc, keyed by the snippet key
+        # and conversion options. See _format_snippets.
+        self._formatted_snippets = {}
+
         self._tex = tex_source
+        if command_index is not None and command_index.source is tex_source:
+            self._command_index = command_index
+        else:
+            self._command_index = None
         if root_dir is None:
             self._root_dir = ''
         else:
             self._root_dir = root_dir
 
     @classmethod
-    def read(cls, root_tex_path):
+    def read(cls, root_tex_path, resolver=None):
         """Construct an `LsstLatexDoc` instance by reading and parsing the
         LaTeX source.
 
@@ -54,6 +66,9 @@ class LsstLatexDoc(object):
         root_tex_path : `str`
             Path to the LaTeX source on the filesystem. For multi-file LaTeX
             projects this should be the path to the root document.
+        resolver : `lsstprojectmeta.tex.normalizer.TexFileResolver`, optional
+            Resolver that reads and caches the TeX files. Reuse a resolver to
+            avoid reading and normalizing unchanged files again.
 
         Notes
         -----
@@ -67,10 +82,15 @@ class LsstLatexDoc(object):
         """
         # Read and normalize the TeX source, replacing macros with content
         root_dir = os.path.dirname(root_tex_path)
-        tex_source = read_tex_file(root_tex_path)
-        tex_macros = get_macros(tex_source)
-        tex_source = replace_macros(tex_source, tex_macros)
-        return cls(tex_source, root_dir=root_dir)
+        tex_source = read_tex_file(root_tex_path, resolver=resolver)
+        command_index = LatexCommandIndex(tex_source)
+        tex_macros = get_macros(command_index)
+        if len(tex_macros) > 0:
+            tex_source = replace_macros(tex_source, tex_macros)
+            # The source changed, so the document needs a new index.
+            command_index = None
+        return cls(tex_source, root_dir=root_dir,
+                   command_index=command_index)
 
     @property
     def plain_content(self):
@@ -80,12 +100,14 @@ class LsstLatexDoc(object):
     @property
     def html_title(self):
         """HTML5-formatted document title (`str`)."""
+        self._format_metadata_snippets('html5')
         return self.format_title(format='html5', deparagraph=True,
                                  mathjax=False, smart=True)
 
     @property
     def plain_title(self):
         """Plain-text-formatted document title (`str`)."""
+        self._format_metadata_snippets('plain')
         return self.format_title(format='plain', deparagraph=True,
                                  mathjax=False, smart=True)
 
@@ -100,12 +122,14 @@ class LsstLatexDoc(object):
     @property
     def html_short_title(self):
         """HTML5-formatted document short title (`str`)."""
+        self._format_metadata_snippets('html5')
         return self.format_short_title(format='html5', deparagraph=True,
                                        mathjax=False, smart=True)
 
     @property
     def plain_short_title(self):
         """Plaintext-formatted document short title (`str`)."""
+        self._format_metadata_snippets('plain')
         return self.format_short_title(format='plain', deparagraph=True,
                                        mathjax=False, smart=True)
 
@@ -120,12 +144,14 @@ class LsstLatexDoc(object):
     @property
     def html_authors(self):
         """HTML5-formatted authors (`list` of `str`)."""
+        self._format_metadata_snippets('html5')
         return self.format_authors(format='html5', deparagraph=True,
                                    mathjax=False, smart=True)
 
     @property
     def plain_authors(self):
         """Plaintext-formatted authors (`list` of `str`)."""
+        self._format_metadata_snippets('plain')
         return self.format_authors(format='plain', deparagraph=True,
                                    mathjax=False, smart=True)
 
@@ -140,12 +166,14 @@ class LsstLatexDoc(object):
     @property
     def html_abstract(self):
         """HTML5-formatted document abstract (`str`)."""
+        self._format_metadata_snippets('html5', abstract=True)
         return self.format_abstract(format='html5', deparagraph=False,
                                     mathjax=False, smart=True)
 
     @property
     def plain_abstract(self):
         """Plaintext-formatted document abstract (`str`)."""
+        self._format_metadata_snippets('plain', abstract=True)
         return self.format_abstract(format='plain', deparagraph=False,
                                     mathjax=False, smart=True)
 
@@ -241,6 +269,18 @@ class LsstLatexDoc(object):
 
         return self._revision_datetime_source
 
+    @property
+    def command_index(self):
+        """Index of the commands in the document's LaTeX source
+        (`lsstprojectmeta.tex.commandparser.LatexCommandIndex`).
+
+        The metadata attributes are parsed from this index, so the source
+        is only scanned once.
+        """
+        if self._command_index is None:
+            self._command_index = LatexCommandIndex(self._tex)
+        return self._command_index
+
     @property
     def bib_db(self):
         """Bibliography database referenced by the document
@@ -251,6 +291,33 @@ class LsstLatexDoc(object):
             self._load_bib_db()
         return self._bib_db
 
+    async def load_bib_db_async(self, session=None):
+        """Load the bibliography database referenced by the document
+        without blocking the event loop.
+
+        Call this in a coroutine before using `bib_db` (or properties that
+        link citations), which would otherwise load the database
+        synchronously.
+
+        Parameters
+        ----------
+        session : `aiohttp.ClientSession`, optional
+            Your application's aiohttp client session, used to download the
+            lsst-texmf bibliographies (see
+            `lsstprojectmeta.tex.lsstbib.get_bibliography_async`).
+
+        Returns
+        -------
+        bib_db : `pybtex.database.BibliographyData`
+            The bibliography database, which is also the `bib_db` attribute.
+        """
+        from .lsstbib import get_bibliography_async
+
+        if self._bib_db is None:
+            self._bib_db = await get_bibliography_async(
+                bibtex=self._read_custom_bibtex(), session=session)
+        return self._bib_db
+
     def format_content(self, format='plain', mathjax=False,
                        smart=True, extra_args=None):
         """Get the document content in the specified markup format.
@@ -272,6 +339,8 @@ class LsstLatexDoc(object):
         output_text : `str`
             Converted content.
         """
+        from ..pandoc.convert import convert_lsstdoc_tex
+
         output_text = convert_lsstdoc_tex(
             self._tex, format,
             mathjax=mathjax,
@@ -306,13 +375,13 @@ class LsstLatexDoc(object):
         if self.title is None:
             return None
 
-        output_text = convert_lsstdoc_tex(
-            self.title, format,
-            deparagraph=deparagraph,
+        outputs = self._format_snippets(
+            [('title', self.title, deparagraph)],
+            format=format,
             mathjax=mathjax,
             smart=smart,
             extra_args=extra_args)
-        return output_text
+        return outputs['title']
 
     def format_short_title(self, format='html5', deparagraph=True,
                            mathjax=False, smart=True, extra_args=None):
@@ -341,13 +410,13 @@ class LsstLatexDoc(object):
         if self.short_title is None:
             return None
 
-        output_text = convert_lsstdoc_tex(
-            self.short_title, 'html5',
-            deparagraph=deparagraph,
+        outputs = self._format_snippets(
+            [('short_title', self.short_title, deparagraph)],
+            format=format,
             mathjax=mathjax,
             smart=smart,
             extra_args=extra_args)
-        return output_text
+        return outputs['short_title']
 
     def format_abstract(self, format='html5', deparagraph=False, mathjax=False,
                         smart=True, extra_args=None):
@@ -376,15 +445,13 @@ class LsstLatexDoc(object):
         if self.abstract is None:
             return None
 
-        abstract_latex = self._prep_snippet_for_pandoc(self.abstract)
-
-        output_text = convert_lsstdoc_tex(
-            abstract_latex, format,
-            deparagraph=deparagraph,
+        outputs = self._format_snippets(
+            [('abstract', self._prepped_abstract, deparagraph)],
+            format=format,
             mathjax=mathjax,
             smart=smart,
             extra_args=extra_args)
-        return output_text
+        return outputs['abstract']
 
     def format_authors(self, format='html5', deparagraph=True, mathjax=False,
                        smart=True, extra_args=None):
@@ -409,18 +476,116 @@ class LsstLatexDoc(object):
         output_text : `list` of `str`
             Sequence of author names in the specified output markup format.
         """
-        formatted_authors = []
-        for latex_author in self.authors:
-            formatted_author = convert_lsstdoc_tex(
-                latex_author, format,
-                deparagraph=deparagraph,
+        snippets = [(('author', i), latex_author, deparagraph)
+                    for i, latex_author in enumerate(self.authors)]
+        outputs = self._format_snippets(
+            snippets,
+            format=format,
+            mathjax=mathjax,
+            smart=smart,
+            extra_args=extra_args)
+        # removes Pandoc's terminal newlines
+        return [outputs[key].strip() for key, _, _ in snippets]
+
+    def _format_snippets(self, snippets, format='html5', mathjax=False,
+                         smart=True, extra_args=None):
+        """Convert LaTeX snippets of the document to another markup format
+        with a single pandoc run.
+
+        Converted snippets are cached so that repeated requests for the
+        same snippet and conversion options don't run pandoc again.
+
+        Parameters
+        ----------
+        snippets : `list` of `tuple`
+            Each item is a ``(key, latex, deparagraph)`` tuple. ``key`` is a
+            hashable identifier for the snippet (such as ``'title'``),
+            ``latex`` is the snippet's LaTeX source, and ``deparagraph``
+            is the `bool` deparagraph option for that snippet.
+        format : `str`, optional
+            Output format (such as ``'html5'`` or ``'plain'``).
+        mathjax : `bool`, optional
+            Allow pandoc to use MathJax math markup.
+        smart : `True`, optional
+            Allow pandoc to create "smart" unicode punctuation.
+        extra_args : `list`, optional
+            Additional command line flags to pass to Pandoc. See
+            `lsstprojectmeta.pandoc.convert.convert_text`.
+
+        Returns
+        -------
+        outputs : `dict`
+            Converted snippets, keyed by the snippet key.
+        """
+        if extra_args is not None:
+            options = (format, mathjax, smart, tuple(sorted(extra_args)))
+        else:
+            options = (format, mathjax, smart, ())
+
+        pending = [snippet for snippet in snippets
+                   if (snippet[0], snippet[2], options)
+                   not in self._formatted_snippets]
+        if len(pending) > 0:
+            from ..pandoc.convert import convert_lsstdoc_tex_batch
+
+            converted = convert_lsstdoc_tex_batch(
+                [latex for _, latex, _ in pending], format,
+                deparagraph=[deparagraph for _, _, deparagraph in pending],
                 mathjax=mathjax,
                 smart=smart,
                 extra_args=extra_args)
-            # removes Pandoc's terminal newlines
-            formatted_author = formatted_author.strip()
-            formatted_authors.append(formatted_author)
-        return formatted_authors
+            for (key, _, deparagraph), output in zip(pending, converted):
+                self._formatted_snippets[(key, deparagraph, options)] = output
+
+        return {key: self._formatted_snippets[(key, deparagraph, options)]
+                for key, _, deparagraph in snippets}
+
+    def _metadata_snippets(self, abstract=True):
+        """Get the metadata snippets (title, short title, authors, and
+        abstract) that are converted by the ``plain_*`` and ``html_*``
+        attributes, for use with `_format_snippets`.
+
+        Parameters
+        ----------
+        abstract : `bool`, optional
+            If `False`, leave out the abstract.
+
+        Returns
+        -------
+        snippets : `list` of `tuple`
+            ``(key, latex, deparagraph)`` tuples. The ``deparagraph`` options
+            match those of the ``plain_*`` and ``html_*`` attributes.
+        """
+        snippets = []
+        if self.title is not None:
+            snippets.append(('title', self.title, True))
+        if self.short_title is not None:
+            snippets.append(('short_title', self.short_title, True))
+        for i, latex_author in enumerate(self.authors):
+            snippets.append((('author', i), latex_author, True))
+        if abstract and self.abstract is not None:
+            snippets.append(('abstract', self._prepped_abstract, False))
+        return snippets
+
+    def _format_metadata_snippets(self, format, abstract=False):
+        """Convert the metadata snippets (see `_metadata_snippets`) with a
+        single pandoc run, so that the ``plain_*`` or ``html_*`` attributes
+        are served from the converted snippets.
+
+        Parameters
+        ----------
+        format : `str`
+            Output format: ``'html5'`` for the ``html_*`` attributes, or
+            ``'plain'`` for the ``plain_*`` attributes.
+        abstract : `bool`, optional
+            If `True`, convert the abstract too. The abstract is also
+            converted if the bibliography is loaded. Otherwise it's left
+            out, since linking its citations loads the bibliography.
+        """
+        snippets = self._metadata_snippets(
+            abstract=abstract or self._bib_db is not None)
+        self._format_snippets(snippets, format=format, mathjax=False,
+                              smart=True)
 
     def _parse_documentclass(self):
         """Parse documentclass options.
@@ -432,7 +597,7 @@ class LsstLatexDoc(object):
             {'name': 'options', 'required': False, 'bracket': '['},
             {'name': 'class_name', 'required': True, 'bracket': '{'})
         try:
-            parsed = next(command.parse(self._tex))
+            parsed = next(command.parse(self.command_index))
         except StopIteration:
             self._logger.warning('lsstdoc has no documentclass')
             self._document_options = []
@@ -458,7 +623,7 @@ class LsstLatexDoc(object):
             {'name': 'short_title', 'required': False, 'bracket': '['},
             {'name': 'long_title', 'required': True, 'bracket': '{'})
         try:
-            parsed = next(command.parse(self._tex))
+            parsed = next(command.parse(self.command_index))
         except StopIteration:
             self._logger.warning('lsstdoc has no title')
             self._title = None
@@ -481,7 +646,7 @@ class LsstLatexDoc(object):
             'setDocRef',
             {'name': 'handle', 'required': True, 'bracket': '{'})
         try:
-            parsed = next(command.parse(self._tex))
+            parsed = next(command.parse(self.command_index))
         except StopIteration:
             self._logger.warning('lsstdoc has no setDocRef')
             self._handle = None
@@ -519,7 +684,7 @@ class LsstLatexDoc(object):
             'author',
             {'name': 'authors', 'required': True, 'bracket': '{'})
         try:
-            parsed = next(command.parse(self._tex))
+            parsed = next(command.parse(self.command_index))
         except StopIteration:
             self._logger.warning('lsstdoc has no author')
             self._authors = []
@@ -556,7 +721,7 @@ class LsstLatexDoc(object):
             'setDocAbstract',
             {'name': 'abstract', 'required': True, 'bracket': '{'})
         try:
-            parsed = next(command.parse(self._tex))
+            parsed = next(command.parse(self.command_index))
         except StopIteration:
             self._logger.warning('lsstdoc has no abstract')
             self._abstract = None
@@ -572,15 +737,29 @@ class LsstLatexDoc(object):
         content = content.strip()
         self._abstract = content
 
+    @property
+    def _prepped_abstract(self):
+        """LaTeX-formatted abstract, prepared for pandoc with
+        `_prep_snippet_for_pandoc` (`str`).
+        """
+        if not hasattr(self, '_prepped_abstract_source'):
+            self._prepped_abstract_source = self._prep_snippet_for_pandoc(
+                self.abstract)
+        return self._prepped_abstract_source
+
     def _prep_snippet_for_pandoc(self, latex_text):
         """Process a LaTeX snippet of content for better transformation
         with pandoc.
 
         Currently runs the CitationLinker to convert BibTeX citations to
-        href links.
+        href links. The linker is reused for all snippets of the document so
+        that formatted citations are shared.
         """
-        replace_cite = CitationLinker(self.bib_db)
-        latex_text = replace_cite(latex_text)
+        if self._citation_linker is None:
+            from .citelink import CitationLinker
+
+            self._citation_linker = CitationLinker(self.bib_db)
+        latex_text = self._citation_linker(latex_text)
         return latex_text
 
     def _load_bib_db(self):
@@ -592,6 +771,17 @@ class LsstLatexDoc(object):
         The ``\bibliography`` command is parsed to identify the bibliographies
         referenced by the document.
         """
+        from .lsstbib import get_bibliography
+
+        # Get the combined pybtex bibliography
+        self._bib_db = get_bibliography(bibtex=self._read_custom_bibtex())
+
+    def _read_custom_bibtex(self):
+        """Read the content of the document's BibTeX files that aren't
+        lsst-texmf bibliographies, or `None` if there are none.
+        """
+        from .lsstbib import KNOWN_LSSTTEXMF_BIB_NAMES
+
         # Get the names of custom bibtex files by parsing the
         # \bibliography command and filtering out the default lsstdoc
         # bibliographies.
@@ -599,7 +789,7 @@ class LsstLatexDoc(object):
             'bibliography',
             {'name': 'bib_names', 'required': True, 'bracket': '{'})
         try:
-            parsed = next(command.parse(self._tex))
+            parsed = next(command.parse(self.command_index))
             bib_names = [n.strip() for n in parsed['bib_names'].split(',')]
         except StopIteration:
             self._logger.warning('lsstdoc has no bibliography command')
@@ -621,14 +811,9 @@ class LsstLatexDoc(object):
             with open(custom_bib_path, 'r') as file_handle:
                 custom_bibs.append(file_handle.read())
         if len(custom_bibs) > 0:
-            custom_bibtex = '\n\n'.join(custom_bibs)
+            return '\n\n'.join(custom_bibs)
         else:
-            custom_bibtex = None
-
-        # Get the combined pybtex bibliography
-        db = get_bibliography(bibtex=custom_bibtex)
-
-        self._bib_db = db
+            return None
 
     def _parse_revision_date(self):
         r"""Parse the ``\date`` command, falling back to getting the
@@ -636,6 +821,8 @@ class LsstLatexDoc(object):
 
         Result is available from the `revision_datetime` attribute.
         """
+        import pytz
+
         doc_datetime = None
 
         # First try to parse the \date command in the latex.
@@ -645,7 +832,7 @@ class LsstLatexDoc(object):
                 'date',
                 {'name': 'content', 'required': True, 'bracket': '{'})
             try:
-                parsed = next(date_command.parse(self._tex))
+                parsed = next(date_command.parse(self.command_index))
                 command_content = parsed['content'].strip()
             except StopIteration:
                 command_content = None
@@ -657,7 +844,7 @@ class LsstLatexDoc(object):
                     doc_datetime = datetime.datetime.strptime(command_content,
                                                               '%Y-%m-%d')
                     # Assume LSST project time (Pacific)
-                    project_tz = timezone('US/Pacific')
+                    project_tz = pytz.timezone('US/Pacific')
                     localized_datetime = project_tz.localize(doc_datetime)
                     # Normalize to UTC
                     doc_datetime = localized_datetime.astimezone(pytz.utc)
@@ -717,6 +904,9 @@ class LsstLatexDoc(object):
         jsonld : `dict`
             JSON-LD-formatted dictionary.
         """
+        # Convert all plain-text metadata with a single pandoc run.
+        self._format_metadata_snippets('plain', abstract=True)
+
         jsonld = {
             '@context': [
                 "https://raw.githubusercontent.com/codemeta/codemeta/2.0-rc/"
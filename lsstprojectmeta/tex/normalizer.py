@@ -2,8 +2,9 @@
 """
 
 __all__ = ['remove_comments', 'remove_trailing_whitespace', 'read_tex_file',
-           'process_inputs', 'replace_macros']
+           'process_inputs', 'replace_macros', 'TexFileResolver']
 
+import functools
 import logging
 import os
 import re
@@ -56,7 +57,7 @@ def remove_trailing_whitespace(tex_source):
     return re.sub(r'[ \t]+$', '', tex_source, flags=re.M)
 
 
-def read_tex_file(root_filepath, root_dir=None):
+def read_tex_file(root_filepath, root_dir=None, resolver=None):
     r"""Read a TeX file, automatically processing and normalizing it
     (including other input files, removing comments, and deleting trailing
     whitespace).
@@ -68,27 +69,22 @@ def read_tex_file(root_filepath, root_dir=None):
     root_dir : `str`
         Root directory of the TeX project. This only needs to be set when
         recursively reading in ``\input`` or ``\include`` files.
+    resolver : `TexFileResolver`, optional
+        Resolver that reads and caches the TeX files. Pass the same resolver
+        to read several documents that share files. By default, a new
+        resolver is used.
 
     Returns
     -------
     tex_source : `str`
         TeX source.
     """
-    with open(root_filepath, 'r') as f:
-        tex_source = f.read()
+    if resolver is None:
+        resolver = TexFileResolver()
+    return resolver.read(root_filepath, root_dir=root_dir)
 
-    if root_dir is None:
-        root_dir = os.path.dirname(root_filepath)
 
-    # Text processing pipline
-    tex_source = remove_comments(tex_source)
-    tex_source = remove_trailing_whitespace(tex_source)
-    tex_source = process_inputs(tex_source, root_dir=root_dir)
-
-    return tex_source
-
-
-def process_inputs(tex_source, root_dir=None):
+def process_inputs(tex_source, root_dir=None, resolver=None):
     r"""Insert referenced TeX file contents (from  ``\input`` and ``\include``
     commands) into the source.
 
@@ -100,6 +96,9 @@ def process_inputs(tex_source, root_dir=None):
         Name of the directory containing the TeX project's root file. Files
         referenced by TeX ``\input`` and ``\include`` commands are relative to
         this directory. If not set, the current working directory is assumed.
+    resolver : `TexFileResolver`, optional
+        Resolver that reads and caches the TeX files. By default, a new
+        resolver is used.
 
     Returns
     -------
@@ -112,27 +111,200 @@ def process_inputs(tex_source, root_dir=None):
         Recommended API for reading a root TeX source file and inserting
         referenced files.
     """
-    logger = logging.getLogger(__name__)
+    if resolver is None:
+        resolver = TexFileResolver()
+    return resolver.process_inputs(tex_source, root_dir=root_dir)
+
+
+class TexFileResolver(object):
+    r"""Reader of TeX files that inserts the contents of the files they
+    reference with ``\input`` and ``\include`` commands.
+
+    Each file is read and normalized (see `remove_comments` and
+    `remove_trailing_whitespace`) once. Normalized files are cached by their
+    path, modification time and size, so a resolver can be reused to read
+    several documents, or a document again after some of its files change.
+    Within a read, a file that's included several times is resolved once.
+
+    Cyclic includes, such as a file that includes itself, are logged and
+    left out, rather than recursing without limit.
+
+    Examples
+    --------
+    .. code-block:: python
 
-    def _sub_line(match):
-        """Function to be used with re.sub to inline files for each match."""
-        fname = match.group('filename')
-        if not fname.endswith('.tex'):
-            full_fname = ".".join((fname, 'tex'))
-        else:
-            full_fname = fname
-        full_path = os.path.abspath(os.path.join(root_dir, full_fname))
+       resolver = TexFileResolver()
+       tex_source = resolver.read('LDM-151.tex')
+       # Absolute paths of the files included by LDM-151.tex
+       resolver.dependencies[os.path.abspath('LDM-151.tex')]
+    """
 
+    def __init__(self):
+        super().__init__()
+        self._logger = logging.getLogger(__name__)
+
+        # Normalized source of each file, keyed by absolute path:
+        # path -> ((mtime_ns, size), source)
+        self._normalized = {}
+
+        self.dependencies = {}
+        """Dependency graph of the files resolved by the last read (`dict`).
+
+        Keys are absolute file paths, and values are lists of the absolute
+        paths of the files that each file includes, in order.
+        """
+
+        self.cycles = []
+        """Cyclic includes found by the last read (`list`).
+
+        Each item is a list of absolute paths, from the file that's included
+        again to the file that includes it.
+        """
+
+        self.reads = 0
+        """Number of files read from disk (`int`)."""
+
+        self.hits = 0
+        """Number of files whose cached, normalized source was reused
+        (`int`).
+        """
+
+    def read(self, root_filepath, root_dir=None):
+        r"""Read a TeX file, inserting the files that it includes.
+
+        Parameters
+        ----------
+        root_filepath : `str`
+            Filepath to a TeX file.
+        root_dir : `str`, optional
+            Root directory of the TeX project, which ``\input`` and
+            ``\include`` paths are relative to. The default is the directory
+            of ``root_filepath``.
+
+        Returns
+        -------
+        tex_source : `str`
+            Normalized TeX source.
+        """
+        if root_dir is None:
+            root_dir = os.path.dirname(root_filepath)
+        self.dependencies = {}
+        self.cycles = []
+        tex_source, _ = self._resolve(os.path.abspath(root_filepath),
+                                      root_dir, [], {})
+        return tex_source
+
+    def process_inputs(self, tex_source, root_dir=None):
+        r"""Insert the files included by TeX source.
+
+        Parameters
+        ----------
+        tex_source : `str`
+            TeX source where referenced source files will be found and
+            inserted.
+        root_dir : `str`, optional
+            Root directory of the TeX project, which ``\input`` and
+            ``\include`` paths are relative to. The default is the current
+            working directory.
+
+        Returns
+        -------
+        tex_source : `str`
+            TeX source.
+        """
+        if root_dir is None:
+            root_dir = os.getcwd()
+        self.dependencies = {}
+        self.cycles = []
+        tex_source, _ = self._insert_inputs(tex_source, None, root_dir, [],
+                                            {})
+        return tex_source
+
+    def _resolve(self, path, root_dir, stack, resolved):
+        """Resolve a file's source, including the files it includes.
+
+        Returns the source, and whether a cyclic include was left out of it
+        (in which case it's not memoized in ``resolved``, since its source
+        depends on the files being resolved around it).
+        """
+        if path in resolved:
+            return resolved[path], False
+        stack.append(path)
         try:
-            included_source = read_tex_file(full_path, root_dir=root_dir)
-        except IOError:
-            logger.error("Cannot open {0} for inclusion".format(full_path))
-            raise
-        else:
+            tex_source = self._read_normalized(path)
+            tex_source, cyclic = self._insert_inputs(tex_source, path,
+                                                     root_dir, stack,
+                                                     resolved)
+        finally:
+            stack.pop()
+        if not cyclic:
+            resolved[path] = tex_source
+        return tex_source, cyclic
+
+    def _insert_inputs(self, tex_source, path, root_dir, stack, resolved):
+        """Replace each input or include command in the source with the
+        resolved source of the file.
+        """
+        dependencies = []
+        cyclic = False
+
+        def _sub_line(match):
+            """Function to be used with re.sub to inline files for each
+            match.
+            """
+            nonlocal cyclic
+            fname = match.group('filename')
+            if not fname.endswith('.tex'):
+                full_fname = ".".join((fname, 'tex'))
+            else:
+                full_fname = fname
+            full_path = os.path.abspath(os.path.join(root_dir, full_fname))
+            dependencies.append(full_path)
+
+            if full_path in stack:
+                cycle = stack[stack.index(full_path):]
+                self.cycles.append(cycle)
+                self._logger.warning(
+                    'Not including %s again; it includes itself via %s',
+                    full_path, ' -> '.join(cycle + [full_path]))
+                cyclic = True
+                return ''
+
+            try:
+                included_source, included_cyclic = self._resolve(
+                    full_path, root_dir, stack, resolved)
+            except IOError:
+                self._logger.error(
+                    "Cannot open {0} for inclusion".format(full_path))
+                raise
+            cyclic = cyclic or included_cyclic
             return included_source
 
-    tex_source = input_include_pattern.sub(_sub_line, tex_source)
-    return tex_source
+        tex_source = input_include_pattern.sub(_sub_line, tex_source)
+        if path is not None:
+            self.dependencies[path] = dependencies
+        return tex_source, cyclic
+
+    def _read_normalized(self, path):
+        """Read a file, removing comments and trailing whitespace, or get its
+        normalized source from the cache if the file is unchanged.
+        """
+        stat = os.stat(path)
+        key = (stat.st_mtime_ns, stat.st_size)
+        cached = self._normalized.get(path)
+        if cached is not None and cached[0] == key:
+            self.hits += 1
+            return cached[1]
+
+        with open(path, 'r') as f:
+            tex_source = f.read()
+        self.reads += 1
+
+        # Text processing pipline
+        tex_source = remove_comments(tex_source)
+        tex_source = remove_trailing_whitespace(tex_source)
+        self._normalized[path] = (key, tex_source)
+        return tex_source
 
 
 def replace_macros(tex_source, macros):
@@ -156,6 +328,12 @@ def replace_macros(tex_source, macros):
     -----
     Macros with arguments are not supported.
 
+    All macros are replaced in a single scan of the source, with one
+    regular expression that tries longer macro names first (so ``\ab`` is
+    replaced before ``\a``). Macros used in the content of other macros are
+    expanded first, up to a fixed depth, so the order of ``macros`` doesn't
+    matter.
+
     Examples
     --------
     >>> macros = {r'\handle': 'LDM-nnn'}
@@ -171,10 +349,44 @@ def replace_macros(tex_source, macros):
     >>> replace_macros(sample, macros)
     '\\title    [Test Plan]  { Data Management Test Plan}'
     """
-    for macro_name, macro_content in macros.items():
-        # '\\?' suffix matches an optional trailing '\' that might be used
-        # for spacing.
-        pattern = re.escape(macro_name) + r"\\?"
-        # Wrap macro_content in lambda to avoid processing escapes
-        tex_source = re.sub(pattern, lambda _: macro_content, tex_source)
-    return tex_source
+    if not macros:
+        return tex_source
+    pattern = _compile_macros_pattern(frozenset(macros))
+    macros = _expand_macro_contents(pattern, macros)
+    # Use a function, rather than a replacement string, to avoid processing
+    # escapes in the macro content.
+    return pattern.sub(lambda match: macros[match.group('name')], tex_source)
+
+
+# Maximum depth of macros used in the content of other macros that are
+# expanded by replace_macros. This also stops recursive macros.
+_MAX_MACRO_DEPTH = 8
+
+
+@functools.lru_cache(maxsize=32)
+def _compile_macros_pattern(macro_names):
+    """Compile a regular expression that matches any of the macro names.
+
+    Names are tried longest first, then in sorted order, so matching doesn't
+    depend on the order of the macros.
+    """
+    names = sorted(macro_names, key=lambda name: (-len(name), name))
+    # '\\?' suffix matches an optional trailing '\' that might be used
+    # for spacing.
+    return re.compile(
+        '(?P<name>' + '|'.join(re.escape(name) for name in names) + r')\\?')
+
+
+def _expand_macro_contents(pattern, macros):
+    """Replace macros that are used in the content of other macros."""
+    for _ in range(_MAX_MACRO_DEPTH):
+        if not any(pattern.search(content) for content in macros.values()):
+            break
+        previous = macros
+
+        def _sub(match):
+            return previous[match.group('name')]
+
+        macros = {name: pattern.sub(_sub, content)
+                  for name, content in previous.items()}
+    return macros
@@ -5,7 +5,7 @@ __all__ = ['get_macros', 'get_def_macros', 'get_newcommand_macros']
 
 import re
 
-from .commandparser import LatexCommand
+from .commandparser import LatexCommand, LatexCommandIndex
 
 # Regular expressions for "\def \name {content}"
 # Expects the entire command to be on one line.
@@ -21,8 +21,9 @@ def get_macros(tex_source):
 
     Parameters
     ----------
-    tex_source : `str`
-        TeX source content.
+    tex_source : `str` or `LatexCommandIndex`
+        TeX source content, or an index of the commands in that source
+        (`lsstprojectmeta.tex.commandparser.LatexCommandIndex`).
 
     Returns
     -------
@@ -54,8 +55,9 @@ def get_def_macros(tex_source):
 
     Parameters
     ----------
-    tex_source : `str`
-        TeX source content.
+    tex_source : `str` or `LatexCommandIndex`
+        TeX source content, or an index of the commands in that source
+        (`lsstprojectmeta.tex.commandparser.LatexCommandIndex`).
 
     Returns
     -------
@@ -67,6 +69,9 @@ def get_def_macros(tex_source):
     -----
     ``\def`` macros with arguments are not supported.
     """
+    if isinstance(tex_source, LatexCommandIndex):
+        tex_source = tex_source.source
+
     macros = {}
     for match in DEF_PATTERN.finditer(tex_source):
         macros[match.group('name')] = match.group('content')
@@ -78,8 +83,10 @@ def get_newcommand_macros(tex_source):
 
     Parameters
     ----------
-    tex_source : `str`
-        TeX source content.
+    tex_source : `str` or `LatexCommandIndex`
+        TeX source content, or an index of the commands in that source
+        (`lsstprojectmeta.tex.commandparser.LatexCommandIndex`).
+        Parsing from an index avoids searching the full source again.
 
     Returns
     -------
@@ -25,7 +25,9 @@ long_description = read('README.rst')
 
 setup(
     name=packagename,
-    use_scm_version=True,
+    # The version file lets lsstprojectmeta get its version without the
+    # package metadata APIs, which are slow to import.
+    use_scm_version={'write_to': 'lsstprojectmeta/_version.py'},
     description=description,
     long_description=long_description,
     url=url,
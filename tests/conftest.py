@@ -0,0 +1,15 @@
+"""Shared helpers for the lsstprojectmeta tests.
+"""
+
+import asyncio
+
+
+def run(coro):
+    """Run a coroutine to completion in a new event loop, and get its
+    result.
+    """
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
@@ -0,0 +1,73 @@
+"""Tests for the lsstprojectmeta.tex.bibindex module.
+"""
+
+import pickle
+
+from pybtex.database import parse_string
+
+from lsstprojectmeta.tex.bibindex import index_bibtex, LazyBibliographyData
+
+SAMPLE_BIBTEX = (
+    '@string{spie = "Proc. SPIE"}\n'
+    '@comment{Not an entry}\n'
+    '@preamble{"\\newcommand{\\noopsort}[1]{}"}\n'
+    'Text between entries is ignored.\n'
+    '@DocuShare{LDM-151,\n'
+    '    author = {John D. Swinbank and others},\n'
+    '    title = "{Data Management (Science) Pipelines} Design",\n'
+    '    url = {https://user@example.com/(1)},\n'
+    '    year = 2017,\n'
+    '}\n'
+    '@INPROCEEDINGS(2002SPIE.4844..225C,\n'
+    '    author = {{Claver}, C.~F.},\n'
+    '    title = "{A title (with parentheses}) and more",\n'
+    '    booktitle = spie # " 4844",\n'
+    '    year = 2002\n'
+    ')\n'
+    '@article{ldm-151, title = {Repeated key}}\n'
+)
+
+
+def test_index_bibtex():
+    index = index_bibtex(SAMPLE_BIBTEX)
+    assert list(index.entries.keys()) == ['ldm-151', '2002spie.4844..225c']
+    for lower_key, (key, start, end) in index.entries.items():
+        assert key.lower() == lower_key
+        assert SAMPLE_BIBTEX[start:end].startswith('@')
+        assert SAMPLE_BIBTEX[start:end].endswith(('}', ')'))
+    assert '@string{spie' in index.strings
+    assert index.preamble == ['\\newcommand{\\noopsort}[1]{}']
+
+    # Indices are picklable
+    assert pickle.loads(pickle.dumps(index)).entries == index.entries
+
+
+def test_lazy_bibliography_data():
+    """Lazily parsed entries are the same as fully parsed entries."""
+    bib = LazyBibliographyData([SAMPLE_BIBTEX])
+    assert len(bib.entries) == 2
+    assert bib.parsed_count == 0
+    assert bib.preamble_list == ['\\newcommand{\\noopsort}[1]{}']
+
+    # Parse the sample without the repeated entry
+    full_bib = parse_string(SAMPLE_BIBTEX.rsplit('@article', 1)[0],
+                            'bibtex')
+    for key, full_entry in full_bib.entries.items():
+        entry = bib.entries[key.upper()]
+        assert entry.key == key
+        assert entry.type == full_entry.type
+        assert dict(entry.fields) == dict(full_entry.fields)
+        assert entry.persons == full_entry.persons
+    assert bib.parsed_count == 2
+    assert bib.entries['2002SPIE.4844..225C'].fields['booktitle'] == \
+        'Proc. SPIE 4844'
+
+
+def test_lazy_bibliography_data_files():
+    """Entries of earlier files take precedence."""
+    bib = LazyBibliographyData(['@article{a, year = 1}',
+                                '@article{A, year = 2}\n@book{b, year = 3}'])
+    assert list(bib.entries) == ['a', 'b']
+    assert bib.entries['a'].fields['year'] == '1'
+    assert 'B' in bib.entries
+    assert 'c' not in bib.entries
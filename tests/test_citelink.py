@@ -2,9 +2,10 @@
 """
 
 import pytest
+from pybtex.database import parse_string
 
 from lsstprojectmeta.tex.citelink import (
-    CitedsLinker, CitedspLinker, CitepLinker)
+    CitationLinker, CitedsLinker, CitedspLinker, CitepLinker)
 from lsstprojectmeta.tex.lsstbib import get_bibliography
 
 
@@ -60,3 +61,76 @@ def test_citep(sample, expected):
     db = get_bibliography()
     replace_citep = CitepLinker(bibtex_database=db)
     assert replace_citep(sample) == expected
+
+
+SAMPLE_BIBTEX = r"""
+@ARTICLE{2001ApJ...550..212B,
+  author = {{Bell}, E.~F. and {de Jong}, R.~S.},
+  title = "{Stellar Mass-to-Light Ratios and the Tully-Fisher Relation}",
+  year = 2001,
+  adsurl = {http://adsabs.harvard.edu/abs/2001ApJ...550..212B},
+}
+@MISC{nourl,
+  author = {{Stetson}, P.~B.},
+  year = 1996,
+}
+"""
+
+BELL_URL = 'http://adsabs.harvard.edu/abs/2001ApJ...550..212B'
+
+
+@pytest.fixture
+def sample_db():
+    return parse_string(SAMPLE_BIBTEX, 'bibtex')
+
+
+@pytest.mark.parametrize(
+    'sample,expected',
+    [(r'\citep{2001ApJ...550..212B}',
+      r'[\href{' + BELL_URL + r'}{Bell and de Jong 2001}]'),
+     (r'\citet{2001ApJ...550..212B}',
+      r'\href{' + BELL_URL + r'}{Bell and de Jong (2001)}'),
+     (r'\citealp{2001ApJ...550..212B, nourl}',
+      r'\href{' + BELL_URL + r'}{Bell and de Jong 2001}, Stetson 1996'),
+     (r'\citealt{nourl}', r'Stetson 1996'),
+     # Cite keys not in the bibliography are shown as-is
+     (r'\citep{nourl, unknown}', r'[Stetson 1996, unknown]')])
+def test_citation_linker_natbib(sample_db, sample, expected):
+    link_citations = CitationLinker(sample_db)
+    assert link_citations(sample) == expected
+
+
+def test_citation_linker_mixed(sample_db):
+    """All citation commands are linked together, and text between them is
+    preserved.
+    """
+    sample = (
+        r'See \citeds[Pipelines Design]{LDM-151} and~\citep{nourl}.'
+        '\n'
+        r'Also \citedsp{LDM-230}, \citet{nourl}, and \citeds{LDM-151}.'
+    )
+    expected = (
+        r'See \href{https://ls.st/LDM-151}{Pipelines Design} and~'
+        r'[Stetson 1996].'
+        '\n'
+        r'Also [\href{https://ls.st/LDM-230}{LDM-230}], Stetson (1996), and '
+        r'\href{https://ls.st/LDM-151}{LDM-151}.'
+    )
+    link_citations = CitationLinker(sample_db)
+    assert link_citations(sample) == expected
+
+
+def test_citation_linker_nested(sample_db):
+    """Citations nested in the arguments of a citation are linked."""
+    sample = r'\citeds[see \citep{nourl}]{LDM-151}'
+    expected = r'\href{https://ls.st/LDM-151}{see [Stetson 1996]}'
+    link_citations = CitationLinker(sample_db)
+    assert link_citations(sample) == expected
+
+
+def test_citation_linker_reuses_citations(sample_db):
+    """Formatted citations are cached by cite key."""
+    link_citations = CitationLinker(sample_db)
+    link_citations(r'\citep{nourl} \citep{nourl}')
+    citep_linker = link_citations._linkers['citep']
+    assert citep_linker._citations == {'nourl': 'Stetson 1996'}
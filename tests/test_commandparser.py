@@ -6,7 +6,8 @@ import re
 
 import pytest
 
-from lsstprojectmeta.tex.commandparser import LatexCommand
+from lsstprojectmeta.tex.commandparser import (
+    LatexCommand, LatexCommandIndex, CommandParserError)
 
 
 @pytest.fixture
@@ -127,3 +128,88 @@ def test_optional_bracket():
     )
     parsed = next(command.parse(sample))
     assert parsed['filename'] == 'test.tex'
+
+
+@pytest.mark.parametrize(
+    'command',
+    ['title', 'author', 'setDocRef', 'setDocAbstract', 'documentclass',
+     'newcommand', 'input', 'citep'])
+def test_command_index_matches_regex(ldm_nnn_data, command):
+    """The LatexCommandIndex finds the same command occurrences as
+    LatexCommand._make_command_regex.
+    """
+    index = LatexCommandIndex(ldm_nnn_data)
+    command_regex = LatexCommand._make_command_regex(command)
+    expected = [match.start()
+                for match in re.finditer(command_regex, ldm_nnn_data)]
+    assert index.find(command) == expected
+
+
+def test_command_index_parse(ldm_nnn_data):
+    """Parsing from a LatexCommandIndex matches parsing the source, and
+    parsed commands are cached.
+    """
+    elements = [
+        {'name': 'short_title', 'required': False, 'bracket': '['},
+        {'name': 'long_title', 'required': True, 'bracket': '{'}
+    ]
+    command = LatexCommand('title', *elements)
+    index = LatexCommandIndex(ldm_nnn_data)
+
+    parsed = next(command.parse(index))
+    expected = next(command.parse(ldm_nnn_data))
+    assert parsed['long_title'] == expected['long_title']
+    assert parsed['short_title'] == expected['short_title']
+    assert parsed.start_index == expected.start_index
+    assert parsed.command_source == expected.command_source
+
+    # An equivalent command definition gets the cached ParsedCommand
+    other_command = LatexCommand('title', *elements)
+    assert next(other_command.parse(index)) is parsed
+
+
+def test_command_index_non_alpha_name():
+    """Command names that aren't purely alphabetic fall back to a regex
+    search.
+    """
+    sample = r'\my@title{Title} \title{Other}'
+    index = LatexCommandIndex(sample)
+    assert index.find('my@title') == [0]
+    assert index.find('title') == [17]
+
+
+def test_escaped_brackets():
+    """Escaped brackets don't open or close a command element."""
+    sample = r'\title[Short \] title]{A \{ long \} title \\} Text'
+    command = LatexCommand(
+        'title',
+        {'name': 'short_title', 'required': False, 'bracket': '['},
+        {'name': 'long_title', 'required': True, 'bracket': '{'}
+    )
+    parsed = next(command.parse(sample))
+    assert parsed['short_title'] == r'Short \] title'
+    assert parsed['long_title'] == r'A \{ long \} title \\'
+    assert parsed.command_source == sample[:-len(' Text')]
+
+
+def test_unclosed_bracket():
+    sample = r'\title{Title'
+    command = LatexCommand('title', {'name': 'title', 'bracket': '{'})
+    with pytest.raises(CommandParserError):
+        next(command.parse(sample))
+
+
+def test_optional_bracket_not_adjacent():
+    """An optional element is only parsed if it directly follows the command
+    or the previous element.
+    """
+    sample = r'\ref{sec:intro}, and \hyperref[sec:other]{Other}'
+    command = LatexCommand(
+        'ref',
+        {'name': 'text', 'required': False, 'bracket': '['},
+        {'name': 'label', 'required': True, 'bracket': '{'}
+    )
+    parsed = next(command.parse(sample))
+    assert 'text' not in parsed
+    assert parsed['label'] == 'sec:intro'
+    assert parsed.command_source == r'\ref{sec:intro}'
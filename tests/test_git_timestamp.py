@@ -2,16 +2,44 @@
 """
 
 from datetime import datetime
+import itertools
 import os
 
+import git
 import pytest
 
 from lsstprojectmeta.git.timestamp import (
+    GitTimestampCache,
+    get_git_timestamp_cache,
+    set_git_timestamp_cache,
     read_git_commit_timestamp_for_file,
+    read_git_commit_timestamps_for_files,
     _iter_filepaths_with_extension,
+    _iter_filepaths_with_extensions,
     get_content_commit_date)
 
 
+@pytest.fixture
+def cache(tmpdir):
+    return GitTimestampCache(str(tmpdir.join('cache', 'git.sqlite3')))
+
+
+def _init_repo(repo_dir):
+    repo = git.Repo.init(repo_dir)
+    with repo.config_writer() as config:
+        config.set_value('user', 'name', 'Test')
+        config.set_value('user', 'email', 'test@example.com')
+    return repo
+
+
+def _commit(repo, filenames, message, date):
+    for filename in filenames:
+        with open(os.path.join(repo.working_tree_dir, filename), 'a') as f:
+            f.write(message + '\n')
+    repo.index.add(filenames)
+    return repo.index.commit(message, commit_date=date, author_date=date)
+
+
 def test_git_commit_timestamp_for_file():
     """Smoke-test read_git_commit_timestamp_for_file with README.rst in
     lsstprojectmeta's own Git repo.
@@ -38,6 +66,67 @@ def test_iter_filepaths_with_extension():
     assert 'README.rst' not in filepaths
 
 
+def test_git_commit_timestamps_for_files():
+    """read_git_commit_timestamps_for_files matches
+    read_git_commit_timestamp_for_file in lsstprojectmeta's own Git repo.
+    """
+    repo_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+    filepaths = [os.path.join(repo_dir, 'README.rst'),
+                 os.path.join(repo_dir, 'setup.py'),
+                 os.path.join(repo_dir, 'lsstprojectmeta', '__init__.py'),
+                 os.path.join(repo_dir, 'doesnt_exist.txt')]
+    timestamps = read_git_commit_timestamps_for_files(filepaths,
+                                                      repo_path=repo_dir)
+    assert filepaths[-1] not in timestamps
+    for filepath in filepaths[:-1]:
+        assert timestamps[filepath] == \
+            read_git_commit_timestamp_for_file(filepath, repo_path=repo_dir)
+
+
+def test_git_commit_timestamps_for_files_merges(tmpdir):
+    """Commits to files are found through merges in the same way as
+    ``git rev-list``.
+    """
+    repo = _init_repo(str(tmpdir))
+    root = _commit(repo, ['a.tex', 'b.tex', 'c.tex'], 'root',
+                   '2017-01-01T00:00:00')
+    main_branch = repo.active_branch
+    branch = repo.create_head('branch', root)
+    branch.checkout()
+    branch_commit = _commit(repo, ['a.tex', 'b.tex'], 'branch',
+                            '2017-01-03T00:00:00')
+    main_branch.checkout()
+    main_commit = _commit(repo, ['c.tex'], 'main', '2017-01-02T00:00:00')
+    # Merge, keeping a.tex from main_branch (the branch's change to
+    # a.tex is discarded) and b.tex from branch.
+    repo.git.merge('branch', no_commit=True, s='ours')
+    repo.git.checkout('branch', '--', 'b.tex')
+    repo.index.commit('merge', parent_commits=(main_commit, branch_commit),
+                      commit_date='2017-01-04T00:00:00',
+                      author_date='2017-01-04T00:00:00')
+
+    filepaths = [os.path.join(str(tmpdir), name)
+                 for name in ('a.tex', 'b.tex', 'c.tex')]
+    timestamps = read_git_commit_timestamps_for_files(filepaths, repo=repo)
+    for filepath in filepaths:
+        assert timestamps[filepath] == \
+            read_git_commit_timestamp_for_file(filepath, repo=repo)
+    assert timestamps[filepaths[0]] == root.committed_datetime
+    assert timestamps[filepaths[1]] == branch_commit.committed_datetime
+    assert timestamps[filepaths[2]] == main_commit.committed_datetime
+
+
+def test_iter_filepaths_with_extensions():
+    repo_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+    extnames = ('py', 'rst')
+    filepaths = list(_iter_filepaths_with_extensions(extnames,
+                                                     root_dir=repo_dir))
+    expected = list(itertools.chain(
+        *[_iter_filepaths_with_extension(extname, root_dir=repo_dir)
+          for extname in extnames]))
+    assert filepaths == expected
+
+
 def test_get_project_content_commit_date():
     """Smoke test using the lsstprojectmeta repo.
     """
@@ -48,3 +137,102 @@ def test_get_project_content_commit_date():
     # Verify file search is case sensitive
     with pytest.raises(RuntimeError):
         get_content_commit_date(('RST', 'PY'), root_dir=repo_dir)
+
+
+def test_git_timestamp_cache(tmpdir, cache):
+    """GitTimestampCache indexes a repository once, then updates the index
+    incrementally as commits are added.
+    """
+    repo = _init_repo(str(tmpdir.join('repo')))
+    first = _commit(repo, ['a.tex', 'b.tex'], 'first', '2017-01-01T00:00:00')
+    second = _commit(repo, ['b.tex'], 'second', '2017-01-02T00:00:00')
+
+    timestamps = cache.get_commit_dates(repo, ['a.tex', 'b.tex'])
+    assert timestamps['a.tex'].hexsha == first.hexsha
+    assert timestamps['b.tex'].hexsha == second.hexsha
+    assert cache.stats == {'hits': 2, 'misses': 0, 'updates': 1}
+
+    cache.get_commit_dates(repo, ['a.tex', 'b.tex'])
+    assert cache.stats == {'hits': 4, 'misses': 0, 'updates': 1}
+
+    third = _commit(repo, ['c.tex'], 'third', '2017-01-03T00:00:00')
+    fourth = _commit(repo, ['a.tex'], 'fourth', '2017-01-04T00:00:00')
+    timestamps = cache.get_commit_dates(repo, ['a.tex', 'b.tex', 'c.tex'])
+    assert timestamps['a.tex'].hexsha == fourth.hexsha
+    assert timestamps['b.tex'].hexsha == second.hexsha
+    assert timestamps['c.tex'].hexsha == third.hexsha
+    assert cache.stats == {'hits': 7, 'misses': 0, 'updates': 2}
+
+    # The index is persistent
+    new_cache = GitTimestampCache(cache.path)
+    for path in ('a.tex', 'b.tex', 'c.tex'):
+        assert new_cache.get_commit_dates(repo, [path]) == \
+            cache.get_commit_dates(repo, [path])
+    assert new_cache.stats == {'hits': 3, 'misses': 0, 'updates': 0}
+
+
+def test_git_timestamp_cache_untracked(tmpdir, cache):
+    """Paths that aren't in HEAD's tree are looked up once, and remembered
+    until HEAD changes.
+    """
+    repo = _init_repo(str(tmpdir.join('repo')))
+    first = _commit(repo, ['a.tex', 'b.tex'], 'first', '2017-01-01T00:00:00')
+    repo.index.remove(['b.tex'], working_tree=True)
+    repo.index.commit('remove', commit_date='2017-01-02T00:00:00',
+                      author_date='2017-01-02T00:00:00')
+
+    for _ in range(2):
+        timestamps = cache.get_commit_dates(repo, ['b.tex', 'missing.tex'])
+        assert timestamps['b.tex'].hexsha == repo.head.commit.hexsha
+        assert 'missing.tex' not in timestamps
+    assert cache.stats == {'hits': 2, 'misses': 2, 'updates': 1}
+
+    _commit(repo, ['b.tex'], 'restore', '2017-01-03T00:00:00')
+    timestamps = cache.get_commit_dates(repo, ['a.tex', 'b.tex'])
+    assert timestamps['a.tex'].hexsha == first.hexsha
+    assert timestamps['b.tex'].hexsha == repo.head.commit.hexsha
+
+
+def test_git_timestamp_cache_rewritten_head(tmpdir, cache):
+    """The index is rebuilt when the indexed HEAD commit no longer exists.
+    """
+    repo = _init_repo(str(tmpdir.join('repo')))
+    first = _commit(repo, ['a.tex'], 'first', '2017-01-01T00:00:00')
+    second = _commit(repo, ['a.tex'], 'second', '2017-01-02T00:00:00')
+    assert cache.get_commit_dates(repo, ['a.tex'])['a.tex'].hexsha == \
+        second.hexsha
+
+    repo.head.reset(first, index=True, working_tree=True)
+    repo.git.reflog('expire', '--expire-unreachable=now', '--all')
+    repo.git.gc('--prune=now', '--quiet')
+    assert cache.get_commit_dates(repo, ['a.tex'])['a.tex'].hexsha == \
+        first.hexsha
+
+
+def test_git_timestamp_cache_active(tmpdir, cache):
+    """With an active cache, the read_git_commit_timestamp functions give
+    the same results as without it.
+    """
+    repo = _init_repo(str(tmpdir.join('repo')))
+    _commit(repo, ['a.tex', 'b.tex'], 'first', '2017-01-01T00:00:00 +0200')
+    _commit(repo, ['b.tex'], 'second', '2017-01-02T00:00:00 -0700')
+    filepaths = [os.path.join(repo.working_tree_dir, name)
+                 for name in ('a.tex', 'b.tex', 'missing.tex')]
+
+    expected = read_git_commit_timestamps_for_files(filepaths, repo=repo)
+
+    previous_cache = get_git_timestamp_cache()
+    assert set_git_timestamp_cache(cache) is cache
+    try:
+        assert read_git_commit_timestamps_for_files(filepaths,
+                                                    repo=repo) == expected
+        for filepath in filepaths[:2]:
+            timestamp = read_git_commit_timestamp_for_file(filepath,
+                                                           repo=repo)
+            assert timestamp == expected[filepath]
+            assert timestamp.utcoffset() == expected[filepath].utcoffset()
+        with pytest.raises(IOError):
+            read_git_commit_timestamp_for_file(filepaths[2], repo=repo)
+    finally:
+        set_git_timestamp_cache(previous_cache)
+    assert cache.stats['updates'] == 1
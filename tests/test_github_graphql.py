@@ -1,7 +1,18 @@
 """Tests for the lsstprojectmeta.github.graphql module.
 """
 
-from lsstprojectmeta.github.graphql import GitHubQuery
+import asyncio
+import json
+import re
+
+import aiohttp
+from multidict import CIMultiDict
+import pytest
+
+from lsstprojectmeta.github.graphql import (
+    GitHubClient, GitHubRequestError, GitHubQuery, GitHubRepoBatcher)
+
+from conftest import run
 
 
 def test_github_query():
@@ -9,3 +20,245 @@ def test_github_query():
     assert str(query) == query.query
     assert query.name == 'technote_repo'
     assert query.query.startswith('query ')
+
+
+def test_technote_repo_fields():
+    """The technote_repo query spreads the technote_repo_fields fragment,
+    which is appended to it.
+    """
+    query = str(GitHubQuery.load('technote_repo'))
+    fragment = str(GitHubQuery.load('technote_repo_fields'))
+    assert '...technoteRepoFields' in query
+    assert query.endswith('\n' + fragment)
+    assert query.count('fragment technoteRepoFields') == 1
+
+
+class _MockBatchClient(object):
+    """Stands in for a GitHubClient, answering batched technote_repo
+    queries.
+    """
+
+    def __init__(self):
+        self.requests = []
+
+    async def request(self, query=None, mutation=None, variables=None):
+        self.requests.append((str(query), variables))
+        await asyncio.sleep(0)
+        data = {'rateLimit': {'remaining': 4999, 'cost': 1}}
+        errors = []
+        for alias in re.findall(r'(repo\d+): repository', str(query)):
+            name = variables[alias.replace('repo', 'name')]
+            if name == 'missing':
+                data[alias] = None
+                errors.append({'type': 'NOT_FOUND', 'path': [alias],
+                               'message': 'Not found'})
+            else:
+                data[alias] = {'shortDescriptionHTML': name}
+        response = {'data': data}
+        if errors:
+            response['errors'] = errors
+        return response
+
+
+def test_github_repo_batcher():
+    names = ['sqr-{0:03d}'.format(i) for i in range(25)]
+    client = _MockBatchClient()
+
+    async def lookup_all():
+        batcher = GitHubRepoBatcher(client, batch_size=10)
+        results = await asyncio.gather(
+            *[batcher.technote_repo('lsst-sqre', name)
+              for name in names + ['sqr-000', 'missing']])
+        return batcher, results
+
+    batcher, results = run(lookup_all())
+
+    assert batcher.lookups == 27
+    assert batcher.requests == 3
+    assert len(client.requests) == 3
+    for query, variables in client.requests:
+        assert 'fragment technoteRepoFields on Repository' in query
+        assert len(variables) <= 20
+
+    for name, result in zip(names + ['sqr-000'], results):
+        assert result == {
+            'data': {
+                'rateLimit': {'remaining': 4999, 'cost': 1},
+                'repository': {'shortDescriptionHTML': name}}}
+    assert results[-1]['data']['repository'] is None
+    assert results[-1]['errors'] == [
+        {'type': 'NOT_FOUND', 'path': ['repository'], 'message': 'Not found'}]
+
+
+def test_github_repo_batcher_tasks():
+    """The batcher keeps references to the tasks that send queries until
+    they're done.
+    """
+    async def lookup():
+        batcher = GitHubRepoBatcher(_MockBatchClient(), batch_size=2)
+        lookups = asyncio.gather(batcher.technote_repo('lsst-sqre', 'a'),
+                                 batcher.technote_repo('lsst-sqre', 'b'))
+        await asyncio.sleep(0)
+        sending = len(batcher._send_tasks)
+        await lookups
+        await asyncio.sleep(0)
+        return sending, len(batcher._send_tasks)
+
+    assert run(lookup()) == (1, 0)
+
+
+def test_github_repo_batcher_failure():
+    class FailingClient(object):
+        async def request(self, **kwargs):
+            raise RuntimeError('connection reset')
+
+    async def lookup_all():
+        batcher = GitHubRepoBatcher(FailingClient())
+        return await asyncio.gather(
+            batcher.technote_repo('lsst-sqre', 'sqr-000'),
+            batcher.technote_repo('lsst-sqre', 'sqr-001'),
+            return_exceptions=True)
+
+    results = run(lookup_all())
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+
+def test_github_repo_batcher_split_unauthorized():
+    response = {'message': 'Bad credentials'}
+    assert GitHubRepoBatcher._split_response(
+        response, [('a', 'b'), ('c', 'd')]) == [response, response]
+
+
+class _MockResponse(object):
+
+    def __init__(self, status, body, headers):
+        self.status = status
+        self.headers = CIMultiDict(headers)
+        self._body = body
+
+    async def text(self):
+        if isinstance(self._body, str):
+            return self._body
+        return json.dumps(self._body)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        pass
+
+
+class _MockSession(object):
+    """Stands in for an aiohttp.ClientSession, giving scripted responses to
+    POST requests.
+    """
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.posts = []
+
+    def post(self, url, json=None, headers=None):
+        self.posts.append((url, json, headers))
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return _MockResponse(*response)
+
+
+class _MockClock(object):
+
+    def __init__(self, now=1000.):
+        self.now = now
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    async def sleep(self, delay):
+        self.sleeps.append(delay)
+        self.now += delay
+
+
+def _make_client(responses, **kwargs):
+    session = _MockSession(responses)
+    client = GitHubClient(session, 'token', **kwargs)
+    clock = _MockClock()
+    client._clock = clock
+    client._sleep = clock.sleep
+    return client, session, clock
+
+
+def _ok(remaining, cost=1, reset=2000):
+    return (200,
+            {'data': {'rateLimit': {'remaining': remaining, 'cost': cost}}},
+            {'X-RateLimit-Remaining': str(remaining),
+             'X-RateLimit-Reset': str(reset)})
+
+
+def test_github_client():
+    client, session, clock = _make_client([_ok(4999), _ok(4997, cost=2)])
+    query = GitHubQuery.load('technote_repo')
+
+    data = run(client.request(query=query, variables={'orgName': 'a'}))
+    assert data['data']['rateLimit']['remaining'] == 4999
+    url, payload, headers = session.posts[0]
+    assert payload == {'query': str(query), 'variables': {'orgName': 'a'}}
+    assert headers == {'Authorization': 'token token'}
+
+    run(client.request(query=query))
+    metrics = client.metrics
+    assert metrics['requests'] == 2
+    assert metrics['retries'] == 0
+    assert metrics['cost'] == 3
+    assert metrics['remaining'] == 4997
+    assert metrics['reset_at'].timestamp() == 2000
+    assert clock.sleeps == []
+
+
+def test_github_client_paces_requests():
+    """A request waits for the rate limit to reset when the budget can't
+    cover it.
+    """
+    client, session, clock = _make_client([_ok(1, reset=1500), _ok(4999)],
+                                          reserve=1)
+    run(client.request(query='query { viewer { login } }'))
+    run(client.request(query='query { viewer { login } }'))
+    assert clock.sleeps == [501.]
+    assert client.metrics['waited'] == 501.
+    assert client.metrics['remaining'] == 4999
+
+
+def test_github_client_retries():
+    client, session, clock = _make_client([
+        (502, '<html>Bad gateway</html>', {}),
+        aiohttp.ServerDisconnectedError(),
+        (403, {'message': 'You have exceeded a secondary rate limit.'}, {}),
+        (403, {'message': 'abuse'}, {'Retry-After': '30'}),
+        (200, {'errors': [{'type': 'RATE_LIMITED'}]},
+         {'X-RateLimit-Remaining': '0', 'X-RateLimit-Reset': '2000'}),
+        _ok(4999, reset=5000),
+    ], backoff=1.)
+    data = run(client.request(query='query { viewer { login } }'))
+    assert data['data']['rateLimit']['remaining'] == 4999
+    # Waits: backoff, backoff, secondary limit, Retry-After, reset
+    assert clock.sleeps == [1., 2., 60., 30., 2000. - 1093. + 1.]
+    assert client.metrics['retries'] == 5
+    assert client.metrics['requests'] == 6
+
+
+def test_github_client_gives_up():
+    client, session, clock = _make_client(
+        [(502, 'Bad gateway', {})] * 3, max_retries=2)
+    with pytest.raises(GitHubRequestError) as excinfo:
+        run(client.request(query='query { viewer { login } }'))
+    assert excinfo.value.status == 502
+    assert clock.sleeps == [1., 2.]
+
+
+def test_github_client_no_retry():
+    """Errors that aren't rate limits or server errors aren't retried."""
+    client, session, clock = _make_client([
+        (401, {'message': 'Bad credentials'}, {})])
+    data = run(client.request(query='query { viewer { login } }'))
+    assert data == {'message': 'Bad credentials'}
+    assert client.metrics['requests'] == 1
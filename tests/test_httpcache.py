@@ -0,0 +1,281 @@
+"""Tests for the lsstprojectmeta.httpcache module.
+"""
+
+import asyncio
+import hashlib
+
+import aiohttp
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+import pytest
+import yaml
+
+from lsstprojectmeta import httpcache
+from lsstprojectmeta.httpcache import (
+    HttpCache, CachingSession, CachedResponse, parse_response)
+from lsstprojectmeta.scheduler import HostLimits, HostLimitedSession
+
+from conftest import run
+
+
+@pytest.fixture
+def cache(tmpdir):
+    return HttpCache(str(tmpdir.join('cache', 'http.sqlite3')))
+
+
+class _Resources(object):
+    """Web app with resources that support conditional requests, and
+    counts of the requests for each.
+    """
+
+    def __init__(self):
+        self.documents = {
+            '/etag.yaml': 'title: Original\n',
+            '/modified.json': '{"a": 1}',
+            '/plain.txt': 'No validators',
+        }
+        self.requests = []
+
+    async def handle(self, request):
+        self.requests.append((request.path, request.headers.copy()))
+        if request.path not in self.documents:
+            raise web.HTTPNotFound()
+        body = self.documents[request.path]
+        headers = {}
+        if request.path.endswith('.yaml'):
+            headers['ETag'] = '"{0}"'.format(
+                hashlib.sha1(body.encode('utf-8')).hexdigest())
+            if request.headers.get('If-None-Match') == headers['ETag']:
+                return web.Response(status=304, headers=headers)
+        elif request.path.endswith('.json'):
+            headers['Last-Modified'] = 'Mon, 02 Jan 2017 00:00:00 GMT'
+            if request.headers.get('If-Modified-Since') == \
+                    headers['Last-Modified']:
+                return web.Response(status=304, headers=headers)
+        headers['Content-Type'] = 'text/plain; charset=utf-8'
+        return web.Response(body=body.encode('utf-8'), headers=headers)
+
+
+def _run_with_server(resources, cache, coro_func):
+    """Run ``coro_func(session, server)`` with a CachingSession and a test
+    server for the resources.
+    """
+    async def run_server():
+        app = web.Application()
+        app.router.add_get('/{name}', resources.handle)
+        server = TestServer(app)
+        await server.start_server()
+        try:
+            async with aiohttp.ClientSession() as client_session:
+                session = CachingSession(client_session, cache)
+                return await coro_func(session, server)
+        finally:
+            await server.close()
+
+    return run(run_server())
+
+
+async def _fetch(session, url):
+    async with session.get(url) as response:
+        response.raise_for_status()
+        return response, await response.text()
+
+
+def test_caching_session_etag(cache):
+    resources = _Resources()
+
+    async def fetch_twice(session, server):
+        url = str(server.make_url('/etag.yaml'))
+        first, first_text = await _fetch(session, url)
+        second, second_text = await _fetch(session, url)
+        return first, first_text, second, second_text
+
+    first, first_text, second, second_text = _run_with_server(
+        resources, cache, fetch_twice)
+
+    assert first_text == second_text == 'title: Original\n'
+    assert isinstance(first, CachedResponse)
+    assert not first.from_cache
+    assert second.from_cache
+    assert second.status == 200
+    assert second.headers['ETag'] == first.headers['ETag']
+    assert 'If-None-Match' not in resources.requests[0][1]
+    assert resources.requests[1][1]['If-None-Match'] == first.headers['ETag']
+    assert cache.stats == {'hits': 1, 'misses': 1, 'parse_hits': 0}
+
+
+def test_caching_session_changed(cache):
+    """A changed resource is downloaded again and replaces the cached
+    response.
+    """
+    resources = _Resources()
+
+    async def fetch_changed(session, server):
+        url = str(server.make_url('/etag.yaml'))
+        await _fetch(session, url)
+        resources.documents['/etag.yaml'] = 'title: Changed\n'
+        changed, changed_text = await _fetch(session, url)
+        cached, cached_text = await _fetch(session, url)
+        return changed, changed_text, cached, cached_text
+
+    changed, changed_text, cached, cached_text = _run_with_server(
+        resources, cache, fetch_changed)
+    assert not changed.from_cache
+    assert changed_text == 'title: Changed\n'
+    assert cached.from_cache
+    assert cached_text == 'title: Changed\n'
+    assert len(cache) == 1
+
+
+def test_caching_session_last_modified(cache):
+    resources = _Resources()
+
+    async def fetch_twice(session, server):
+        url = str(server.make_url('/modified.json'))
+        for _ in range(2):
+            async with session.get(url) as response:
+                data = await response.json()
+        return response, data
+
+    response, data = _run_with_server(resources, cache, fetch_twice)
+    assert data == {'a': 1}
+    assert response.from_cache
+    assert resources.requests[1][1]['If-Modified-Since'] == \
+        'Mon, 02 Jan 2017 00:00:00 GMT'
+
+
+def test_caching_session_refresh(cache):
+    """Validators sent with a 304 response replace the cached ones."""
+    requests = []
+
+    class _RotatingResources(object):
+        # The ETag changes with each request, but the body doesn't
+        async def handle(self, request):
+            requests.append(request.headers.copy())
+            headers = {'ETag': '"{0:d}"'.format(len(requests))}
+            if 'If-None-Match' in request.headers:
+                return web.Response(status=304, headers=headers)
+            return web.Response(body=b'title: Original\n', headers=headers)
+
+    async def fetch(session, server):
+        url = str(server.make_url('/etag.yaml'))
+        return [await _fetch(session, url) for _ in range(3)]
+
+    results = _run_with_server(_RotatingResources(), cache, fetch)
+    assert [text for _, text in results] == ['title: Original\n'] * 3
+    assert [response.headers['ETag'] for response, _ in results] == \
+        ['"1"', '"2"', '"3"']
+    assert [headers.get('If-None-Match') for headers in requests] == \
+        [None, '"1"', '"2"']
+    assert cache.stats['hits'] == 2
+
+
+def test_caching_session_read_error(cache):
+    """A request whose body can't be read releases its host slot."""
+    exits = []
+
+    class _Response(object):
+        status = 200
+        headers = {'ETag': '"1"'}
+
+        async def read(self):
+            if not exits:
+                raise aiohttp.ClientPayloadError('Connection reset')
+            return b'Body'
+
+    class _Request(object):
+        async def __aenter__(self):
+            return _Response()
+
+        async def __aexit__(self, exc_type, exc, tb):
+            exits.append(exc_type)
+
+    class _Session(object):
+        def request(self, method, url, **kwargs):
+            return _Request()
+
+    session = CachingSession(
+        HostLimitedSession(_Session(), HostLimits(default=1)), cache)
+
+    async def fetch_twice():
+        with pytest.raises(aiohttp.ClientPayloadError):
+            await _fetch(session, 'https://example.com/a')
+        return await asyncio.wait_for(
+            _fetch(session, 'https://example.com/a'), 5.)
+
+    _, text = run(fetch_twice())
+    assert text == 'Body'
+    assert exits == [aiohttp.ClientPayloadError, None]
+
+
+def test_caching_session_uncacheable(cache):
+    """Responses without validators, and errors, aren't cached."""
+    resources = _Resources()
+
+    async def fetch(session, server):
+        response, text = await _fetch(session,
+                                      str(server.make_url('/plain.txt')))
+        async with session.get(str(server.make_url('/missing'))) as missing:
+            with pytest.raises(aiohttp.ClientResponseError):
+                missing.raise_for_status()
+        return response, text
+
+    response, text = _run_with_server(resources, cache, fetch)
+    assert text == 'No validators'
+    assert response.cache is None
+    assert len(cache) == 0
+
+
+def test_parse_response(cache):
+    """Parsed values of unchanged responses are reused."""
+    resources = _Resources()
+    parse_calls = []
+
+    def parse_yaml(text):
+        parse_calls.append(text)
+        return yaml.safe_load(text)
+
+    async def fetch_and_parse(session, server):
+        url = str(server.make_url('/etag.yaml'))
+        values = []
+        for _ in range(3):
+            async with session.get(url) as response:
+                values.append(await parse_response(response, parse_yaml,
+                                                   parser_name='yaml'))
+        resources.documents['/etag.yaml'] = 'title: Changed\n'
+        async with session.get(url) as response:
+            values.append(await parse_response(response, parse_yaml,
+                                               parser_name='yaml'))
+        return values
+
+    values = _run_with_server(resources, cache, fetch_and_parse)
+    assert values == [{'title': 'Original'}] * 3 + [{'title': 'Changed'}]
+    assert len(parse_calls) == 2
+    assert cache.stats == {'hits': 2, 'misses': 2, 'parse_hits': 2}
+    # Parsed values of replaced responses are deleted
+    connection = cache._connect()
+    assert connection.execute('SELECT COUNT(*) FROM parsed').fetchone()[0] \
+        == 1
+
+
+def test_parse_response_version(cache, monkeypatch):
+    """Values parsed by another lsstprojectmeta version aren't reused."""
+    resources = _Resources()
+    parse_calls = []
+
+    def parse_yaml(text):
+        parse_calls.append(text)
+        return yaml.safe_load(text)
+
+    async def fetch_and_parse(session, server):
+        url = str(server.make_url('/etag.yaml'))
+        values = []
+        for version in ('1.0', '1.0', '1.1'):
+            monkeypatch.setattr(httpcache, '__version__', version)
+            async with session.get(url) as response:
+                values.append(await parse_response(response, parse_yaml))
+        return values
+
+    values = _run_with_server(resources, cache, fetch_and_parse)
+    assert values == [{'title': 'Original'}] * 3
+    assert len(parse_calls) == 2
@@ -0,0 +1,73 @@
+"""Regression tests for the time it takes to import lsstprojectmeta modules.
+"""
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+# Dependencies that are slow to import, and that are only imported when
+# they're used.
+SLOW_DEPENDENCIES = ('aiohttp', 'git', 'motor', 'panflute', 'pkg_resources',
+                     'pybtex', 'pymongo', 'pypandoc', 'pytz')
+
+# Budget for the cumulative import time of a module, in seconds. Importing
+# lsstprojectmeta.tex.lsstdoc took more than 0.5 s when it imported all of
+# its dependencies.
+IMPORT_TIME_BUDGET = 0.25
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _get_import_times(module_name):
+    """Import a module in a new interpreter with ``-X importtime``.
+
+    Returns
+    -------
+    import_times : `dict`
+        Cumulative import time, in seconds, of each imported module, keyed
+        by module name.
+    """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c',
+         'import {0}'.format(module_name)],
+        cwd=ROOT_DIR, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+        universal_newlines=True, check=True)
+    import_times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        try:
+            import_times[name.strip()] = int(cumulative) / 1e6
+        except ValueError:
+            # Header line
+            continue
+    return import_times
+
+
+@pytest.mark.skipif(sys.version_info < (3, 7),
+                    reason='-X importtime requires Python 3.7')
+@pytest.mark.parametrize('module_name,allowed,budget', [
+    ('lsstprojectmeta', (), IMPORT_TIME_BUDGET),
+    ('lsstprojectmeta.tex.commandparser', (), IMPORT_TIME_BUDGET),
+    ('lsstprojectmeta.tex.normalizer', (), IMPORT_TIME_BUDGET),
+    ('lsstprojectmeta.tex.lsstdoc', (), IMPORT_TIME_BUDGET),
+    ('lsstprojectmeta.git.timestamp', (), IMPORT_TIME_BUDGET),
+    # The bibliography classes subclass pybtex's BibliographyData
+    ('lsstprojectmeta.tex.lsstbib', ('pybtex',), 2 * IMPORT_TIME_BUDGET),
+    # The ingest pipeline uses aiohttp throughout, but MongoDB is optional
+    ('lsstprojectmeta.cli.ingestdocs', ('aiohttp',), None),
+])
+def test_import_time(module_name, allowed, budget):
+    import_times = _get_import_times(module_name)
+    assert module_name in import_times
+
+    imported = {name.split('.')[0] for name in import_times}
+    slow_imports = imported.intersection(SLOW_DEPENDENCIES) - set(allowed)
+    assert not slow_imports, \
+        '{0} imports {1}'.format(module_name, sorted(slow_imports))
+
+    if budget is not None:
+        assert import_times[module_name] < budget
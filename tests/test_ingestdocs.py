@@ -0,0 +1,62 @@
+"""Tests for the lsstprojectmeta.cli.ingestdocs module.
+"""
+
+import datetime
+import gzip
+import io
+import sys
+
+from lsstprojectmeta.cli.ingestdocs import NdjsonSink
+from lsstprojectmeta.jsonld import decode_jsonld
+
+RECORDS = [
+    {'reportNumber': 'SQR-000',
+     'dateModified': datetime.datetime(2018, 1, 1,
+                                       tzinfo=datetime.timezone.utc),
+     'articleBody': 'First line\nSecond line'},
+    {'reportNumber': 'LDM-151', 'name': 'Data Management Science Pipelines'},
+]
+
+
+def _read_ndjson(text):
+    return [decode_jsonld(line) for line in text.splitlines()]
+
+
+def test_ndjson_sink(tmpdir):
+    path = str(tmpdir.join('records.ndjson'))
+    with NdjsonSink(path) as sink:
+        for record in RECORDS:
+            sink.write(record)
+    assert sink.count == 2
+    with open(path, encoding='utf-8') as f:
+        text = f.read()
+    assert text.count('\n') == 2
+    assert _read_ndjson(text) == RECORDS
+
+
+def test_ndjson_sink_gzip(tmpdir):
+    path = str(tmpdir.join('records.ndjson.gz'))
+    with NdjsonSink(path) as sink:
+        assert sink.compress
+        for record in RECORDS:
+            sink.write(record)
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        assert _read_ndjson(f.read()) == RECORDS
+
+
+def test_ndjson_sink_stdout(monkeypatch):
+    buffer = io.BytesIO()
+    stdout = io.TextIOWrapper(buffer, encoding='utf-8')
+    monkeypatch.setattr(sys, 'stdout', stdout)
+    with NdjsonSink('-') as sink:
+        sink.write(RECORDS[0])
+    assert not stdout.closed
+    assert _read_ndjson(buffer.getvalue().decode('utf-8')) == RECORDS[:1]
+
+    buffer.seek(0)
+    buffer.truncate()
+    with NdjsonSink('-', compress=True) as sink:
+        sink.write(RECORDS[1])
+    assert not stdout.closed
+    assert _read_ndjson(gzip.decompress(buffer.getvalue()).decode('utf-8')) \
+        == RECORDS[1:]
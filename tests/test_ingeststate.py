@@ -0,0 +1,188 @@
+"""Tests for the lsstprojectmeta.ingeststate module and incremental ingests.
+"""
+
+import json
+
+import aiohttp
+import pytest
+
+from lsstprojectmeta.cli.ingestdocs import process_ltd_doc
+from lsstprojectmeta.ingeststate import IngestState, get_ltd_doc_fingerprint
+
+from conftest import run
+
+PRODUCT_URL = 'https://keeper.lsst.codes/products/ldm-151'
+COMMIT_URL = 'https://api.github.com/repos/lsst/LDM-151/commits/HEAD'
+YAML_URL = ('https://raw.githubusercontent.com/lsst/LDM-151/master/'
+            'metadata.yaml')
+JSONLD_URL = 'https://ldm-151.lsst.io/metadata.jsonld'
+
+
+class _MockResponse(object):
+
+    def __init__(self, status, body='', headers=None):
+        self.status = status
+        self.headers = headers or {}
+        self._body = body
+
+    def raise_for_status(self):
+        if self.status >= 400:
+            raise aiohttp.ClientResponseError(None, (), status=self.status)
+
+    async def text(self):
+        return self._body
+
+    async def json(self):
+        return json.loads(self._body)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        pass
+
+
+class _MockSession(object):
+    """Stands in for an aiohttp.ClientSession, responding to requests for
+    an LTD product that's a Lander page.
+    """
+
+    def __init__(self):
+        self.resources = {
+            PRODUCT_URL: json.dumps({
+                'slug': 'ldm-151',
+                'doc_repo': 'https://github.com/lsst/LDM-151.git',
+                'published_url': 'https://ldm-151.lsst.io'}),
+            COMMIT_URL: 'a' * 40,
+            JSONLD_URL: json.dumps({'reportNumber': 'LDM-151'}),
+        }
+        self.etags = {JSONLD_URL: '"1"'}
+        self.requests = []
+
+    def request(self, method, url, headers=None):
+        self.requests.append((method, url))
+        if url not in self.resources:
+            return _MockResponse(404)
+        headers = {}
+        if url in self.etags:
+            headers['ETag'] = self.etags[url]
+        body = self.resources[url] if method == 'GET' else ''
+        return _MockResponse(200, body, headers)
+
+    def get(self, url, headers=None):
+        return self.request('GET', url, headers=headers)
+
+
+class _MockCollection(object):
+
+    def __init__(self):
+        self.documents = []
+
+    async def find_one(self, query, projection=None):
+        for document in self.documents:
+            if document['data']['reportNumber'] == \
+                    query['data.reportNumber']:
+                return document
+        return None
+
+    async def replace_one(self, query, document, upsert=False):
+        self.documents.append(document)
+
+
+def test_ingest_state(tmpdir):
+    path = str(tmpdir.join('state', 'state.json'))
+    state = IngestState(path)
+    assert len(state) == 0
+    assert not state.is_unchanged('ldm-151', {'github_sha': 'a'})
+
+    state.record('ldm-151', {'github_sha': 'a'})
+    state.save()
+
+    state = IngestState(path)
+    assert len(state) == 1
+    assert state.is_unchanged('ldm-151', {'github_sha': 'a'})
+    assert not state.is_unchanged('ldm-151', {'github_sha': 'b'})
+    assert state.skipped == 1
+
+
+def test_get_ltd_doc_fingerprint():
+    session = _MockSession()
+    product = json.loads(session.resources[PRODUCT_URL])
+
+    fingerprint = run(get_ltd_doc_fingerprint(session, 'token', product))
+    assert fingerprint['github_sha'] == 'a' * 40
+    assert fingerprint['jsonld_etag'] == '"1"'
+    # The fingerprint doesn't download metadata.jsonld
+    assert ('GET', JSONLD_URL) not in session.requests
+    assert run(get_ltd_doc_fingerprint(session, 'token', product)) == \
+        fingerprint
+
+    session.etags[JSONLD_URL] = '"2"'
+    assert run(get_ltd_doc_fingerprint(session, 'token', product)) != \
+        fingerprint
+
+    # Products without a repository or metadata.jsonld file
+    del session.resources[COMMIT_URL]
+    del session.resources[JSONLD_URL]
+    fingerprint = run(get_ltd_doc_fingerprint(session, 'token', product))
+    assert fingerprint['github_sha'] is None
+    assert fingerprint['jsonld_etag'] is None
+
+
+def test_get_ltd_doc_fingerprint_error():
+    session = _MockSession()
+    product = json.loads(session.resources[PRODUCT_URL])
+    session.get = lambda url, headers=None: _MockResponse(502)
+    with pytest.raises(aiohttp.ClientResponseError):
+        run(get_ltd_doc_fingerprint(session, 'token', product))
+
+
+def test_process_ltd_doc_incremental(tmpdir):
+    """Unchanged documents are skipped, and changed documents are ingested
+    again.
+    """
+    session = _MockSession()
+    collection = _MockCollection()
+    state = IngestState(str(tmpdir.join('state.json')))
+
+    def ingest():
+        return run(process_ltd_doc(session, 'token', PRODUCT_URL,
+                                   mongo_collection=collection,
+                                   ingest_state=state))
+
+    assert ingest() == {'reportNumber': 'LDM-151'}
+    assert len(collection.documents) == 1
+    assert state.recorded == 1
+
+    session.requests = []
+    assert ingest() is None
+    assert len(collection.documents) == 1
+    assert state.skipped == 1
+    assert ('GET', JSONLD_URL) not in session.requests
+    assert ('GET', YAML_URL) not in session.requests
+
+    # A new commit that doesn't change the JSON-LD isn't written again, but
+    # is recorded
+    session.resources[COMMIT_URL] = 'b' * 40
+    assert ingest() == {'reportNumber': 'LDM-151'}
+    assert len(collection.documents) == 1
+    assert state.recorded == 2
+
+    session.resources[COMMIT_URL] = 'c' * 40
+    session.resources[JSONLD_URL] = json.dumps(
+        {'reportNumber': 'LDM-151', 'name': 'Changed'})
+    assert ingest() == {'reportNumber': 'LDM-151', 'name': 'Changed'}
+    assert len(collection.documents) == 2
+    assert state.recorded == 3
+
+
+def test_process_ltd_doc_incremental_no_collection(tmpdir):
+    """Documents aren't recorded unless they're ingested into MongoDB."""
+    session = _MockSession()
+    state = IngestState(str(tmpdir.join('state.json')))
+    for _ in range(2):
+        result = run(process_ltd_doc(session, 'token', PRODUCT_URL,
+                                     ingest_state=state))
+        assert result == {'reportNumber': 'LDM-151'}
+    assert state.recorded == 0
+    assert state.skipped == 0
@@ -2,7 +2,28 @@
 """
 
 import datetime
-from lsstprojectmeta.jsonld import encode_jsonld, decode_jsonld
+import io
+
+import pytest
+
+from lsstprojectmeta.jsonld import (
+    encode_jsonld, decode_jsonld, JSONLD_DATE_KEYS, iterencode_jsonld,
+    write_jsonld, write_jsonld_async)
+
+from conftest import run
+
+LARGE_JSONLD = {
+    'reportNumber': 'LDM-151',
+    'dateModified': datetime.datetime(2018, 1, 1, hour=12),
+    'author': [{'@type': 'Person', 'name': 'Jonathan Sick'},
+               {'@type': 'Person', 'name': 'Ren\u00e9e'}],
+    'articleBody': 'A "quoted" line with a \\ and \u00e9.\n' * 5000,
+    'version': 1.5,
+    'draft': False,
+    'license': None,
+    'keywords': [],
+    'isPartOf': {},
+}
 
 
 def test_datetime_encoding():
@@ -41,3 +62,86 @@ def test_datetime_decoding():
 
     assert json_doc['date'] == expected_date
     assert json_doc == expected
+
+
+def test_datetime_decoding_formats():
+    """Datetimes are decoded in the same cases as with
+    ``datetime.strptime(value, '%Y-%m-%dT%H:%M:%SZ')``.
+    """
+    for value in ('2018-01-01T12:00:00Z', '2018-1-1T12:0:0Z',
+                  '2018-01- 1T12:00:00Z', '2018-01-01t12:00:00z'):
+        expected = datetime.datetime.strptime(
+            value, '%Y-%m-%dT%H:%M:%SZ').replace(tzinfo=datetime.timezone.utc)
+        assert decode_jsonld('{"date": "%s"}' % value)['date'] == expected
+
+    for value in ('2018-13-01T12:00:00Z', '2018-02-30T12:00:00Z',
+                  '2018-01-01T12:00:60Z', '2018-01-01T12:00:00',
+                  '2018-01-01T12:00:00+00:00', '2018-01-01',
+                  'Not a date, but with the same length'):
+        assert decode_jsonld('{"date": "%s"}' % value)['date'] == value
+
+
+def test_datetime_decoding_date_keys():
+    """Only values of the date keys are decoded if date_keys is given.
+    """
+    jsonld_text = ('{"dateModified": "2018-01-01T12:00:00Z", '
+                   '"name": "2018-01-01T12:00:00Z", '
+                   '"author": [{"dateCreated": "2018-01-01T12:00:00Z"}]}')
+    expected_date = datetime.datetime(2018, 1, 1, hour=12,
+                                      tzinfo=datetime.timezone.utc)
+
+    json_doc = decode_jsonld(jsonld_text, date_keys=JSONLD_DATE_KEYS)
+    assert json_doc['dateModified'] == expected_date
+    assert json_doc['name'] == '2018-01-01T12:00:00Z'
+    assert json_doc['author'][0]['dateCreated'] == expected_date
+
+    assert decode_jsonld(jsonld_text)['name'] == expected_date
+
+
+@pytest.mark.parametrize('kwargs', [
+    {},
+    {'sort_keys': True},
+    {'ensure_ascii': False, 'separators': (',', ':')},
+])
+def test_iterencode_jsonld(kwargs):
+    """Streamed chunks join to the same string as encode_jsonld."""
+    chunks = list(iterencode_jsonld(LARGE_JSONLD, chunk_size=1000, **kwargs))
+    assert ''.join(chunks) == encode_jsonld(LARGE_JSONLD, **kwargs)
+    assert len(chunks) > 1
+    # Chunks are about chunk_size, including slices of the long body
+    assert max(len(chunk) for chunk in chunks) < 2000
+
+
+def test_iterencode_jsonld_error():
+    with pytest.raises(TypeError):
+        list(iterencode_jsonld({'value': object()}))
+
+
+def test_write_jsonld():
+    stream = io.StringIO()
+    write_jsonld(LARGE_JSONLD, stream, sort_keys=True)
+    assert stream.getvalue() == encode_jsonld(LARGE_JSONLD, sort_keys=True)
+    assert decode_jsonld(stream.getvalue())['dateModified'] == \
+        LARGE_JSONLD['dateModified'].replace(tzinfo=datetime.timezone.utc)
+
+
+class _AsyncWriter(object):
+    """Stands in for an asyncio.StreamWriter."""
+
+    def __init__(self):
+        self.buffer = io.BytesIO()
+        self.drains = 0
+
+    def write(self, data):
+        self.buffer.write(data)
+
+    async def drain(self):
+        self.drains += 1
+
+
+def test_write_jsonld_async():
+    writer = _AsyncWriter()
+    run(write_jsonld_async(LARGE_JSONLD, writer, chunk_size=1000))
+    assert writer.buffer.getvalue().decode('utf-8') == \
+        encode_jsonld(LARGE_JSONLD)
+    assert writer.drains > 1
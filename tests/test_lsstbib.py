@@ -1,13 +1,129 @@
 """Tests for the lsstprojectmeta.tex.lsstbib module.
 """
 
-from pybtex.database import BibliographyData, parse_string
+import asyncio
+from collections import OrderedDict
+import hashlib
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+import threading
+
+import aiohttp
+from pybtex.database import (
+    BibliographyData, BibliographyDataError, parse_string)
 import pytest
 
+import lsstprojectmeta.tex.lsstbib as lsstbib
 from lsstprojectmeta.tex.lsstbib import (
     get_lsst_bibtex, get_bibliography,
+    get_lsst_bibtex_async, get_bibliography_async,
     get_url_from_entry, NoEntryUrlError,
-    get_authoryear_from_entry, AuthorYearError)
+    get_authoryear_from_entry, AuthorYearError,
+    set_lsst_bib_cache, BibliographyOverlay)
+from lsstprojectmeta.tex.bibindex import LazyBibliographyData
+
+from conftest import run
+
+# Small stand-ins for the lsst-texmf BibTeX files
+SAMPLE_LSST_BIBTEX = {
+    'lsst': (
+        '@DocuShare{LDM-151,\n'
+        '    author = {John D. Swinbank and others},\n'
+        '    title = "{Data Management Science Pipelines Design}",\n'
+        '    year = 2017,\n'
+        '    handle = {LDM-151},\n'
+        '}\n'),
+    'refs_ads': (
+        '@ARTICLE{2017ApJ...838....5L,\n'
+        '    author = {{Lee}, J.~C. and {Ma}, C.-P.},\n'
+        '    title = "{A Title}",\n'
+        '    year = 2017,\n'
+        '    adsurl = {http://adsabs.harvard.edu/abs/2017ApJ...838....5L},\n'
+        '}\n'),
+}
+
+
+class _BibServer(ThreadingMixIn, HTTPServer):
+    """Local stand-in for GitHub that serves lsst-texmf BibTeX files with
+    ETags, and counts requests.
+    """
+
+    daemon_threads = True
+
+    def __init__(self):
+        self.files = dict(SAMPLE_LSST_BIBTEX)
+        self.requests = []
+        self.downloads = []
+        super().__init__(('127.0.0.1', 0), _BibRequestHandler)
+
+    @property
+    def url_template(self):
+        return 'http://127.0.0.1:{0:d}/{{name}}.bib'.format(
+            self.server_address[1])
+
+
+class _BibRequestHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        name = self.path.strip('/')[:-len('.bib')]
+        self.server.requests.append(name)
+        if name not in self.server.files:
+            self.send_error(404)
+            return
+        body = self.server.files[name].encode('utf-8')
+        etag = '"{0}"'.format(hashlib.sha1(body).hexdigest())
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+        self.server.downloads.append(name)
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; charset=utf-8')
+        self.send_header('ETag', etag)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def bib_server(monkeypatch):
+    """Serve the sample BibTeX files, and reset the in-memory caches of
+    lsst-texmf BibTeX files.
+    """
+    server = _BibServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setattr(lsstbib, 'LSSTTEXMF_BIB_URL_TEMPLATE',
+                        server.url_template)
+    monkeypatch.setattr(lsstbib, '_LSSTTEXMF_BIB_CACHE', {})
+    monkeypatch.setattr(lsstbib, '_LSSTTEXMF_BIB_DIGESTS', {})
+    monkeypatch.setattr(lsstbib, '_LSST_BIB_CACHE', None)
+    monkeypatch.setattr(lsstbib, '_LSST_BIBLIOGRAPHIES', OrderedDict())
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _count_calls(monkeypatch, module, name):
+    """Patch a function of a module to record its calls, and get the list
+    of calls' positional arguments.
+    """
+    calls = []
+    func = getattr(module, name)
+    monkeypatch.setattr(module, name,
+                        lambda *args: calls.append(args) or func(*args))
+    return calls
+
+
+def _reset_memory_caches(monkeypatch):
+    """Simulate a new process, which only has the on-disk cache."""
+    monkeypatch.setattr(lsstbib, '_LSSTTEXMF_BIB_CACHE', {})
+    monkeypatch.setattr(lsstbib, '_LSSTTEXMF_BIB_DIGESTS', {})
+    monkeypatch.setattr(lsstbib, '_LSST_BIBLIOGRAPHIES', OrderedDict())
 
 
 def test_get_lsst_bibtex():
@@ -222,3 +338,149 @@ def test_get_authoryear_exception():
     entry = db.entries['LDM-151']
     with pytest.raises(AuthorYearError):
         get_authoryear_from_entry(entry)
+
+
+def test_lsst_bib_cache(bib_server, monkeypatch, tmpdir):
+    """Warm starts revalidate the files without downloading or indexing
+    them again.
+    """
+    cache = set_lsst_bib_cache(str(tmpdir.join('bib.sqlite3')))
+    names = ['lsst', 'refs_ads']
+
+    bib = get_bibliography(lsst_bib_names=names)
+    assert set(bib.entries.keys()) == {'LDM-151', '2017ApJ...838....5L'}
+    assert bib_server.downloads == names
+    assert cache.parse_hits == 0
+
+    _reset_memory_caches(monkeypatch)
+    index_calls = _count_calls(monkeypatch, lsstbib, 'index_bibtex')
+    bib = get_bibliography(lsst_bib_names=names)
+    assert set(bib.entries.keys()) == {'LDM-151', '2017ApJ...838....5L'}
+    assert bib_server.requests == names * 2
+    assert bib_server.downloads == names
+    assert index_calls == []
+    assert cache.parse_hits == 2
+
+    # A changed file is downloaded and indexed again
+    _reset_memory_caches(monkeypatch)
+    bib_server.files['lsst'] = bib_server.files['lsst'].replace(
+        'LDM-151', 'LDM-152')
+    bib = get_bibliography(lsst_bib_names=names)
+    assert 'LDM-152' in bib.entries
+    assert bib_server.downloads == names + ['lsst']
+    assert len(index_calls) == 1
+
+
+def test_lsst_bib_cache_offline(bib_server, monkeypatch, tmpdir):
+    """Cached files are used if they can't be downloaded."""
+    set_lsst_bib_cache(str(tmpdir.join('bib.sqlite3')))
+    assert get_lsst_bibtex(['lsst']) == {'lsst': SAMPLE_LSST_BIBTEX['lsst']}
+
+    _reset_memory_caches(monkeypatch)
+    bib_server.files.clear()
+    assert get_lsst_bibtex(['lsst']) == {'lsst': SAMPLE_LSST_BIBTEX['lsst']}
+
+
+def test_get_lsst_bibtex_partly_cached(bib_server):
+    """Files that are already in memory aren't downloaded again."""
+    assert get_lsst_bibtex(['refs_ads']) == \
+        {'refs_ads': SAMPLE_LSST_BIBTEX['refs_ads']}
+    assert get_lsst_bibtex(['lsst', 'refs_ads']) == SAMPLE_LSST_BIBTEX
+    assert bib_server.requests == ['refs_ads', 'lsst']
+
+
+LOCAL_BIBTEX = (
+    '@ARTICLE{local,\n'
+    '    author = {A. Author},\n'
+    '    title = "{Local}",\n'
+    '    year = 2018,\n'
+    '}\n')
+
+
+def test_get_bibliography_shared_base(bib_server, monkeypatch):
+    """The lsst-texmf bibliographies are indexed once, and local entries are
+    kept out of the shared base.
+    """
+    names = ['lsst', 'refs_ads']
+    index_calls = _count_calls(monkeypatch, lsstbib, 'index_bibtex')
+
+    bib = get_bibliography(lsst_bib_names=names, bibtex=LOCAL_BIBTEX)
+    assert isinstance(bib, BibliographyData)
+    assert list(bib.entries.keys()) == \
+        ['LDM-151', '2017ApJ...838....5L', 'local']
+    assert len(index_calls) == 2
+
+    other_bib = get_bibliography(lsst_bib_names=names)
+    assert len(index_calls) == 2
+    assert other_bib.base is bib.base
+    assert 'local' not in other_bib.entries
+    assert other_bib.entries['ldm-151'] is bib.entries['LDM-151']
+
+    # A different set of files is a different base
+    assert list(get_bibliography(lsst_bib_names=['lsst']).entries) == \
+        ['LDM-151']
+    assert len(index_calls) == 3
+
+
+def test_get_bibliography_lazy(bib_server):
+    """Only the entries that are looked up are parsed."""
+    bib = get_bibliography(lsst_bib_names=['lsst', 'refs_ads'])
+    assert isinstance(bib.base, LazyBibliographyData)
+    assert 'ldm-151' in bib.entries
+    assert bib.base.parsed_count == 0
+
+    entry = bib.entries['LDM-151']
+    assert entry.type == 'docushare'
+    assert get_url_from_entry(entry) == 'https://ls.st/LDM-151'
+    assert bib.entries['LDM-151'] is entry
+    assert bib.base.parsed_count == 1
+
+
+def test_bibliography_overlay():
+    base = parse_string(SAMPLE_LSST_BIBTEX['lsst'], 'bibtex')
+    bib = BibliographyOverlay(base)
+    assert len(bib.entries) == 1
+
+    local = parse_string(LOCAL_BIBTEX, 'bibtex')
+    bib.add_entry('local', local.entries['local'])
+    assert len(bib.entries) == 2
+    assert 'LOCAL' in bib.entries
+    assert list(base.entries.keys()) == ['LDM-151']
+    assert bib == parse_string(SAMPLE_LSST_BIBTEX['lsst'] + LOCAL_BIBTEX,
+                               'bibtex')
+
+    # Local entries can't replace entries of the base
+    with pytest.raises(BibliographyDataError):
+        BibliographyOverlay(base, base.entries)
+
+
+def test_get_bibliography_async(bib_server):
+    """Concurrent calls share a session and one download of each file."""
+    names = ['lsst', 'refs_ads']
+
+    async def get_bibliographies():
+        async with aiohttp.ClientSession() as session:
+            return await asyncio.gather(
+                get_bibliography_async(lsst_bib_names=names,
+                                       session=session),
+                get_bibliography_async(lsst_bib_names=names,
+                                       bibtex=LOCAL_BIBTEX,
+                                       session=session),
+                get_lsst_bibtex_async(['lsst'], session=session))
+
+    bib, local_bib, bibtex = run(get_bibliographies())
+    assert sorted(bib_server.requests) == sorted(names)
+    assert list(bib.entries.keys()) == ['LDM-151', '2017ApJ...838....5L']
+    assert 'local' in local_bib.entries
+    assert local_bib.base is bib.base
+    assert bibtex == {'lsst': SAMPLE_LSST_BIBTEX['lsst']}
+    assert lsstbib._LSSTTEXMF_BIB_DOWNLOADS == {}
+
+
+def test_get_lsst_bibtex_in_running_loop(bib_server):
+    """The synchronous API can be called from a coroutine."""
+    async def get_bibtex():
+        return get_lsst_bibtex(['lsst'])
+
+    assert run(get_bibtex()) == {'lsst': SAMPLE_LSST_BIBTEX['lsst']}
+    assert bib_server.requests == ['lsst']
@@ -5,6 +5,7 @@ LsstLatexDoc against sample documents.
 from pybtex.database import BibliographyData
 import pytest
 
+from lsstprojectmeta.pandoc import convert
 from lsstprojectmeta.tex.lsstdoc import LsstLatexDoc
 
 
@@ -100,6 +101,46 @@ def test_html_title():
     assert converted == expected
 
 
+def test_html_metadata_batched(monkeypatch):
+    """The html_* attributes are converted with a single pandoc run."""
+    sample = (r'\title[Short \textit{title}]{Full title}'
+              '\n'
+              r'\author{A.~Author and B.~Author}'
+              '\n'
+              r'\setDocAbstract{An \textbf{abstract}.}')
+    lsstdoc = LsstLatexDoc(sample)
+    # Avoid downloading the lsst-texmf bibliographies
+    lsstdoc._bib_db = BibliographyData()
+
+    batches = []
+    convert_batch = convert.convert_lsstdoc_tex_batch
+
+    def _convert_batch(contents, *args, **kwargs):
+        batches.append(list(contents))
+        return convert_batch(contents, *args, **kwargs)
+
+    monkeypatch.setattr(convert, 'convert_lsstdoc_tex_batch', _convert_batch)
+    html_title = lsstdoc.html_title
+    html_short_title = lsstdoc.html_short_title
+    html_authors = lsstdoc.html_authors
+    html_abstract = lsstdoc.html_abstract
+    assert len(batches) == 1
+
+    assert html_title == convert.convert_lsstdoc_tex(
+        'Full title', 'html5', deparagraph=True)
+    assert html_short_title == convert.convert_lsstdoc_tex(
+        r'Short \textit{title}', 'html5', deparagraph=True)
+    assert html_authors == ['A. Author', 'B. Author']
+    assert html_abstract == convert.convert_lsstdoc_tex(
+        r'An \textbf{abstract}.', 'html5')
+
+    # The abstract is only batched with the other snippets if the
+    # bibliography that links its citations is loaded
+    lsstdoc = LsstLatexDoc(sample)
+    assert lsstdoc.html_title == html_title
+    assert lsstdoc._bib_db is None
+
+
 def test_default_load_bib_db():
     """Test that the common lsst-texmf bibliographies are always loaded.
     """
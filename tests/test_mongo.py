@@ -0,0 +1,219 @@
+"""Tests for the lsstprojectmeta.mongo module.
+"""
+
+import asyncio
+import collections
+import datetime
+
+from pymongo import ReplaceOne
+from pymongo.errors import BulkWriteError
+
+from lsstprojectmeta.mongo import (
+    MongoBulkWriter, upsert_jsonld, make_jsonld_replacement,
+    compute_jsonld_hash)
+
+from conftest import run
+
+
+class _BulkWriteResult(object):
+
+    def __init__(self, operations):
+        self.upserted_count = len(operations)
+        self.modified_count = 0
+
+
+class _MockCursor(object):
+
+    def __init__(self, documents):
+        self.documents = documents
+
+    async def to_list(self, length):
+        return self.documents
+
+
+class _MockCollection(object):
+    """Stands in for a motor AsyncIOMotorCollection."""
+
+    def __init__(self, fail_operations=(), documents=()):
+        self.indexes = []
+        self.batches = []
+        self.replaced = []
+        self.fail_operations = list(fail_operations)
+        self.documents = list(documents)
+
+    async def create_index(self, keys):
+        self.indexes.append(keys)
+
+    def find(self, query, projection=None):
+        report_numbers = query['data.reportNumber']['$in']
+        return _MockCursor([document for document in self.documents
+                            if document['data']['reportNumber']
+                            in report_numbers])
+
+    async def find_one(self, query, projection=None):
+        for document in self.documents:
+            if document['data']['reportNumber'] == \
+                    query['data.reportNumber']:
+                return document
+        return None
+
+    async def replace_one(self, query, document, upsert=False):
+        self.replaced.append((query, document, upsert))
+
+    async def bulk_write(self, operations, ordered=True):
+        assert not ordered
+        await asyncio.sleep(0)
+        self.batches.append(operations)
+        write_errors = [
+            {'index': i, 'errmsg': 'failed'}
+            for i, operation in enumerate(operations)
+            if operation in self.fail_operations]
+        if write_errors:
+            raise BulkWriteError({'writeErrors': write_errors})
+        return _BulkWriteResult(operations)
+
+
+def _make_jsonld(i):
+    return {'reportNumber': 'SQR-{0:03d}'.format(i), 'name': str(i)}
+
+
+def test_make_jsonld_replacement():
+    jsonld = _make_jsonld(1)
+    assert make_jsonld_replacement(jsonld) == ReplaceOne(
+        {'data.reportNumber': 'SQR-001'},
+        {'data': jsonld, 'contentHash': compute_jsonld_hash(jsonld)},
+        upsert=True)
+
+
+def test_compute_jsonld_hash():
+    jsonld = {'reportNumber': 'SQR-001',
+              'dateModified': datetime.datetime(2018, 1, 1),
+              'author': [{'name': 'Jonathan Sick'}]}
+    reordered = collections.OrderedDict(
+        (key, jsonld[key]) for key in reversed(list(jsonld)))
+    assert compute_jsonld_hash(reordered) == compute_jsonld_hash(jsonld)
+    assert len(compute_jsonld_hash(jsonld)) == 64
+
+    changed = dict(jsonld, dateModified=datetime.datetime(2018, 1, 2))
+    assert compute_jsonld_hash(changed) != compute_jsonld_hash(jsonld)
+
+
+def test_upsert_jsonld_collection():
+    collection = _MockCollection()
+    written = []
+    run(upsert_jsonld(collection, _make_jsonld(1),
+                      on_written=lambda: written.append(1)))
+    assert collection.replaced == [
+        ({'data.reportNumber': 'SQR-001'},
+         {'data': _make_jsonld(1),
+          'contentHash': compute_jsonld_hash(_make_jsonld(1))},
+         True)]
+    assert written == [1]
+
+
+def test_upsert_jsonld_unchanged():
+    """Records whose content hash matches the stored copy aren't written
+    again.
+    """
+    stored = [{'data': _make_jsonld(1),
+               'contentHash': compute_jsonld_hash(_make_jsonld(1))}]
+    collection = _MockCollection(documents=stored)
+    written = []
+    run(upsert_jsonld(collection, _make_jsonld(1),
+                      on_written=lambda: written.append(1)))
+    assert collection.replaced == []
+    assert written == [1]
+
+    changed = dict(_make_jsonld(1), name='Changed')
+    run(upsert_jsonld(collection, changed))
+    assert len(collection.replaced) == 1
+
+
+def test_mongo_bulk_writer():
+    collection = _MockCollection()
+    written = []
+
+    async def write():
+        async with MongoBulkWriter(collection, batch_size=10) as writer:
+            for i in range(25):
+                await upsert_jsonld(writer, _make_jsonld(i),
+                                    on_written=lambda i=i: written.append(i))
+        return writer
+
+    writer = run(write())
+    assert collection.indexes == ['data.reportNumber']
+    assert [len(batch) for batch in collection.batches] == [10, 10, 5]
+    assert collection.batches[0][0] == make_jsonld_replacement(
+        _make_jsonld(0))
+    assert written == list(range(25))
+    metrics = writer.metrics
+    assert metrics['batches'] == 3
+    assert metrics['written'] == 25
+    assert metrics['failed'] == 0
+    assert metrics['unchanged'] == 0
+    assert metrics['buffered'] == 0
+    assert metrics['max_latency'] >= metrics['mean_latency'] >= 0.
+
+
+def test_mongo_bulk_writer_flush_interval():
+    """Buffered records are written after flush_interval."""
+    collection = _MockCollection()
+
+    async def write():
+        async with MongoBulkWriter(collection, batch_size=100,
+                                   flush_interval=0.01) as writer:
+            await writer.upsert(_make_jsonld(1))
+            await writer.upsert(_make_jsonld(2))
+            await asyncio.sleep(0.1)
+            assert len(collection.batches) == 1
+            await writer.upsert(_make_jsonld(3))
+        return writer
+
+    run(write())
+    assert [len(batch) for batch in collection.batches] == [2, 1]
+
+
+def test_mongo_bulk_writer_errors():
+    """Records that fail to be written are counted, and their callbacks
+    aren't called.
+    """
+    collection = _MockCollection(
+        fail_operations=[make_jsonld_replacement(_make_jsonld(1))])
+    written = []
+
+    async def write():
+        async with MongoBulkWriter(collection) as writer:
+            for i in range(3):
+                await writer.upsert(_make_jsonld(i),
+                                    on_written=lambda i=i: written.append(i))
+        return writer
+
+    writer = run(write())
+    assert written == [0, 2]
+    assert writer.metrics['written'] == 2
+    assert writer.metrics['failed'] == 1
+
+
+def test_mongo_bulk_writer_unchanged():
+    """Records with unchanged content are dropped from bulk writes."""
+    stored = [{'data': _make_jsonld(i),
+               'contentHash': compute_jsonld_hash(_make_jsonld(i))}
+              for i in range(3)]
+    collection = _MockCollection(documents=stored)
+    written = []
+
+    async def write():
+        async with MongoBulkWriter(collection) as writer:
+            for i in range(4):
+                jsonld = _make_jsonld(i)
+                if i == 2:
+                    jsonld['name'] = 'Changed'
+                await writer.upsert(jsonld,
+                                    on_written=lambda i=i: written.append(i))
+        return writer
+
+    writer = run(write())
+    assert [len(batch) for batch in collection.batches] == [2]
+    assert sorted(written) == [0, 1, 2, 3]
+    assert writer.metrics['unchanged'] == 2
+    assert writer.metrics['written'] == 2
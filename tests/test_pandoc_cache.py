@@ -0,0 +1,154 @@
+"""Tests for the lsstprojectmeta.pandoc.cache module.
+"""
+
+import os
+
+import pypandoc
+import pytest
+
+from lsstprojectmeta.pandoc.cache import (
+    PandocCache, get_pandoc_cache, set_pandoc_cache)
+from lsstprojectmeta.pandoc.convert import convert_text, convert_text_batch
+
+
+@pytest.fixture
+def cache(tmpdir):
+    return PandocCache(str(tmpdir.join('cache', 'pandoc.sqlite3')))
+
+
+@pytest.fixture
+def active_cache(cache):
+    previous_cache = get_pandoc_cache()
+    set_pandoc_cache(cache)
+    yield cache
+    set_pandoc_cache(previous_cache)
+
+
+def test_make_key():
+    key = PandocCache.make_key('Text', 'latex', 'html5',
+                               ['--smart', '--wrap=none'])
+    # Argument order and repetition doesn't matter
+    assert key == PandocCache.make_key('Text', 'latex', 'html5',
+                                       ['--wrap=none', '--smart', '--smart'])
+    # Content and formats matter
+    assert key != PandocCache.make_key('Text.', 'latex', 'html5',
+                                       ['--smart', '--wrap=none'])
+    assert key != PandocCache.make_key('Text', 'latex', 'plain',
+                                       ['--smart', '--wrap=none'])
+    assert key != PandocCache.make_key('Text', 'latex', 'html5',
+                                       ['--wrap=none'])
+    # Batched conversions are cached separately
+    assert key != PandocCache.make_key('Text', 'latex', 'html5',
+                                       ['--smart', '--wrap=none'],
+                                       batch=True)
+
+
+def test_size(cache):
+    """The running total size follows added, replaced, evicted, and
+    cleared entries.
+    """
+    cache.set('a', 'a' * 8)
+    cache.set('b', 'b' * 8)
+    cache.set('a', 'a' * 4)
+    assert cache.size == 12
+
+    # The total is computed for a database that doesn't have one
+    connection = cache._connect()
+    connection.execute('DROP TABLE cache_size')
+    assert PandocCache(cache.path).size == 12
+
+    cache.clear()
+    assert cache.size == 0
+
+
+def test_get_set(cache):
+    assert cache.get('a') is None
+    cache.set('a', 'Output\n')
+    assert cache.get('a') == 'Output\n'
+    assert len(cache) == 1
+    assert cache.stats == {'hits': 1, 'misses': 1, 'evictions': 0}
+    assert os.path.exists(cache.path)
+
+    # A second cache instance shares the same database
+    other_cache = PandocCache(cache.path)
+    assert other_cache.get('a') == 'Output\n'
+
+    cache.clear()
+    assert len(cache) == 0
+
+
+def test_lru_eviction(cache):
+    cache.max_size = 20
+    cache.set('a', 'a' * 8)
+    cache.set('b', 'b' * 8)
+    # Access 'a' so that 'b' is the least recently used entry
+    assert cache.get('a') is not None
+    cache.set('c', 'c' * 8)
+
+    assert cache.get('b') is None
+    assert cache.get('a') == 'a' * 8
+    assert cache.get('c') == 'c' * 8
+    assert cache.size == 16
+    assert cache.evictions == 1
+
+
+def test_convert_text_cached(active_cache, monkeypatch):
+    output = convert_text('Hello world!', 'latex', 'html5', deparagraph=True)
+    assert active_cache.misses == 1
+
+    def _fail(*args, **kwargs):
+        raise AssertionError('pandoc should not run')
+
+    monkeypatch.setattr(pypandoc, 'convert_text', _fail)
+    assert convert_text('Hello world!', 'latex', 'html5',
+                        deparagraph=True) == output
+    assert convert_text_batch(['Hello world!'], 'latex', 'html5',
+                              deparagraph=True) == [output]
+    assert active_cache.hits == 2
+
+
+def test_convert_text_batch_cached(active_cache, monkeypatch):
+    """Outputs of batched conversions aren't returned by convert_text."""
+    outputs = convert_text_batch(['Hello world!', 'Second snippet'],
+                                 'latex', 'html5', deparagraph=True)
+    assert len(active_cache) == 2
+    # One miss per snippet
+    assert active_cache.misses == 2
+
+    # Cached batch outputs are reused by batches
+    def _fail(*args, **kwargs):
+        raise AssertionError('pandoc should not run')
+
+    with monkeypatch.context() as patch:
+        patch.setattr(pypandoc, 'convert_text', _fail)
+        assert convert_text_batch(['Hello world!', 'Second snippet'],
+                                  'latex', 'html5',
+                                  deparagraph=True) == outputs
+
+    # ... but not by convert_text, which runs pandoc
+    assert convert_text('Hello world!', 'latex', 'html5',
+                        deparagraph=True) == outputs[0]
+    assert len(active_cache) == 3
+
+
+def test_convert_text_batch_cached_mixed_deparagraph(active_cache,
+                                                     monkeypatch):
+    """Cached outputs of batches that mix deparagraph settings match
+    converting each snippet on its own.
+    """
+    samples = ['Title', r'\begin{quote}Quoted text\end{quote}',
+               r'\begin{itemize}\item One\end{itemize}']
+    deparagraphs = [True, False, False]
+    convert_text_batch(samples, 'latex', 'html5', deparagraph=deparagraphs)
+
+    def _fail(*args, **kwargs):
+        raise AssertionError('pandoc should not run')
+
+    with monkeypatch.context() as patch:
+        patch.setattr(pypandoc, 'convert_text', _fail)
+        outputs = convert_text_batch(samples, 'latex', 'html5',
+                                     deparagraph=deparagraphs)
+
+    for sample, deparagraph, output in zip(samples, deparagraphs, outputs):
+        assert output == convert_text(sample, 'latex', 'html5',
+                                      deparagraph=deparagraph)
@@ -0,0 +1,75 @@
+"""Tests for the lsstprojectmeta.pandoc.convert module.
+"""
+
+import pytest
+
+from lsstprojectmeta.pandoc.convert import (
+    convert_text, convert_text_batch, convert_lsstdoc_tex,
+    convert_lsstdoc_tex_batch)
+
+
+@pytest.mark.parametrize(
+    'to_fmt,deparagraph', [
+        ('html5', True),
+        ('html5', False),
+        ('plain', True),
+        ('plain', False),
+    ])
+def test_convert_text_batch(to_fmt, deparagraph):
+    """The batched conversion matches converting each snippet individually.
+    """
+    samples = [
+        r'``Complex'' title \textit{like} $1+2$',
+        'Hello.\n\nWorld!',
+        r'A.~Author',
+        '',
+    ]
+    expected = [convert_text(sample, 'latex', to_fmt,
+                             deparagraph=deparagraph)
+                for sample in samples]
+    outputs = convert_text_batch(samples, 'latex', to_fmt,
+                                 deparagraph=deparagraph)
+    assert outputs == expected
+
+
+def test_convert_text_batch_mixed_deparagraph():
+    """Only the snippets that are deparagraphed lose their paragraphs,
+    including nested ones.
+    """
+    samples = ['Title text', 'Abstract text',
+               r'\begin{quote}Quoted text\end{quote}',
+               r'\begin{itemize}\item One\end{itemize}',
+               r'\begin{quote}Quoted title\end{quote}']
+    deparagraphs = [True, False, False, False, True]
+    outputs = convert_text_batch(samples, 'latex', 'html5',
+                                 deparagraph=deparagraphs)
+    assert outputs[:2] == ['Title text\n', '<p>Abstract text</p>\n']
+    for sample, deparagraph, output in zip(samples, deparagraphs, outputs):
+        assert output == convert_text(sample, 'latex', 'html5',
+                                      deparagraph=deparagraph)
+
+
+def test_convert_text_batch_empty():
+    assert convert_text_batch([], 'latex', 'html5') == []
+
+
+def test_convert_lsstdoc_tex_batch():
+    samples = [r'\latex\ title', r'\docType']
+    expected = [convert_lsstdoc_tex(sample, 'plain', deparagraph=True)
+                for sample in samples]
+    outputs = convert_lsstdoc_tex_batch(samples, 'plain', deparagraph=True)
+    assert outputs == expected
+
+
+@pytest.mark.parametrize('to_fmt', ['html5', 'plain'])
+def test_convert_text_batch_footnotes(to_fmt):
+    """Notes stay with their snippet, rather than moving to the end of the
+    batch.
+    """
+    samples = ['Title\\footnote{A note}', 'Second snippet']
+    expected = [convert_text(sample, 'latex', to_fmt, deparagraph=True)
+                for sample in samples]
+    outputs = convert_text_batch(samples, 'latex', to_fmt, deparagraph=True)
+    assert outputs == expected
+    assert 'A note' in outputs[0]
+    assert 'A note' not in outputs[1]
@@ -1,12 +1,17 @@
 """Test the lsstprojectmeta-deparagraph Pandoc filter.
 
 The filter is implemented in lsstprojectmeta.pandoc.filters.deparagraph, but we
-test it through the lsstprojectmeta-deparagraph entrypoint.
+test it through the lsstprojectmeta-deparagraph entrypoint. The in-process
+variant, deparagraph_ast, is tested against the entrypoint.
 """
 
 import pypandoc
 import pytest
 
+from lsstprojectmeta.pandoc.convert import convert_text
+from lsstprojectmeta.pandoc.filters.deparagraph import (
+    SNIPPET_MARKER, DEPARAGRAPH_SNIPPET_MARKER, deparagraph_ast)
+
 
 @pytest.mark.parametrize(
     'sample,expected', [
@@ -20,3 +25,44 @@ def test_deparagraph(sample, expected):
         sample, 'html5', format='latex',
         extra_args=['--filter=lsstprojectmeta-deparagraph'])
     assert output == expected
+
+
+@pytest.mark.parametrize(
+    'sample', [
+        'Hello world!',
+        'Hello.\n\nWorld!',
+        r'\begin{itemize}\item One\item Two\end{itemize}',
+        r'Text\footnote{A note}',
+        # Batched snippets, where only some are deparagraphed
+        '\n\n'.join([DEPARAGRAPH_SNIPPET_MARKER, 'Title',
+                     SNIPPET_MARKER, r'\begin{quote}Quoted\end{quote}',
+                     DEPARAGRAPH_SNIPPET_MARKER,
+                     r'\begin{quote}Quoted title\end{quote}',
+                     SNIPPET_MARKER, 'Abstract']),
+    ])
+def test_deparagraph_in_process(sample):
+    """convert_text applies the deparagraph filter in-process; the output
+    must match the lsstprojectmeta-deparagraph pandoc filter.
+    """
+    expected = pypandoc.convert_text(
+        sample, 'html5', format='latex',
+        extra_args=['--filter=lsstprojectmeta-deparagraph', '--wrap=none',
+                    '--smart'])
+    assert convert_text(sample, 'latex', 'html5', deparagraph=True) \
+        == expected
+
+
+def test_deparagraph_ast_pandoc1():
+    """deparagraph_ast supports the pandoc 1.x JSON layout."""
+    ast = [{'unMeta': {}},
+           [{'t': 'Para', 'c': [{'t': 'Str', 'c': 'Hello'}]}]]
+    assert deparagraph_ast(ast)[1][0]['t'] == 'Plain'
+
+
+def test_deparagraph_ast_siblings():
+    """Paragraphs with siblings are not affected."""
+    ast = {'meta': {},
+           'blocks': [{'t': 'Para', 'c': [{'t': 'Str', 'c': 'Hello'}]},
+                      {'t': 'Para', 'c': [{'t': 'Str', 'c': 'World'}]}]}
+    blocks = deparagraph_ast(ast)['blocks']
+    assert [block['t'] for block in blocks] == ['Para', 'Para']
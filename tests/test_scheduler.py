@@ -0,0 +1,135 @@
+"""Tests for the lsstprojectmeta.scheduler module.
+"""
+
+import asyncio
+import threading
+
+import pytest
+
+from lsstprojectmeta.scheduler import (
+    HostLimits, HostLimitedSession, BoundedScheduler, run_cpu_bound)
+
+from conftest import run
+
+
+class _ConcurrencyCounter(object):
+    """Counts concurrent calls, per key."""
+
+    def __init__(self):
+        self.active = {}
+        self.max_active = {}
+
+    async def run(self, key):
+        self.active[key] = self.active.get(key, 0) + 1
+        self.max_active[key] = max(self.max_active.get(key, 0),
+                                   self.active[key])
+        await asyncio.sleep(0.001)
+        self.active[key] -= 1
+
+
+class _MockResponse(object):
+
+    def __init__(self, counter, url):
+        self._counter = counter
+        self.url = url
+
+    async def __aenter__(self):
+        await self._counter.run(self.url.split('/')[2])
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self._counter.run(self.url.split('/')[2])
+
+
+class _MockSession(object):
+    """Stands in for an aiohttp.ClientSession."""
+
+    closed = False
+
+    def __init__(self, counter):
+        self._counter = counter
+
+    def request(self, method, url, **kwargs):
+        return _MockResponse(self._counter, url)
+
+
+def test_host_limits():
+    limits = HostLimits.from_strings(['API.github.com=2', 'example.org = 3'],
+                                     default=5)
+    assert limits.limit_for('https://api.github.com/graphql') == 2
+    assert limits.limit_for('https://example.org/') == 3
+    assert limits.limit_for('https://keeper.lsst.codes/products/') == 5
+
+    with pytest.raises(ValueError):
+        HostLimits.from_strings(['api.github.com'])
+    with pytest.raises(ValueError):
+        HostLimits.from_strings(['=2'])
+    with pytest.raises(ValueError):
+        HostLimits(limits={'api.github.com': 0})
+
+
+def test_host_limited_session():
+    counter = _ConcurrencyCounter()
+    session = HostLimitedSession(
+        _MockSession(counter),
+        HostLimits(default=3, limits={'api.github.com': 1}))
+    urls = ['https://api.github.com/graphql',
+            'https://keeper.lsst.codes/products/a',
+            'https://raw.githubusercontent.com/a'] * 10
+
+    async def fetch(url):
+        async with session.get(url) as response:
+            assert response.url == url
+            await counter.run(url.split('/')[2])
+
+    async def fetch_all():
+        await asyncio.gather(*[fetch(url) for url in urls])
+
+    run(fetch_all())
+    assert counter.max_active == {'api.github.com': 1,
+                                  'keeper.lsst.codes': 3,
+                                  'raw.githubusercontent.com': 3}
+    assert not any(counter.active.values())
+    # Other attributes are passed through to the wrapped session
+    assert session.closed is False
+
+
+def test_bounded_scheduler():
+    counter = _ConcurrencyCounter()
+    reports = []
+
+    async def process(item):
+        await counter.run('items')
+        if item % 10 == 0:
+            raise RuntimeError(item)
+        return item * 2
+
+    scheduler = BoundedScheduler(concurrency=4, progress_interval=0.,
+                                 progress_callback=reports.append)
+    results = run(scheduler.map(process, range(50)))
+
+    assert results == [None if i % 10 == 0 else i * 2 for i in range(50)]
+    assert counter.max_active == {'items': 4}
+    # One report for each item, and a final report
+    assert len(reports) == 51
+    assert [report.done for report in reports[:-1]] == list(range(1, 51))
+    assert reports[-1].total == 50
+    assert reports[-1].done == 50
+    assert reports[-1].failed == 5
+    assert reports[-1].active == 0
+
+
+def test_bounded_scheduler_empty():
+    reports = []
+    scheduler = BoundedScheduler(progress_callback=reports.append)
+    assert run(scheduler.map(None, [])) == []
+    assert reports[-1].total == 0
+
+
+def test_run_cpu_bound():
+    async def get_thread():
+        return await run_cpu_bound(lambda x: (x, threading.get_ident()), 1)
+
+    value, thread_id = run(get_thread())
+    assert value == 1
+    assert thread_id != threading.get_ident()
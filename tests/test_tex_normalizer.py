@@ -71,6 +71,65 @@ def test_read_tex_file():
     assert re.search(r'\\section{Introduction}', tex_source) is not None
 
 
+def test_tex_file_resolver():
+    """Files are read once, and their dependencies are recorded."""
+    project_dir = os.path.join(os.path.dirname(__file__), 'data', 'LDM-151')
+    root_filepath = os.path.join(project_dir, 'LDM-151.tex')
+    resolver = normalizer.TexFileResolver()
+    tex_source = resolver.read(root_filepath)
+    assert tex_source == normalizer.read_tex_file(root_filepath)
+
+    root_path = os.path.abspath(root_filepath)
+    sections = resolver.dependencies[root_path]
+    assert os.path.join(project_dir, 'sections', 'preface.tex') in sections
+    assert resolver.reads == len(resolver.dependencies)
+    assert resolver.hits == 0
+    assert resolver.cycles == []
+
+    # Unchanged files aren't read again
+    assert resolver.read(root_filepath) == tex_source
+    assert resolver.hits == resolver.reads
+
+
+def test_tex_file_resolver_repeated(tmpdir):
+    """A file included several times is read and resolved once, and changed
+    files are read again.
+    """
+    tmpdir.join('root.tex').write(
+        '\\input{macros}\n\\input{table}\n\\input{table}\n')
+    tmpdir.join('macros.tex').write('\\def\\a{A}  % a comment\n')
+    tmpdir.join('table.tex').write('Table\n')
+    root_filepath = str(tmpdir.join('root.tex'))
+
+    resolver = normalizer.TexFileResolver()
+    assert resolver.read(root_filepath) == \
+        '\\def\\a{A}\n\nTable\n\nTable\n\n'
+    assert resolver.reads == 3
+    assert resolver.dependencies[root_filepath] == [
+        str(tmpdir.join('macros.tex')), str(tmpdir.join('table.tex')),
+        str(tmpdir.join('table.tex'))]
+
+    tmpdir.join('table.tex').write('Changed table\n')
+    assert resolver.read(root_filepath) == \
+        '\\def\\a{A}\n\nChanged table\n\nChanged table\n\n'
+    assert resolver.reads == 4
+
+
+def test_tex_file_resolver_cycle(tmpdir):
+    """Cyclic includes are left out."""
+    tmpdir.join('root.tex').write('Root\n\\input{a}\n')
+    tmpdir.join('a.tex').write('A\n\\input{b}\n')
+    tmpdir.join('b.tex').write('B\n\\input{a}\n\\input{root}\n')
+    root_filepath = str(tmpdir.join('root.tex'))
+
+    resolver = normalizer.TexFileResolver()
+    assert normalizer.read_tex_file(root_filepath, resolver=resolver) == \
+        'Root\nA\nB\n\n\n\n\n'
+    assert resolver.cycles == [
+        [str(tmpdir.join('a.tex')), str(tmpdir.join('b.tex'))],
+        [root_filepath, str(tmpdir.join('a.tex')), str(tmpdir.join('b.tex'))]]
+
+
 def test_replace_macros():
     sample = (
         r"\def \product {Data Management}" + "\n"
@@ -91,6 +150,34 @@ def test_replace_macros():
     assert tex_source == expected
 
 
+def test_replace_macros_longest_first():
+    """Longer macro names are replaced first, regardless of the order of
+    the macros.
+    """
+    sample = r'\lsstDocType-\lsstDocNum: \lsst\ document'
+    macros = {r'\lsst': 'LSST',
+              r'\lsstDocType': 'LDM',
+              r'\lsstDocNum': '151'}
+    expected = 'LDM-151: LSST document'
+    assert normalizer.replace_macros(sample, macros) == expected
+    reversed_macros = dict(reversed(list(macros.items())))
+    assert normalizer.replace_macros(sample, reversed_macros) == expected
+
+
+def test_replace_macros_nested():
+    """Macros in the content of other macros are replaced."""
+    macros = {r'\handle': r'\lsstDocType-\lsstDocNum',
+              r'\lsstDocType': 'LDM',
+              r'\lsstDocNum': '151'}
+    assert normalizer.replace_macros(r'Document \handle', macros) == \
+        'Document LDM-151'
+
+    # Recursive macros are expanded to a limited depth
+    macros = {r'\loop': r'\loop!'}
+    tex_source = normalizer.replace_macros(r'\loop', macros)
+    assert tex_source.startswith(r'\loop!!')
+
+
 @pytest.mark.parametrize(
     'sample,expected',
     [(r'\input{file.tex}', 'file.tex'),